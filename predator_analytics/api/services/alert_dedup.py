@@ -0,0 +1,128 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Поки вікно відкрите, повтори сповіщення лише збільшують лічильник у пам'яті
+ALERT_SUPPRESSION_SECONDS = 300
+ALERT_FLUSH_INTERVAL_SECONDS = 10
+ALERT_SUPPRESSION_CACHE_SIZE = 10_000
+
+# Ключові поля деталей, що визначають «те саме» сповіщення.
+# Ключі з «_» в кінці є префіксами типу сповіщення
+FINGERPRINT_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "metric_threshold_exceeded": ("metric", "level"),
+    "attack_pattern_detected_": ("pattern", "attack_data.username", "attack_data.ip_address"),
+}
+DEFAULT_FINGERPRINT_FIELDS = ("username", "ip_address", "metric", "pattern")
+
+
+def fingerprint_fields(alert_type: str) -> Tuple[str, ...]:
+    fields = FINGERPRINT_FIELDS.get(alert_type)
+    if fields is not None:
+        return fields
+    for prefix, prefix_fields in FINGERPRINT_FIELDS.items():
+        if prefix.endswith("_") and alert_type.startswith(prefix):
+            return prefix_fields
+    return DEFAULT_FINGERPRINT_FIELDS
+
+
+def _lookup(details: dict, path: str):
+    value = details
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def alert_fingerprint(alert_type: str, details: Optional[dict]) -> str:
+    """Відбиток сповіщення: тип та ключові поля деталей"""
+    details = details or {}
+    key = [alert_type, [_lookup(details, path) for path in fingerprint_fields(alert_type)]]
+    payload = json.dumps(key, default=str, sort_keys=True).encode()
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+class AlertSuppressor:
+    """Вікна придушення повторних сповіщень за відбитком
+
+    Запис: відбиток -> [alert_id, закінчення вікна, кількість неврахованих повторів].
+    """
+
+    def __init__(
+        self,
+        window_seconds: float = ALERT_SUPPRESSION_SECONDS,
+        flush_interval: float = ALERT_FLUSH_INTERVAL_SECONDS,
+        max_size: int = ALERT_SUPPRESSION_CACHE_SIZE,
+    ):
+        self.window_seconds = window_seconds
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, list]" = OrderedDict()
+        # Повтори з невдалого запису: (alert_id, відбиток) -> кількість
+        self._unflushed: "OrderedDict[Tuple[int, str], int]" = OrderedDict()
+        self.suppressed_total = 0
+
+    def suppress(self, fingerprint: str, now: float = None) -> Optional[int]:
+        """id відкритого сповіщення, якщо повтор придушено, інакше None"""
+        now = time.monotonic() if now is None else now
+        entry = self._entries.get(fingerprint)
+        if entry is None or now >= entry[1]:
+            return None
+        entry[2] += 1
+        self.suppressed_total += 1
+        return entry[0]
+
+    def alert_id(self, fingerprint: str) -> Optional[int]:
+        entry = self._entries.get(fingerprint)
+        return entry[0] if entry else None
+
+    def remember(self, fingerprint: str, alert_id: int, now: float = None):
+        now = time.monotonic() if now is None else now
+        self._entries[fingerprint] = [alert_id, now + self.window_seconds, 0]
+        self._entries.move_to_end(fingerprint)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def forget_alert(self, alert_id: int):
+        """Закриття вікон вирішеного сповіщення"""
+        for fingerprint in [fp for fp, entry in self._entries.items() if entry[0] == alert_id]:
+            del self._entries[fingerprint]
+
+    def take_pending(self, now: float = None) -> List[Tuple[int, str, int]]:
+        """Невраховані повтори (alert_id, відбиток, кількість); прострочені вікна видаляються"""
+        now = time.monotonic() if now is None else now
+        pending = [
+            (alert_id, fingerprint, count)
+            for (alert_id, fingerprint), count in self._unflushed.items()
+        ]
+        self._unflushed.clear()
+        for fingerprint in list(self._entries):
+            entry = self._entries[fingerprint]
+            if entry[2]:
+                pending.append((entry[0], fingerprint, entry[2]))
+                entry[2] = 0
+            if now >= entry[1]:
+                del self._entries[fingerprint]
+        return pending
+
+    def restore_pending(self, pending: List[Tuple[int, str, int]]):
+        """Повернення повторів, які не вдалося записати, до наступного take_pending
+
+        Вікно могло вже закритися або перейти до нового сповіщення, тому
+        повтори зберігаються окремо від вікон; найстаріші понад max_size
+        відкидаються.
+        """
+        for alert_id, fingerprint, count in pending:
+            key = (alert_id, fingerprint)
+            self._unflushed[key] = self._unflushed.get(key, 0) + count
+        while len(self._unflushed) > self.max_size:
+            self._unflushed.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+alert_suppressor = AlertSuppressor()
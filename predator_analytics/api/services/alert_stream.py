@@ -0,0 +1,229 @@
+import asyncio
+import json
+import logging
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+from uuid import uuid4
+
+import asyncpg
+
+from api.config import settings
+from .alert_dedup import alert_suppressor
+from .json_codecs import init_connection
+
+logger = logging.getLogger(__name__)
+
+ALERT_CHANNEL = "security_alerts"
+# Розмір payload NOTIFY обмежений 8000 байтами
+MAX_NOTIFY_PAYLOAD = 7900
+REPLAY_BUFFER_SIZE = 1000
+SUBSCRIBER_QUEUE_SIZE = 1000
+HEARTBEAT_SECONDS = 15
+RECONNECT_DELAY_SECONDS = 1
+MAX_RECONNECT_DELAY_SECONDS = 30
+
+SNAPSHOT_QUERY = """
+SELECT id, alert_type, severity, details, fingerprint, occurrence_count, created_at, last_seen_at
+FROM security_alerts
+WHERE NOT is_resolved
+"""
+
+
+def alert_event(event: str, alert: dict) -> dict:
+    """Подія стрічки: created / updated / resolved та поля сповіщення"""
+    return {"event": event, **{key: value for key, value in alert.items() if key != "inserted"}}
+
+
+async def notify_alert_events(conn, events: List[dict]):
+    """Надсилання подій у канал; доставляються слухачам після коміту транзакції"""
+    if not events:
+        return
+    payloads = []
+    for event in events:
+        payload = json.dumps(event, default=str)
+        if len(payload.encode()) > MAX_NOTIFY_PAYLOAD:
+            # Великі деталі не вміщаються в NOTIFY; клієнт отримає їх зі знімка
+            payload = json.dumps({**event, "details": None, "details_truncated": True}, default=str)
+        payloads.append(payload)
+    await conn.execute(
+        "SELECT pg_notify($1, payload) FROM unnest($2::text[]) AS payload",
+        ALERT_CHANNEL,
+        payloads,
+    )
+
+
+class Subscriber:
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+        # Клієнт, що не встигає читати, відключається і відновлюється зі знімка
+        self.lagged = False
+
+
+class AlertBroadcaster:
+    """Одне LISTEN-з'єднання на процес API, що розсилає події всім підписникам
+
+    Активні сповіщення тримаються в пам'яті: знімок завантажується один раз
+    при підключенні і далі оновлюється подіями, тож нові клієнти не
+    звертаються до бази даних.
+    """
+
+    def __init__(self):
+        self._token = uuid4().hex[:8]
+        self._seq = 0
+        self._buffer: deque = deque(maxlen=REPLAY_BUFFER_SIZE)
+        self._alerts: Dict[int, dict] = {}
+        self._subscribers: set = set()
+        self._task: Optional[asyncio.Task] = None
+        self._conn = None
+        self.ready = asyncio.Event()
+
+    @property
+    def last_event_id(self) -> str:
+        return f"{self._token}-{self._seq}"
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._conn and not self._conn.is_closed():
+            await self._conn.close()
+
+    async def _run(self):
+        delay = RECONNECT_DELAY_SECONDS
+        while True:
+            try:
+                self._conn = await asyncpg.connect(
+                    host=settings.POSTGRES_HOST,
+                    database=settings.POSTGRES_DB,
+                    user=settings.POSTGRES_USER,
+                    password=settings.POSTGRES_PASSWORD,
+                    port=settings.POSTGRES_PORT,
+                )
+                await init_connection(self._conn)
+                closed = asyncio.Event()
+                self._conn.add_termination_listener(lambda _: closed.set())
+                # Спершу LISTEN, потім знімок, щоб не пропустити події між ними
+                await self._conn.add_listener(ALERT_CHANNEL, self._on_notify)
+                rows = await self._conn.fetch(SNAPSHOT_QUERY)
+                self.load_snapshot([dict(row) for row in rows])
+                self.ready.set()
+                delay = RECONNECT_DELAY_SECONDS
+                logger.info("Слухач сповіщень підключено, активних: %s", len(self._alerts))
+                await closed.wait()
+                logger.warning("З'єднання слухача сповіщень втрачено")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Помилка слухача сповіщень: %s", e)
+            self.ready.clear()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY_SECONDS)
+
+    def load_snapshot(self, alerts: List[dict]):
+        """Заміна знімка; події, пропущені під час розриву, не відтворюються"""
+        self._alerts = {alert["id"]: alert for alert in alerts}
+        self._buffer.clear()
+        self._token = uuid4().hex[:8]
+        self._seq = 0
+        # Підключені клієнти мають перечитати знімок
+        for subscriber in self._subscribers:
+            subscriber.lagged = True
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            self.publish(json.loads(payload))
+        except Exception as e:
+            logger.error("Некоректна подія сповіщення: %s", e)
+
+    def publish(self, event: dict):
+        alert_id = event.get("id")
+        if event["event"] == "resolved":
+            self._alerts.pop(alert_id, None)
+            # Вікна придушення живуть у кожному процесі: повтори після
+            # вирішення мають відкрити нове сповіщення, а не зникнути
+            alert_suppressor.forget_alert(alert_id)
+        else:
+            current = self._alerts.setdefault(alert_id, {})
+            current.update(
+                {key: value for key, value in event.items() if key != "event" and value is not None}
+            )
+
+        self._seq += 1
+        message = (self.last_event_id, event["event"], event)
+        self._buffer.append(message)
+        for subscriber in self._subscribers:
+            if subscriber.lagged:
+                continue
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                subscriber.lagged = True
+
+    def snapshot(self) -> List[dict]:
+        return sorted(
+            self._alerts.values(),
+            key=lambda alert: (alert.get("severity", 0), str(alert.get("last_seen_at", ""))),
+            reverse=True,
+        )
+
+    def _replay(self, last_event_id: Optional[str]) -> Optional[List[tuple]]:
+        """Події після last_event_id з буфера або None, якщо потрібен повний знімок"""
+        if not last_event_id:
+            return None
+        token, _, seq = last_event_id.rpartition("-")
+        if token != self._token or not seq.isdigit():
+            return None
+        seq = int(seq)
+        if seq > self._seq:
+            return None
+        first_buffered = self._seq - len(self._buffer) + 1
+        if seq + 1 < first_buffered:
+            return None
+        return list(self._buffer)[seq + 1 - first_buffered :]
+
+    def subscribe(self, last_event_id: str = None) -> Tuple[Subscriber, List[tuple]]:
+        """Підписка: початкові події (відтворення або знімок) та черга наступних"""
+        subscriber = Subscriber()
+        initial = self._replay(last_event_id)
+        if initial is None:
+            initial = [(self.last_event_id, "snapshot", {"alerts": self.snapshot()})]
+        self._subscribers.add(subscriber)
+        return subscriber, initial
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+
+def format_sse(event_id: str, event: str, data) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def stream_alerts(broadcaster: "AlertBroadcaster", last_event_id: str = None):
+    """Генератор Server-Sent Events: знімок або відтворення, далі дельти"""
+    subscriber, initial = broadcaster.subscribe(last_event_id)
+    try:
+        for message in initial:
+            yield format_sse(*message)
+        while not subscriber.lagged:
+            try:
+                message = await asyncio.wait_for(subscriber.queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            yield format_sse(*message)
+    finally:
+        broadcaster.unsubscribe(subscriber)
+
+
+alert_broadcaster = AlertBroadcaster()
@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Dict, NamedTuple, Optional, Union
+
+from api.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _pyarrow():
+    # pyarrow необов'язковий: без нього стовпці передаються процесу через pickle
+    try:
+        import pyarrow
+
+        return pyarrow
+    except ImportError:
+        return None
+
+
+class SharedTable(NamedTuple):
+    """Дескриптор таблиці Arrow IPC у спільній пам'яті (передається процесу)"""
+
+    name: str
+    size: int
+
+
+# Джерело даних задачі: стовпці (малі дані, pickle) або таблиця у спільній пам'яті
+TableSource = Union[Dict[str, list], SharedTable]
+
+
+def records_to_columns(records) -> Dict[str, list]:
+    """Стовпцевий вигляд рядків asyncpg (Record не серіалізується pickle)"""
+    if not records:
+        return {}
+    names = list(records[0].keys())
+    return {name: [record[name] for record in records] for name in names}
+
+
+def share_columns(columns: Dict[str, list]) -> Optional[SharedMemory]:
+    """Запис стовпців у спільну пам'ять як потоку Arrow IPC
+
+    Розмір потоку визначається холостим записом, тож таблиця пишеться одразу
+    у сегмент без проміжного буфера. None — pyarrow недоступний або стовпці
+    не мають Arrow-типу (напр. різнорідний JSONB); тоді дані йдуть через pickle.
+    """
+    pa = _pyarrow()
+    if pa is None or not columns:
+        return None
+    try:
+        table = pa.table(columns)
+    except (pa.ArrowException, TypeError, ValueError) as e:
+        logger.debug("Стовпці не конвертуються в Arrow: %s", e)
+        return None
+
+    mock = pa.MockOutputStream()
+    with pa.ipc.new_stream(mock, table.schema) as writer:
+        writer.write_table(table)
+    shm = SharedMemory(create=True, size=max(mock.size(), 1))
+    buffer = pa.py_buffer(shm.buf)
+    try:
+        with pa.ipc.new_stream(pa.FixedSizeBufferWriter(buffer), table.schema) as writer:
+            writer.write_table(table)
+    finally:
+        buffer = None
+    return shm
+
+
+def release_shared(shm: SharedMemory):
+    shm.close()
+    shm.unlink()
+
+
+def _read_frame(shm: SharedMemory, size: int):
+    # Читач і таблиця живуть лише тут, щоб після DataFrame на сегмент ніщо не посилалося
+    pa = _pyarrow()
+    with pa.ipc.open_stream(pa.py_buffer(shm.buf)[:size]) as reader:
+        return reader.read_all().to_pandas()
+
+
+@contextmanager
+def open_frame(source: TableSource):
+    """DataFrame джерела; таблиця спільної пам'яті читається без копіювання буферів"""
+    import pandas as pd
+
+    if not isinstance(source, SharedTable):
+        yield pd.DataFrame(source)
+        return
+
+    shm = SharedMemory(name=source.name)
+    try:
+        yield _read_frame(shm, source.size)
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            # Стовпці DataFrame ще посилаються на сегмент: відображення
+            # звільниться разом з ними
+            pass
+
+
+class AnalyticsPool:
+    """Керований пул процесів для важкої аналітики (pandas, plotly, numpy)
+
+    Задачі з малими даними (менше inline_rows рядків) виконуються в потоці
+    цього процесу: пересилання дорожче за обчислення. Великі таблиці
+    передаються процесу через спільну пам'ять (Arrow IPC). Процес, що
+    перевищив тайм-аут, зупиняється разом з пулом — інакше він займав би
+    слот до завершення; задачі, перервані цим перезапуском, повторюються.
+    """
+
+    def __init__(self, workers: int = None, timeout: float = None, inline_rows: int = None):
+        self.workers = workers or settings.ANALYTICS_POOL_WORKERS
+        self.timeout = timeout or settings.ANALYTICS_TASK_TIMEOUT_SECONDS
+        self.inline_rows = settings.ANALYTICS_INLINE_ROWS if inline_rows is None else inline_rows
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.stats = {"inline": 0, "offloaded": 0, "shared_memory": 0, "timeouts": 0, "restarts": 0}
+        self.seconds = 0.0
+
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn, а не fork: у процесі API працюють потоки (логування,
+            # to_thread), і fork міг би скопіювати захоплені ними блокування
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def _restart(self, executor: ProcessPoolExecutor):
+        if self._executor is not executor:
+            return
+        self._executor = None
+        self.stats["restarts"] += 1
+        # ProcessPoolExecutor не скасовує задачу, що вже виконується: процеси зупиняються явно
+        for process in list((executor._processes or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, func: Callable, *args, size: int = 0, timeout: float = None):
+        """Виконання func(*args) у потоці (size < inline_rows) або в процесі пулу"""
+        timeout = timeout or self.timeout
+        started = time.perf_counter()
+        try:
+            if size < self.inline_rows:
+                self.stats["inline"] += 1
+                return await asyncio.wait_for(asyncio.to_thread(func, *args), timeout)
+            self.stats["offloaded"] += 1
+            return await self._submit(func, args, timeout)
+        finally:
+            self.seconds += time.perf_counter() - started
+
+    async def _submit(self, func: Callable, args: tuple, timeout: float):
+        loop = asyncio.get_running_loop()
+        for attempt in range(2):
+            executor = self.executor()
+            try:
+                return await asyncio.wait_for(
+                    loop.run_in_executor(executor, func, *args), timeout
+                )
+            except asyncio.TimeoutError:
+                self.stats["timeouts"] += 1
+                logger.error(
+                    "Аналітична задача %s перевищила тайм-аут %s с", func.__name__, timeout
+                )
+                self._restart(executor)
+                raise
+            except BrokenProcessPool:
+                # Пул зупинила чужа задача з тайм-аутом або аварія процесу: один повтор
+                self._restart(executor)
+                if attempt:
+                    raise
+
+    async def run_table(
+        self, func: Callable, columns: Dict[str, list], *args, timeout: float = None
+    ):
+        """func(source, *args) над стовпцями; великі таблиці — через спільну пам'ять"""
+        rows = len(next(iter(columns.values()), ()))
+        if rows < self.inline_rows:
+            return await self.run(func, columns, *args, size=rows, timeout=timeout)
+        shm = share_columns(columns)
+        if shm is None:
+            return await self.run(func, columns, *args, size=rows, timeout=timeout)
+        self.stats["shared_memory"] += 1
+        try:
+            source = SharedTable(shm.name, shm.size)
+            return await self.run(func, source, *args, size=rows, timeout=timeout)
+        finally:
+            release_shared(shm)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "workers": self.workers, "seconds": round(self.seconds, 3)}
+
+
+analytics_pool = AnalyticsPool()
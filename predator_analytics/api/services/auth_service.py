@@ -3,19 +3,33 @@ from datetime import datetime, timedelta, date, time
 from jose import jwt, JWTError
 from api.config import settings
 import asyncpg
+import asyncpg.pool
 from fastapi import HTTPException
 from passlib.context import CryptContext
 import re
+import json
 import logging
 from uuid import uuid4
-from typing import List, Optional, Dict
+from typing import Callable, List, Optional, Dict
 from asyncpg import create_pool
 from functools import wraps
 import secrets
-import pyotp
-import geoip2.database
-import pandas as pd
-import numpy as np
+from .security_counters import security_counters
+from .alert_dedup import alert_fingerprint, alert_suppressor
+from .alert_stream import alert_event, notify_alert_events
+from .logging_pipeline import setup_logging
+from .json_codecs import init_connection
+from .profiling import TracedConnection, span
+from .query_accounting import function_name, query_accounting
+
+# pyotp, geoip2, NumPy та аналітичні модулі імпортуються в функціях при
+# першому використанні, щоб не сповільнювати старт процесів API
+from .geo_utils import (
+    great_circle_km,
+    geohash_encode,
+    last_location_cache,
+    trusted_location_cache,
+)
 
 SECRET_KEY = os.getenv("SECRET_KEY")  # Ключ повинен бути заданий через змінну оточення
 ALGORITHM = "HS256"
@@ -27,8 +41,8 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 MAX_LOGIN_ATTEMPTS = 3
 BLOCK_TIME_MINUTES = 15
 
-# Налаштування логування
-logging.basicConfig(level=logging.INFO)
+# Налаштування логування (черга та окремий потік виводу)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # Створюємо пул з'єднань
@@ -46,19 +60,71 @@ async def get_pool():
             port=settings.POSTGRES_PORT,
             min_size=5,
             max_size=20,
+            # Кожен запит до бази записується як відрізок траси поточного запиту API
+            connection_class=TracedConnection,
+            # Кодеки jsonb/json на orjson: параметри JSONB передаються як dict
+            init=init_connection,
         )
     return _pool
 
 
+# Дії, відкладені до коміту транзакції with_connection: з'єднання -> callbacks
+_commit_callbacks: Dict[object, List[Callable[[], None]]] = {}
+
+
+def after_commit(conn, callback: Callable[[], None]):
+    """Виклик callback після коміту транзакції with_connection (без неї — одразу)
+
+    При відкаті callback не викликається: стан у пам'яті не посилається на
+    рядки, яких у базі немає.
+    """
+    callbacks = _commit_callbacks.get(conn)
+    if callbacks is None:
+        callback()
+    else:
+        callbacks.append(callback)
+
+
+# З'єднання, отримане з пулу (проксі) або створене напряму
+_CONNECTION_TYPES = (asyncpg.Connection, asyncpg.pool.PoolConnectionProxy)
+
+
 def with_connection(func):
+    # Запити, обміни з сервером, рядки та час acquire/execute/commit
+    # обліковуються окремо для кожної декорованої функції
+    name = function_name(func)
+
     @wraps(func)
     async def wrapper(*args, **kwargs):
+        if args and isinstance(args[0], _CONNECTION_TYPES):
+            # Виклик з іншої функції з власним з'єднанням: виконується в її
+            # транзакції, без другого з'єднання пулу
+            return await func(*args, **kwargs)
         pool = await get_pool()
-        async with pool.acquire() as conn:
-            async with conn.transaction():
+        with span(name), query_accounting.track(name) as call:
+            with call.timed("acquire"), span("db.acquire"):
+                conn = await pool.acquire()
+            callbacks = _commit_callbacks[conn] = []
+            try:
+                transaction = conn.transaction()
+                with call.timed("commit"):
+                    await transaction.start()
+                try:
+                    result = await func(conn, *args, **kwargs)
+                except BaseException:
+                    with call.timed("commit"):
+                        await transaction.rollback()
+                    raise
                 # Усі зміни автоматично комітяться після успішного виконання функції
-                result = await func(conn, *args, **kwargs)
+                with call.timed("commit"):
+                    await transaction.commit()
+                for callback in callbacks:
+                    callback()
                 return result
+            finally:
+                _commit_callbacks.pop(conn, None)
+                with call.timed("acquire"):
+                    await pool.release(conn)
     return wrapper
 
 
@@ -119,10 +185,77 @@ async def reset_login_attempts(conn, username: str):
     await conn.execute(query, username)
 
 
-@with_connection
+async def record_auth_event(
+    conn,
+    username: str,
+    success: bool,
+    user_id: int = None,
+    ip_address: str = None,
+    location_data: dict = None,
+    risk_score: int = None,
+):
+    """Запис події входу в append-only таблицю auth_events"""
+    location_data = location_data or {}
+    try:
+        await conn.execute(
+            """
+            INSERT INTO auth_events (
+                user_id, username, success, ip_address,
+                country_code, city, latitude, longitude, risk_score
+            )
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+            """,
+            user_id,
+            username,
+            success,
+            ip_address,
+            location_data.get("country_code"),
+            location_data.get("city"),
+            location_data.get("latitude"),
+            location_data.get("longitude"),
+            risk_score,
+        )
+    except Exception as e:
+        logger.error("Помилка при записі події входу: %s", e)
+
+
 async def authenticate_user(
+    username: str, password: str, totp_token: str = None, ip_address: str = None
+):
+    try:
+        return await _authenticate_user(username, password, totp_token, ip_address)
+    except HTTPException as e:
+        if hasattr(e, "failed_login"):
+            await record_failed_login(username, ip_address, **e.failed_login)
+        raise
+
+
+async def record_failed_login(
+    username: str, ip_address: str = None, user_id: int = None, bad_password: bool = False
+):
+    """Запис невдалого входу власним з'єднанням
+
+    Транзакцію входу вже відкочено, а її з'єднання повернуто в пул: вкладене
+    acquire при вичерпаному пулі блокувало б усі невдалі входи одночасно.
+    """
+    await security_counters.record_login(False)
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            if bad_password:
+                await update_login_attempts(conn, username, False)
+            await update_auth_statistics(conn, username, False)
+            await record_auth_event(conn, username, False, user_id, ip_address)
+    except Exception as e:
+        logger.error("Помилка при записі невдалого входу: %s", e)
+
+
+@with_connection
+async def _authenticate_user(
     conn, username: str, password: str, totp_token: str = None, ip_address: str = None
 ):
+    user = None
+    bad_password = False
     try:
         # Перевіряємо чи не заблокований користувач
         if not await check_login_attempts(conn, username):
@@ -131,16 +264,18 @@ async def authenticate_user(
                 detail=f"Забагато невдалих спроб. Спробуйте через {BLOCK_TIME_MINUTES} хвилин",
             )
 
-        query = "SELECT username, password_hash FROM users WHERE username = $1"
+        query = "SELECT id, username, password_hash FROM users WHERE username = $1"
         user = await conn.fetchrow(query, username)
 
-        if not user or not verify_password(password, user["password_hash"]):
-            await update_login_attempts(conn, username, False)
-            logger.warning(f"Невдала спроба входу для користувача: {username}")
+        with span("auth.verify_password"):
+            password_ok = bool(user) and verify_password(password, user["password_hash"])
+        if not password_ok:
+            bad_password = True
+            logger.warning("Невдала спроба входу для користувача: %s", username)
             raise HTTPException(status_code=401, detail="Невірні облікові дані")
 
         await update_login_attempts(conn, username, True)
-        logger.info(f"Успішний вхід користувача: {username}")
+        logger.info("Успішний вхід користувача: %s", username)
 
         # Перевіряємо чи увімкнено 2FA
         tfa_status = await conn.fetchrow(
@@ -156,25 +291,31 @@ async def authenticate_user(
                 )
 
         # Перевіряємо локацію
+        location_data = None
+        anomaly = None
         if ip_address:
-            location_data = await log_user_location(conn, username, ip_address)
+            with span("auth.lookup_ip_location"):
+                location_data = lookup_ip_location(ip_address)
             if location_data:
+                # Перевірка до оновлення профілю, щоб порівнювати з попереднім входом
                 anomaly = await detect_location_anomalies(conn, username, location_data)
                 if anomaly:
-                    logger.warning(f"Виявлено аномалію для користувача {username}: {anomaly}")
+                    logger.warning("Виявлено аномалію для користувача %s: %s", username, anomaly)
+                await log_user_location(conn, username, ip_address, location_data)
 
         # Оновлюємо статистику після успішної автентифікації
         await update_auth_statistics(conn, username, True, ip_address)
+        await security_counters.record_login(True)
 
         # Аналізуємо поведінку та розраховуємо ризик
         current_activity = {
             "ip_address": ip_address,
-            "location_data": (
-                await log_user_location(conn, username, ip_address) if ip_address else None
-            ),
+            "location_data": location_data,
+            "location_anomaly": anomaly,
         }
 
-        risk_score = await calculate_risk_score(conn, username, current_activity)
+        with span("auth.calculate_risk_score"):
+            risk_score = await calculate_risk_score(conn, username, current_activity)
 
         # Якщо ризик високий, вимагаємо додаткову автентифікацію
         if risk_score >= 60 and not totp_token:
@@ -193,16 +334,24 @@ async def authenticate_user(
 
         detected_patterns = await detect_attack_patterns(conn, username, activity_data)
         if detected_patterns:
-            logger.warning(f"Виявлено потенційні атаки для {username}: {detected_patterns}")
+            logger.warning("Виявлено потенційні атаки для %s: %s", username, detected_patterns)
+
+        await record_auth_event(
+            conn, username, True, user["id"], ip_address, location_data, risk_score
+        )
 
         return {"username": user["username"]}
 
     except HTTPException as e:
-        # Оновлюємо статистику після невдалої спроби
-        await update_auth_statistics(conn, username, False)
+        # Транзакцію буде відкочено: невдалу спробу запише authenticate_user
+        # після повернення з'єднання в пул
+        e.failed_login = {
+            "user_id": user["id"] if user else None,
+            "bad_password": bad_password,
+        }
         raise
     except Exception as e:
-        logger.error(f"Помилка при автентифікації: {str(e)}")
+        logger.error("Помилка при автентифікації: %s", e)
         raise HTTPException(status_code=500, detail="Внутрішня помилка сервера")
 
 
@@ -230,7 +379,7 @@ async def refresh_token(refresh_token: str):
     except JWTError:
         raise HTTPException(status_code=401, detail="Невалідний токен оновлення")
     except Exception as e:
-        logger.error(f"Помилка при оновленні токену: {str(e)}")
+        logger.error("Помилка при оновленні токену: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при оновленні токену")
 
 
@@ -241,7 +390,7 @@ async def deactivate_token(token: str):
             query = "INSERT INTO deactivated_tokens (token) VALUES ($1)"
             await conn.execute(query, token)
     except Exception as e:
-        logger.error(f"Помилка при деактивації токена: {str(e)}")
+        logger.error("Помилка при деактивації токена: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при деактивації токену")
 
 
@@ -264,7 +413,7 @@ async def verify_token(conn, token: str):
     except JWTError:
         raise HTTPException(status_code=401, detail="Невалідний токен")
     except Exception as e:
-        logger.error(f"Помилка при перевірці токену: {str(e)}")
+        logger.error("Помилка при перевірці токену: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при перевірці токену")
 
 
@@ -275,6 +424,7 @@ async def create_user_session(conn, username: str, token: str):
     VALUES ($1, $2, $3, $4)
     """
     await conn.execute(query, session_id, username, token, datetime.utcnow())
+    await security_counters.record_session()
     return session_id
 
 
@@ -298,9 +448,9 @@ async def terminate_all_sessions(username: str):
             # Видаляємо сесії
             await conn.execute("DELETE FROM user_sessions WHERE username = $1", username)
 
-            logger.info(f"Всі сесії користувача {username} завершено")
+            logger.info("Всі сесії користувача %s завершено", username)
     except Exception as e:
-        logger.error(f"Помилка при завершенні сесій: {str(e)}")
+        logger.error("Помилка при завершенні сесій: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при завершенні сесій")
 
 
@@ -357,7 +507,7 @@ async def cleanup_expired_data(conn):
 
             logger.info("Очищення застарілих даних завершено")
     except Exception as e:
-        logger.error(f"Помилка при очищенні даних: {str(e)}")
+        logger.error("Помилка при очищенні даних: %s", e)
 
 
 async def create_user(conn, username: str, password: str, email: str):
@@ -373,7 +523,7 @@ async def create_user(conn, username: str, password: str, email: str):
     except asyncpg.UniqueViolationError:
         raise HTTPException(status_code=400, detail="Користувач з таким ім'ям вже існує")
     except Exception as e:
-        logger.error(f"Помилка при створенні користувача: {str(e)}")
+        logger.error("Помилка при створенні користувача: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при створенні користувача")
 
 
@@ -388,6 +538,22 @@ async def get_user_roles(conn, username: str) -> List[str]:
     return [role["role_name"] for role in roles]
 
 
+async def get_user_roles_bulk(conn, usernames: List[str]) -> Dict[str, List[str]]:
+    """Ролі кількох користувачів одним запитом"""
+    rows = await conn.fetch(
+        """
+        SELECT ur.username, ARRAY_AGG(r.role_name ORDER BY r.role_name) as roles
+        FROM user_roles ur
+        JOIN roles r ON ur.role_id = r.role_id
+        WHERE ur.username = ANY($1::varchar[])
+        GROUP BY ur.username
+        """,
+        usernames,
+    )
+    roles = {row["username"]: list(row["roles"]) for row in rows}
+    return {username: roles.get(username, []) for username in usernames}
+
+
 async def check_permission(conn, username: str, required_permission: str) -> bool:
     query = """
     SELECT EXISTS (
@@ -408,9 +574,9 @@ async def assign_role(conn, username: str, role_name: str):
         SELECT $1, role_id FROM roles WHERE role_name = $2
         """
         await conn.execute(query, username, role_name)
-        logger.info(f"Роль {role_name} призначено користувачу {username}")
+        logger.info("Роль %s призначено користувачу %s", role_name, username)
     except Exception as e:
-        logger.error(f"Помилка при призначенні ролі: {str(e)}")
+        logger.error("Помилка при призначенні ролі: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при призначенні ролі")
 
 
@@ -442,7 +608,7 @@ async def get_all_roles(conn) -> List[dict]:
         roles = await conn.fetch(query)
         return [dict(role) for role in roles]
     except Exception as e:
-        logger.error(f"Помилка при отриманні ролей: {str(e)}")
+        logger.error("Помилка при отриманні ролей: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при отриманні ролей")
 
 
@@ -455,12 +621,12 @@ async def create_role(conn, role_name: str, description: str = None):
         RETURNING role_id
         """
         role_id = await conn.fetchval(query, role_name, description)
-        logger.info(f"Створено нову роль: {role_name}")
+        logger.info("Створено нову роль: %s", role_name)
         return role_id
     except asyncpg.UniqueViolationError:
         raise HTTPException(status_code=400, detail="Роль з таким ім'ям вже існує")
     except Exception as e:
-        logger.error(f"Помилка при створенні ролі: {str(e)}")
+        logger.error("Помилка при створенні ролі: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при створенні ролі")
 
 
@@ -474,9 +640,9 @@ async def assign_permission_to_role(conn, role_name: str, permission_name: str):
         WHERE r.role_name = $1 AND p.permission_name = $2
         """
         await conn.execute(query, role_name, permission_name)
-        logger.info(f"Додано дозвіл {permission_name} до ролі {role_name}")
+        logger.info("Додано дозвіл %s до ролі %s", permission_name, role_name)
     except Exception as e:
-        logger.error(f"Помилка при призначенні дозволу: {str(e)}")
+        logger.error("Помилка при призначенні дозволу: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при призначенні дозволу")
 
 
@@ -493,7 +659,7 @@ async def get_role_permissions(conn, role_name: str) -> List[str]:
         permissions = await conn.fetch(query, role_name)
         return [p["permission_name"] for p in permissions]
     except Exception as e:
-        logger.error(f"Помилка при отриманні дозволів: {str(e)}")
+        logger.error("Помилка при отриманні дозволів: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при отриманні дозволів")
 
 
@@ -509,12 +675,12 @@ async def update_role(conn, role_id: int, role_name: str, description: str = Non
         updated = await conn.fetchval(query, role_id, role_name, description)
         if not updated:
             raise HTTPException(status_code=404, detail="Роль не знайдено")
-        logger.info(f"Оновлено роль: {role_name}")
+        logger.info("Оновлено роль: %s", role_name)
         return updated
     except asyncpg.UniqueViolationError:
         raise HTTPException(status_code=400, detail="Роль з таким ім'ям вже існує")
     except Exception as e:
-        logger.error(f"Помилка при оновленні ролі: {str(e)}")
+        logger.error("Помилка при оновленні ролі: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при оновленні ролі")
 
 
@@ -525,9 +691,9 @@ async def delete_role(conn, role_name: str):
         deleted = await conn.fetchval(query, role_name)
         if not deleted:
             raise HTTPException(status_code=404, detail="Роль не знайдено")
-        logger.info(f"Видалено роль: {role_name}")
+        logger.info("Видалено роль: %s", role_name)
     except Exception as e:
-        logger.error(f"Помилка при видаленні ролі: {str(e)}")
+        logger.error("Помилка при видаленні ролі: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при видаленні ролі")
 
 
@@ -540,9 +706,9 @@ async def remove_permission_from_role(conn, role_name: str, permission_name: str
         AND permission_id = (SELECT permission_id FROM permissions WHERE permission_name = $2)
         """
         await conn.execute(query, role_name, permission_name)
-        logger.info(f"Видалено дозвіл {permission_name} з ролі {role_name}")
+        logger.info("Видалено дозвіл %s з ролі %s", permission_name, role_name)
     except Exception as e:
-        logger.error(f"Помилка при видаленні дозволу: {str(e)}")
+        logger.error("Помилка при видаленні дозволу: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при видаленні дозволу")
 
 
@@ -556,9 +722,9 @@ async def log_user_activity(
         VALUES ($1, $2, $3, $4)
         """
         await conn.execute(query, username, action, details, ip_address)
-        logger.info(f"Активність користувача {username}: {action}")
+        logger.info("Активність користувача %s: %s", username, action)
     except Exception as e:
-        logger.error(f"Помилка при логуванні активності: {str(e)}")
+        logger.error("Помилка при логуванні активності: %s", e)
 
 
 @with_connection
@@ -590,7 +756,7 @@ async def get_user_activity(
         activities = await conn.fetch(query, *params)
         return [dict(activity) for activity in activities]
     except Exception as e:
-        logger.error(f"Помилка при отриманні активності: {str(e)}")
+        logger.error("Помилка при отриманні активності: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при отриманні активності")
 
 
@@ -605,11 +771,11 @@ async def block_user(conn, username: str, blocked_by: str):
         await log_user_activity(conn, blocked_by, "block_user", {"blocked_username": username})
 
         await terminate_all_sessions(username)
-        logger.info(f"Користувача {username} заблоковано користувачем {blocked_by}")
+        logger.info("Користувача %s заблоковано користувачем %s", username, blocked_by)
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Помилка при блокуванні користувача: {str(e)}")
+        logger.error("Помилка при блокуванні користувача: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при блокуванні користувача")
 
 
@@ -623,9 +789,9 @@ async def remove_user_role(conn, username: str, role_name: str):
         )
         """
         await conn.execute(query, username, role_name)
-        logger.info(f"Видалено роль {role_name} у користувача {username}")
+        logger.info("Видалено роль %s у користувача %s", role_name, username)
     except Exception as e:
-        logger.error(f"Помилка при видаленні ролі користувача: {str(e)}")
+        logger.error("Помилка при видаленні ролі користувача: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при видаленні ролі")
 
 
@@ -659,7 +825,7 @@ async def create_password_reset_token(conn, username: str) -> str:
 
         return token
     except Exception as e:
-        logger.error(f"Помилка при створенні токену скидання паролю: {str(e)}")
+        logger.error("Помилка при створенні токену скидання паролю: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при створенні токену")
 
 
@@ -688,7 +854,7 @@ async def verify_password_reset_token(conn, token: str) -> str:
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Помилка при перевірці токену: {str(e)}")
+        logger.error("Помилка при перевірці токену: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при перевірці токену")
 
 
@@ -716,11 +882,11 @@ async def reset_password(conn, token: str, new_password: str):
         # Завершуємо всі сесії користувача
         await terminate_all_sessions(username)
 
-        logger.info(f"Пароль успішно скинуто для користувача: {username}")
+        logger.info("Пароль успішно скинуто для користувача: %s", username)
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Помилка при скиданні паролю: {str(e)}")
+        logger.error("Помилка при скиданні паролю: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при скиданні паролю")
 
 
@@ -748,11 +914,11 @@ async def change_password(conn, username: str, current_password: str, new_passwo
         # Логуємо подію
         await log_user_activity(conn, username, "password_change")
 
-        logger.info(f"Пароль успішно змінено для користувача: {username}")
+        logger.info("Пароль успішно змінено для користувача: %s", username)
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Помилка при зміні паролю: {str(e)}")
+        logger.error("Помилка при зміні паролю: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при зміні паролю")
 
 
@@ -760,6 +926,8 @@ async def change_password(conn, username: str, current_password: str, new_passwo
 async def setup_2fa(conn, username: str) -> dict:
     """Налаштування 2FA для користувача"""
     try:
+        import pyotp
+
         # Генеруємо секретний ключ
         secret = pyotp.random_base32()
 
@@ -784,7 +952,7 @@ async def setup_2fa(conn, username: str) -> dict:
             "backup_codes": backup_codes,
         }
     except Exception as e:
-        logger.error(f"Помилка при налаштуванні 2FA: {str(e)}")
+        logger.error("Помилка при налаштуванні 2FA: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при налаштуванні 2FA")
 
 
@@ -810,11 +978,13 @@ async def verify_2fa_token(conn, username: str, token: str) -> bool:
             )
             return True
 
+        import pyotp
+
         # Перевіряємо TOTP токен
         totp = pyotp.TOTP(result["secret_key"])
         return totp.verify(token)
     except Exception as e:
-        logger.error(f"Помилка при перевірці 2FA: {str(e)}")
+        logger.error("Помилка при перевірці 2FA: %s", e)
         return False
 
 
@@ -829,7 +999,7 @@ async def enable_2fa(conn, username: str, token: str) -> bool:
             await log_user_activity(conn, username, "enable_2fa")
             return True
         except Exception as e:
-            logger.error(f"Помилка при активації 2FA: {str(e)}")
+            logger.error("Помилка при активації 2FA: %s", e)
             raise HTTPException(status_code=500, detail="Помилка при активації 2FA")
     return False
 
@@ -843,7 +1013,7 @@ async def disable_2fa(conn, username: str):
         )
         await log_user_activity(conn, username, "disable_2fa")
     except Exception as e:
-        logger.error(f"Помилка при вимкненні 2FA: {str(e)}")
+        logger.error("Помилка при вимкненні 2FA: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при вимкненні 2FA")
 
 
@@ -870,7 +1040,37 @@ async def get_2fa_status(conn, username: str) -> dict:
             "updated_at": result["updated_at"],
         }
     except Exception as e:
-        logger.error(f"Помилка при отриманні статусу 2FA: {str(e)}")
+        logger.error("Помилка при отриманні статусу 2FA: %s", e)
+        raise HTTPException(status_code=500, detail="Помилка при отриманні статусу 2FA")
+
+
+@with_connection
+async def get_2fa_status_bulk(conn, usernames: List[str]) -> Dict[str, dict]:
+    """Статус 2FA кількох користувачів одним запитом"""
+    try:
+        rows = await conn.fetch(
+            """
+            SELECT username, is_enabled, created_at, updated_at
+            FROM two_factor_auth
+            WHERE username = ANY($1::varchar[])
+            """,
+            usernames,
+        )
+        statuses = {
+            row["username"]: {
+                "is_enabled": row["is_enabled"],
+                "is_configured": True,
+                "created_at": row["created_at"],
+                "updated_at": row["updated_at"],
+            }
+            for row in rows
+        }
+        return {
+            username: statuses.get(username, {"is_enabled": False, "is_configured": False})
+            for username in usernames
+        }
+    except Exception as e:
+        logger.error("Помилка при отриманні статусу 2FA: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при отриманні статусу 2FA")
 
 
@@ -890,7 +1090,7 @@ async def cleanup_2fa_data():
 
             logger.info("Очищення старих даних 2FA завершено")
     except Exception as e:
-        logger.error(f"Помилка при очищенні даних 2FA: {str(e)}")
+        logger.error("Помилка при очищенні даних 2FA: %s", e)
 
 
 @with_connection
@@ -906,7 +1106,7 @@ async def regenerate_backup_codes(conn, username: str) -> List[str]:
         await log_user_activity(conn, username, "regenerate_2fa_backup_codes")
         return new_backup_codes
     except Exception as e:
-        logger.error(f"Помилка при генерації резервних кодів: {str(e)}")
+        logger.error("Помилка при генерації резервних кодів: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при генерації резервних кодів")
 
 
@@ -936,13 +1136,47 @@ async def get_auth_statistics(conn, username: str) -> dict:
 
         return dict(result)
     except Exception as e:
-        logger.error(f"Помилка при отриманні статистики: {str(e)}")
+        logger.error("Помилка при отриманні статистики: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при отриманні статистики")
 
 
 @with_connection
+async def get_auth_statistics_bulk(conn, usernames: List[str]) -> Dict[str, dict]:
+    """Статистика автентифікації кількох користувачів одним запитом"""
+    try:
+        rows = await conn.fetch(
+            """
+            SELECT username, successful_logins, failed_logins,
+                   last_successful_login, last_failed_login,
+                   last_ip_address
+            FROM auth_statistics
+            WHERE username = ANY($1::varchar[])
+            """,
+            usernames,
+        )
+        statistics = {row["username"]: dict(row) for row in rows}
+        for row in statistics.values():
+            del row["username"]
+        return {
+            username: statistics.get(
+                username,
+                {
+                    "successful_logins": 0,
+                    "failed_logins": 0,
+                    "last_successful_login": None,
+                    "last_failed_login": None,
+                    "last_ip_address": None,
+                },
+            )
+            for username in usernames
+        }
+    except Exception as e:
+        logger.error("Помилка при отриманні статистики: %s", e)
+        raise HTTPException(status_code=500, detail="Помилка при отриманні статистики")
+
+
 async def update_auth_statistics(conn, username: str, success: bool, ip_address: str = None):
-    """Оновлення статистики автентифікації"""
+    """Оновлення статистики автентифікації на з'єднанні викликача"""
     try:
         if success:
             query = """
@@ -966,7 +1200,7 @@ async def update_auth_statistics(conn, username: str, success: bool, ip_address:
             """
             await conn.execute(query, username)
     except Exception as e:
-        logger.error(f"Помилка при оновленні статистики: {str(e)}")
+        logger.error("Помилка при оновленні статистики: %s", e)
 
 
 @with_connection
@@ -980,7 +1214,7 @@ async def update_session_activity(conn, session_id: str, ip_address: str = None)
         """
         await conn.execute(query, session_id, ip_address)
     except Exception as e:
-        logger.error(f"Помилка при оновленні активності сесії: {str(e)}")
+        logger.error("Помилка при оновленні активності сесії: %s", e)
 
 
 @with_connection
@@ -996,7 +1230,31 @@ async def get_active_sessions(conn, username: str) -> List[dict]:
         sessions = await conn.fetch(query, username)
         return [dict(session) for session in sessions]
     except Exception as e:
-        logger.error(f"Помилка при отриманні активних сесій: {str(e)}")
+        logger.error("Помилка при отриманні активних сесій: %s", e)
+        raise HTTPException(status_code=500, detail="Помилка при отриманні сесій")
+
+
+@with_connection
+async def get_active_sessions_bulk(conn, usernames: List[str]) -> Dict[str, List[dict]]:
+    """Активні сесії кількох користувачів одним запитом"""
+    try:
+        rows = await conn.fetch(
+            """
+            SELECT username, session_id, created_at, last_activity, ip_address,
+                   device_info, is_suspicious
+            FROM user_sessions
+            WHERE username = ANY($1::varchar[]) AND last_activity > NOW() - INTERVAL '24 hours'
+            ORDER BY username, last_activity DESC
+            """,
+            usernames,
+        )
+        sessions = {username: [] for username in usernames}
+        for row in rows:
+            session = dict(row)
+            sessions[session.pop("username")].append(session)
+        return sessions
+    except Exception as e:
+        logger.error("Помилка при отриманні активних сесій: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при отриманні сесій")
 
 
@@ -1017,8 +1275,10 @@ async def mark_session_suspicious(conn, session_id: str, activity_type: str, det
             """
             await conn.execute(query, session_id, activity_type, details)
 
+        await security_counters.record_suspicious_session()
+
     except Exception as e:
-        logger.error(f"Помилка при позначенні підозрілої сесії: {str(e)}")
+        logger.error("Помилка при позначенні підозрілої сесії: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при обробці підозрілої активності")
 
 
@@ -1053,7 +1313,7 @@ async def analyze_user_sessions(conn, username: str) -> dict:
             "activity_stats": [dict(stat) for stat in activity_stats],
         }
     except Exception as e:
-        logger.error(f"Помилка при аналізі сесій: {str(e)}")
+        logger.error("Помилка при аналізі сесій: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при аналізі сесій")
 
 
@@ -1064,61 +1324,131 @@ MAX_DISTANCE_KM = 500  # Максимальна відстань між логі
 GEOIP_DATABASE = "/path/to/GeoLite2-City.mmdb"
 
 
+# Скільки входів з локації потрібно, щоб вона вважалась довіреною
+TRUSTED_LOCATION_MIN_HITS = 5
+
+_geoip_reader = None
+
+
+def lookup_ip_location(ip_address: str) -> Optional[dict]:
+    """Визначення локації IP за базою GeoIP (читач відкривається один раз)"""
+    global _geoip_reader
+    try:
+        if _geoip_reader is None:
+            import geoip2.database
+
+            _geoip_reader = geoip2.database.Reader(GEOIP_DATABASE)
+        response = _geoip_reader.city(ip_address)
+        if response.location.latitude is None:
+            return None
+        return {
+            "country_code": response.country.iso_code,
+            "city": response.city.name,
+            "latitude": response.location.latitude,
+            "longitude": response.location.longitude,
+            "location_key": geohash_encode(
+                response.location.latitude, response.location.longitude
+            ),
+        }
+    except Exception as e:
+        logger.error("Помилка при визначенні локації: %s", e)
+        return None
+
+
 @with_connection
-async def log_user_location(conn, username: str, ip_address: str) -> dict:
-    """Логування та аналіз географічної локації користувача"""
-    try:
-        with geoip2.database.Reader(GEOIP_DATABASE) as reader:
-            response = reader.city(ip_address)
-            location_data = {
-                "country_code": response.country.iso_code,
-                "city": response.city.name,
-                "latitude": response.location.latitude,
-                "longitude": response.location.longitude,
-            }
+async def log_user_location(
+    conn, username: str, ip_address: str, location_data: dict = None
+) -> dict:
+    """Оновлення профілю локацій користувача (один рядок на місто/geohash)"""
+    try:
+        location_data = location_data or lookup_ip_location(ip_address)
+        if not location_data:
+            return None
 
-            query = """
-            INSERT INTO user_locations (username, ip_address, country_code, city, latitude, longitude)
-            VALUES ($1, $2, $3, $4, $5, $6)
-            RETURNING id
+        hit_count = await conn.fetchval(
             """
-            await conn.execute(
-                query,
-                username,
-                ip_address,
-                location_data["country_code"],
-                location_data["city"],
-                location_data["latitude"],
-                location_data["longitude"],
+            INSERT INTO user_location_profiles (
+                username, location_key, country_code, city,
+                latitude, longitude, last_ip_address
             )
+            VALUES ($1, $2, $3, $4, $5, $6, $7)
+            ON CONFLICT (username, location_key) DO UPDATE SET
+                last_seen = NOW(),
+                hit_count = user_location_profiles.hit_count + 1,
+                last_ip_address = EXCLUDED.last_ip_address
+            RETURNING hit_count
+            """,
+            username,
+            location_data["location_key"],
+            location_data["country_code"],
+            location_data["city"],
+            location_data["latitude"],
+            location_data["longitude"],
+            ip_address,
+        )
+        if hit_count >= TRUSTED_LOCATION_MIN_HITS:
+            trusted_location_cache.add(username, location_data["location_key"])
 
-            return location_data
+        return location_data
     except Exception as e:
-        logger.error(f"Помилка при логуванні локації: {str(e)}")
+        logger.error("Помилка при логуванні локації: %s", e)
+        return None
+
+
+async def load_location_profile(conn, username: str) -> Optional[tuple]:
+    """Завантаження профілю локацій: довірені ключі в кеш, повертає останню локацію"""
+    rows = await conn.fetch(
+        """
+        SELECT location_key, latitude, longitude, last_seen, hit_count, is_trusted
+        FROM user_location_profiles
+        WHERE username = $1
+        ORDER BY last_seen DESC
+        """,
+        username,
+    )
+    trusted_location_cache.set(
+        username,
+        (
+            row["location_key"]
+            for row in rows
+            if row["is_trusted"] or row["hit_count"] >= TRUSTED_LOCATION_MIN_HITS
+        ),
+    )
+    if not rows:
         return None
+    return float(rows[0]["latitude"]), float(rows[0]["longitude"]), rows[0]["last_seen"]
+
+
+async def get_last_location(conn, username: str) -> Optional[tuple]:
+    """Остання відома локація користувача: спершу свіжий кеш, потім профіль локацій"""
+    cached = last_location_cache.get(username)
+    if cached and trusted_location_cache.get(username) is not None:
+        return cached
+    return await load_location_profile(conn, username)
 
 
 @with_connection
 async def detect_location_anomalies(conn, username: str, current_location: dict) -> Optional[dict]:
     """Виявлення аномалій на основі географічної локації"""
     try:
-        query = """
-        SELECT latitude, longitude, last_seen
-        FROM user_locations
-        WHERE username = $1
-        ORDER BY last_seen DESC
-        LIMIT 1
-        """
-        last_location = await conn.fetchrow(query, username)
+        if not current_location or current_location.get("latitude") is None:
+            return None
 
-        if last_location:
-            from geopy.distance import geodesic
+        last_location = await get_last_location(conn, username)
+        now = datetime.utcnow()
+        current_point = (current_location["latitude"], current_location["longitude"])
+        # Кеш оновлюється лише після коміту, щоб відкат не лишив у ньому локацію
+        after_commit(conn, lambda: last_location_cache.set(username, *current_point, now))
 
-            last_point = (last_location["latitude"], last_location["longitude"])
-            current_point = (current_location["latitude"], current_location["longitude"])
+        # Вхід з довіреної локації не вважається неможливим переміщенням
+        trusted = trusted_location_cache.get(username) or set()
+        if current_location.get("location_key") in trusted:
+            return None
 
-            distance = geodesic(last_point, current_point).kilometers
-            time_diff = datetime.utcnow() - last_location["last_seen"]
+        if last_location:
+            last_point = last_location[:2]
+            distance = great_circle_km(*last_point, *current_point)
+            time_diff = now - last_location[2].replace(tzinfo=None)
 
             if distance > MAX_DISTANCE_KM and time_diff.total_seconds() < 3600:
                 await create_anomaly(
@@ -1139,10 +1469,61 @@ async def detect_location_anomalies(conn, username: str, current_location: dict)
                     "time_diff": time_diff.total_seconds(),
                 }
     except Exception as e:
-        logger.error(f"Помилка при виявленні аномалій локації: {str(e)}")
+        logger.error("Помилка при виявленні аномалій локації: %s", e)
     return None
 
 
+@with_connection
+async def detect_impossible_travel(conn, start: datetime, end: datetime) -> List[dict]:
+    """Пакетний пошук неможливих переміщень серед усіх входів за період"""
+    import numpy as np
+    from .geo_utils import find_impossible_travel
+
+    try:
+        rows = await conn.fetch(
+            """
+            SELECT username, EXTRACT(EPOCH FROM occurred_at) as ts,
+                   latitude::float8 as latitude, longitude::float8 as longitude
+            FROM auth_events
+            WHERE occurred_at BETWEEN $1 AND $2
+            AND success AND latitude IS NOT NULL
+            """,
+            start,
+            end,
+        )
+        if len(rows) < 2:
+            return []
+
+        usernames = np.array([row["username"] for row in rows])
+        timestamps = np.array([row["ts"] for row in rows], dtype=np.float64)
+        latitudes = np.array([row["latitude"] for row in rows], dtype=np.float64)
+        longitudes = np.array([row["longitude"] for row in rows], dtype=np.float64)
+
+        pairs = find_impossible_travel(
+            usernames, timestamps, latitudes, longitudes, MAX_DISTANCE_KM, 3600
+        )
+        return [
+            {
+                "username": str(usernames[current]),
+                "from_location": (float(latitudes[previous]), float(longitudes[previous])),
+                "to_location": (float(latitudes[current]), float(longitudes[current])),
+                "from_time": datetime.utcfromtimestamp(timestamps[previous]),
+                "to_time": datetime.utcfromtimestamp(timestamps[current]),
+                "distance": float(distance),
+                "time_diff": float(interval),
+            }
+            for previous, current, distance, interval in zip(
+                pairs["previous"],
+                pairs["current"],
+                pairs["distance_km"],
+                pairs["interval_seconds"],
+            )
+        ]
+    except Exception as e:
+        logger.error("Помилка при пакетному пошуку неможливих переміщень: %s", e)
+        return []
+
+
 @with_connection
 async def create_anomaly(
     conn, username: str, anomaly_type: str, severity: int, details: dict = None
@@ -1161,7 +1542,7 @@ async def create_anomaly(
 
         return anomaly_id
     except Exception as e:
-        logger.error(f"Помилка при створенні аномалії: {str(e)}")
+        logger.error("Помилка при створенні аномалії: %s", e)
         return None
 
 
@@ -1176,7 +1557,7 @@ async def resolve_anomaly(conn, anomaly_id: int, resolved_by: str):
         """
         await conn.execute(query, anomaly_id, resolved_by)
     except Exception as e:
-        logger.error(f"Помилка при вирішенні аномалії: {str(e)}")
+        logger.error("Помилка при вирішенні аномалії: %s", e)
 
 
 @with_connection
@@ -1214,56 +1595,25 @@ async def analyze_user_behavior(conn, username: str) -> dict:
 
         return {"typical_hours": typical_hours}
     except Exception as e:
-        logger.error(f"Помилка при аналізі поведінки: {str(e)}")
+        logger.error("Помилка при аналізі поведінки: %s", e)
         return None
 
 
 @with_connection
 async def calculate_risk_score(conn, username: str, current_activity: dict) -> int:
-    """Розрахунок оцінки ризику для поточної активності"""
-    try:
-        risk_score = 0
-        risk_factors = []
-
-        # Перевіряємо час доступу
-        current_hour = datetime.utcnow().hour
-        patterns = await conn.fetchrow(
-            """
-            SELECT pattern_data
-            FROM user_behavior_patterns
-            WHERE username = $1 AND pattern_type = 'login_time'
-        """,
-            username,
-        )
-
-        if patterns and current_hour not in patterns["pattern_data"].get("typical_hours", []):
-            risk_score += 20
-            risk_factors.append("unusual_time")
+    """Розрахунок оцінки ризику для поточної активності
 
-        # Перевіряємо геолокацію
-        if current_activity.get("ip_address"):
-            location_check = await detect_location_anomalies(
-                conn, username, current_activity.get("location_data", {})
-            )
-            if location_check:
-                risk_score += 40
-                risk_factors.append("suspicious_location")
-
-        # Зберігаємо оцінку ризику
-        await conn.execute(
-            """
-            INSERT INTO risk_assessments (username, risk_score, risk_factors)
-            VALUES ($1, $2, $3)
-        """,
-            username,
-            risk_score,
-            {"factors": risk_factors},
-        )
+    current_activity може містити location_anomaly, вже виявлену під час
+    автентифікації, щоб не повторювати перевірку локації.
+    """
+    from .risk_engine import risk_engine, build_context
 
+    try:
+        risk_score, _ = await risk_engine.assess(conn, username, build_context(current_activity))
         return risk_score
 
     except Exception as e:
-        logger.error(f"Помилка при розрахунку ризику: {str(e)}")
+        logger.error("Помилка при розрахунку ризику: %s", e)
         return 0
 
 
@@ -1281,10 +1631,391 @@ async def get_user_risk_history(conn, username: str) -> List[dict]:
         history = await conn.fetch(query, username)
         return [dict(record) for record in history]
     except Exception as e:
-        logger.error(f"Помилка при отриманні історії ризиків: {str(e)}")
+        logger.error("Помилка при отриманні історії ризиків: %s", e)
         return []
 
 
+@with_connection
+async def get_user_risk_history_bulk(
+    conn, usernames: List[str], limit: int = 10
+) -> Dict[str, List[dict]]:
+    """Останні оцінки ризику кількох користувачів одним запитом"""
+    try:
+        rows = await conn.fetch(
+            """
+            SELECT u.username, h.risk_score, h.risk_factors, h.assessed_at
+            FROM unnest($1::varchar[]) AS u(username)
+            CROSS JOIN LATERAL (
+                SELECT risk_score, risk_factors, assessed_at
+                FROM risk_assessments ra
+                WHERE ra.username = u.username
+                ORDER BY assessed_at DESC
+                LIMIT $2
+            ) h
+            ORDER BY u.username, h.assessed_at DESC
+            """,
+            usernames,
+            limit,
+        )
+        history = {username: [] for username in usernames}
+        for row in rows:
+            record = dict(row)
+            history[record.pop("username")].append(record)
+        return history
+    except Exception as e:
+        logger.error("Помилка при отриманні історії ризиків: %s", e)
+        return {username: [] for username in usernames}
+
+
+USER_OVERVIEW_PAGE_SIZE = 50
+
+# Сторінка користувачів з усіма даними адмін-панелі; пагінація за username
+USER_OVERVIEW_QUERY = """
+WITH page AS (
+    SELECT id, username, email
+    FROM users
+    WHERE $1::varchar IS NULL OR username > $1
+    ORDER BY username
+    LIMIT $2
+)
+SELECT
+    p.id, p.username, p.email,
+    COALESCE(roles.roles, ARRAY[]::varchar[]) as roles,
+    COALESCE(s.successful_logins, 0) as successful_logins,
+    COALESCE(s.failed_logins, 0) as failed_logins,
+    s.last_successful_login, s.last_failed_login, s.last_ip_address,
+    COALESCE(tfa.is_enabled, FALSE) as two_factor_enabled,
+    tfa.username IS NOT NULL as two_factor_configured,
+    COALESCE(sessions.active_sessions, '[]'::json) as active_sessions,
+    COALESCE(risk.risk_history, '[]'::json) as risk_history
+FROM page p
+LEFT JOIN auth_statistics s ON s.username = p.username
+LEFT JOIN two_factor_auth tfa ON tfa.username = p.username
+LEFT JOIN LATERAL (
+    SELECT ARRAY_AGG(r.role_name ORDER BY r.role_name)::varchar[] as roles
+    FROM user_roles ur
+    JOIN roles r ON ur.role_id = r.role_id
+    WHERE ur.username = p.username
+) roles ON TRUE
+LEFT JOIN LATERAL (
+    SELECT json_agg(json_build_object(
+        'session_id', us.session_id,
+        'created_at', us.created_at,
+        'last_activity', us.last_activity,
+        'ip_address', host(us.ip_address),
+        'device_info', us.device_info,
+        'is_suspicious', us.is_suspicious
+    ) ORDER BY us.last_activity DESC) as active_sessions
+    FROM user_sessions us
+    WHERE us.username = p.username AND us.last_activity > NOW() - INTERVAL '24 hours'
+) sessions ON TRUE
+LEFT JOIN LATERAL (
+    SELECT json_agg(json_build_object(
+        'risk_score', h.risk_score,
+        'risk_factors', h.risk_factors,
+        'assessed_at', h.assessed_at
+    ) ORDER BY h.assessed_at DESC) as risk_history
+    FROM (
+        SELECT risk_score, risk_factors, assessed_at
+        FROM risk_assessments ra
+        WHERE ra.username = p.username
+        ORDER BY assessed_at DESC
+        LIMIT $3
+    ) h
+) risk ON TRUE
+ORDER BY p.username
+"""
+
+
+@with_connection
+async def get_user_overview(
+    conn, after_username: str = None, limit: int = USER_OVERVIEW_PAGE_SIZE, risk_limit: int = 10
+) -> dict:
+    """Сторінка адмін-панелі: користувачі з ролями, статистикою, 2FA, сесіями та ризиком
+
+    Пагінація за ключем: next_cursor передається як after_username для
+    наступної сторінки.
+    """
+    try:
+        rows = await conn.fetch(USER_OVERVIEW_QUERY, after_username, limit, risk_limit)
+        users = []
+        for row in rows:
+            user = dict(row)
+            user["roles"] = list(user["roles"])
+            # Агрегати JSON повертаються рядками на з'єднаннях без кодека json
+            for key in ("active_sessions", "risk_history"):
+                if isinstance(user[key], str):
+                    user[key] = json.loads(user[key])
+            users.append(user)
+        next_cursor = users[-1]["username"] if len(users) == limit else None
+        return {"users": users, "next_cursor": next_cursor}
+    except Exception as e:
+        logger.error("Помилка при отриманні огляду користувачів: %s", e)
+        raise HTTPException(status_code=500, detail="Помилка при отриманні огляду користувачів")
+
+
+# Кеш порогових значень метрик: metric_name -> (warning, critical)
+THRESHOLD_CACHE_TTL_SECONDS = 300
+_threshold_cache: Dict[str, tuple] = {}
+_threshold_cache_loaded_at: Optional[datetime] = None
+
+
+def invalidate_threshold_cache():
+    """Скидання кешу порогових значень"""
+    global _threshold_cache_loaded_at
+    _threshold_cache_loaded_at = None
+
+
+async def get_metric_thresholds(conn) -> Dict[str, tuple]:
+    """Отримання порогових значень з кешу з оновленням після зміни або закінчення TTL"""
+    global _threshold_cache, _threshold_cache_loaded_at
+    now = datetime.utcnow()
+    if (
+        _threshold_cache_loaded_at is None
+        or now - _threshold_cache_loaded_at > timedelta(seconds=THRESHOLD_CACHE_TTL_SECONDS)
+    ):
+        rows = await conn.fetch(
+            "SELECT metric_name, warning_threshold, critical_threshold FROM metric_thresholds"
+        )
+        _threshold_cache = {
+            row["metric_name"]: (row["warning_threshold"], row["critical_threshold"])
+            for row in rows
+        }
+        _threshold_cache_loaded_at = now
+    return _threshold_cache
+
+
+def evaluate_metric_thresholds(metrics: List[dict], thresholds: Dict[str, tuple]) -> List[tuple]:
+    """Перевірка метрик на перевищення порогів, повертає записи сповіщень"""
+    alerts = []
+    for metric in metrics:
+        limits = thresholds.get(metric["metric_name"])
+        if not limits:
+            continue
+        warning, critical = limits
+        value = metric["value"]
+        if critical is not None and value >= critical:
+            severity, threshold, level = 5, critical, "critical"
+        elif warning is not None and value >= warning:
+            severity, threshold, level = 3, warning, "warning"
+        else:
+            continue
+        alerts.append(
+            (
+                "metric_threshold_exceeded",
+                severity,
+                {
+                    "metric": metric["metric_name"],
+                    "value": value,
+                    "threshold": threshold,
+                    "level": level,
+                },
+            )
+        )
+    return alerts
+
+
+async def upsert_security_alerts(conn, alerts: List[tuple]) -> List[asyncpg.Record]:
+    """Запис сповіщень за відбитком: нове сповіщення або лічильник відкритого
+
+    Кожен елемент: (alert_type, severity, details, fingerprint, occurrences),
+    відбитки в пакеті унікальні. Групи сповіщень оновлюються тим самим запитом.
+    """
+    alert_types, severities, details, fingerprints, occurrences = zip(*alerts)
+    return await conn.fetch(
+        """
+        WITH incoming AS (
+            SELECT * FROM unnest($1::varchar[], $2::int[], $3::jsonb[], $4::varchar[], $5::int[])
+                AS t(alert_type, severity, details, fingerprint, occurrences)
+        ), upserted AS (
+            INSERT INTO security_alerts (alert_type, severity, details, fingerprint, occurrence_count)
+            SELECT alert_type, severity, details, fingerprint, occurrences FROM incoming
+            ON CONFLICT (fingerprint) WHERE NOT is_resolved DO UPDATE SET
+                occurrence_count = security_alerts.occurrence_count + EXCLUDED.occurrence_count,
+                severity = GREATEST(security_alerts.severity, EXCLUDED.severity),
+                details = EXCLUDED.details,
+                last_seen_at = NOW()
+            RETURNING id, alert_type, severity, details, fingerprint, occurrence_count,
+                      created_at, last_seen_at, (xmax = 0) as inserted
+        ), grouped AS (
+            INSERT INTO security_alert_groups (
+                fingerprint, alert_type, severity, sample_details,
+                occurrence_count, alert_count, last_alert_id
+            )
+            SELECT i.fingerprint, i.alert_type, i.severity, i.details,
+                   i.occurrences, u.inserted::int, u.id
+            FROM incoming i
+            JOIN upserted u USING (fingerprint)
+            ON CONFLICT (fingerprint) DO UPDATE SET
+                severity = GREATEST(security_alert_groups.severity, EXCLUDED.severity),
+                sample_details = EXCLUDED.sample_details,
+                occurrence_count = security_alert_groups.occurrence_count + EXCLUDED.occurrence_count,
+                alert_count = security_alert_groups.alert_count + EXCLUDED.alert_count,
+                last_alert_id = EXCLUDED.last_alert_id,
+                last_seen_at = NOW()
+        )
+        SELECT * FROM upserted
+        """,
+        list(alert_types),
+        list(severities),
+        list(details),
+        list(fingerprints),
+        list(occurrences),
+    )
+
+
+async def flush_alert_occurrences(conn, pending: List[tuple]):
+    """Запис придушених повторів (alert_id, fingerprint, count) у лічильники"""
+    if not pending:
+        return
+    alert_ids, fingerprints, counts = (list(column) for column in zip(*pending))
+    updated = await conn.fetch(
+        """
+        UPDATE security_alerts a
+        SET occurrence_count = a.occurrence_count + p.count, last_seen_at = NOW()
+        FROM unnest($1::int[], $2::int[]) AS p(id, count)
+        WHERE a.id = p.id AND NOT a.is_resolved
+        RETURNING a.id, a.occurrence_count, a.last_seen_at
+        """,
+        alert_ids,
+        counts,
+    )
+    await notify_alert_events(conn, [alert_event("updated", dict(row)) for row in updated])
+    await conn.execute(
+        """
+        UPDATE security_alert_groups g
+        SET occurrence_count = g.occurrence_count + p.count, last_seen_at = NOW()
+        FROM unnest($1::varchar[], $2::int[]) AS p(fingerprint, count)
+        WHERE g.fingerprint = p.fingerprint
+        """,
+        fingerprints,
+        counts,
+    )
+
+
+async def record_security_alerts(conn, alerts: List[tuple]) -> List[Optional[int]]:
+    """Створення сповіщень (alert_type, severity, details) з дедуплікацією
+
+    Повтори у вікні придушення лише збільшують лічильник у пам'яті, який
+    періодичне завдання записує одним запитом, тож під час атаки кількість
+    записів залежить від кількості відбитків, а не подій. Повертає id
+    сповіщення для кожного елемента.
+    """
+    fingerprints, to_write, alert_ids = [], {}, {}
+    for alert_type, severity, details in alerts:
+        fingerprint = alert_fingerprint(alert_type, details)
+        fingerprints.append(fingerprint)
+        suppressed_id = alert_suppressor.suppress(fingerprint)
+        if suppressed_id is not None:
+            alert_ids[fingerprint] = suppressed_id
+            continue
+        entry = to_write.get(fingerprint)
+        if entry is None:
+            to_write[fingerprint] = [alert_type, severity, details, fingerprint, 1]
+        else:
+            entry[1], entry[2] = max(entry[1], severity), details
+            entry[4] += 1
+
+    if to_write:
+        rows = await upsert_security_alerts(conn, [tuple(entry) for entry in to_write.values()])
+        written = {row["fingerprint"]: row["id"] for row in rows}
+        alert_ids.update(written)
+
+        def open_windows():
+            for fingerprint, alert_id in written.items():
+                alert_suppressor.remember(fingerprint, alert_id)
+
+        # Вікно придушення відкривається лише для закомічених сповіщень: після
+        # відкату повтори рахувалися б для сповіщення, якого немає в базі
+        after_commit(conn, open_windows)
+        await notify_alert_events(
+            conn,
+            [alert_event("created" if row["inserted"] else "updated", dict(row)) for row in rows],
+        )
+        created = [row for row in rows if row["inserted"]]
+        if created:
+            logger.warning("Створено сповіщень безпеки: %s", len(created))
+
+    return [alert_ids.get(fingerprint) for fingerprint in fingerprints]
+
+
+async def create_security_alerts_bulk(conn, alerts: List[tuple]):
+    """Створення кількох сповіщень безпеки одним запитом"""
+    if not alerts:
+        return
+    await record_security_alerts(conn, alerts)
+
+
+async def write_metrics(conn, metrics: List[dict]):
+    """Запис пакету метрик через COPY та перевірка порогів"""
+    if not metrics:
+        return
+    now = datetime.utcnow()
+    await conn.copy_records_to_table(
+        "security_metrics",
+        records=[
+            (
+                metric["metric_name"],
+                float(metric["value"]),
+                metric.get("dimension"),
+                metric.get("measured_at") or now,
+            )
+            for metric in metrics
+        ],
+        columns=["metric_name", "metric_value", "dimension", "measured_at"],
+    )
+
+    thresholds = await get_metric_thresholds(conn)
+    await create_security_alerts_bulk(conn, evaluate_metric_thresholds(metrics, thresholds))
+
+
+@with_connection
+async def record_metrics(conn, metrics: List[dict]) -> int:
+    """Пакетний запис метрик безпеки
+
+    Кожен елемент: {"metric_name": str, "value": float, "dimension": dict | None}.
+    """
+    try:
+        await write_metrics(conn, metrics)
+        return len(metrics)
+    except Exception as e:
+        logger.error("Помилка при пакетному записі метрик: %s", e)
+        return 0
+
+
+@with_connection
+async def update_metric_threshold(
+    conn, metric_name: str, warning_threshold: float = None, critical_threshold: float = None
+):
+    """Оновлення порогових значень метрики"""
+    try:
+        updated = await conn.execute(
+            """
+            UPDATE metric_thresholds
+            SET warning_threshold = $2, critical_threshold = $3, last_updated = NOW()
+            WHERE metric_name = $1
+            """,
+            metric_name,
+            warning_threshold,
+            critical_threshold,
+        )
+        if updated == "UPDATE 0":
+            await conn.execute(
+                """
+                INSERT INTO metric_thresholds (metric_name, warning_threshold, critical_threshold)
+                VALUES ($1, $2, $3)
+                """,
+                metric_name,
+                warning_threshold,
+                critical_threshold,
+            )
+        invalidate_threshold_cache()
+        logger.info("Оновлено пороги метрики %s", metric_name)
+    except Exception as e:
+        logger.error("Помилка при оновленні порогів метрики: %s", e)
+        raise HTTPException(status_code=500, detail="Помилка при оновленні порогів метрики")
+
+
 @with_connection
 async def record_security_metric(
     conn, metric_name: str, value: float, dimension: dict = None
@@ -1298,45 +2029,18 @@ async def record_security_metric(
         """
         metric_id = await conn.fetchval(query, metric_name, value, dimension)
 
-        # Перевіряємо пороги
-        thresholds = await conn.fetchrow(
-            """
-            SELECT warning_threshold, critical_threshold 
-            FROM metric_thresholds 
-            WHERE metric_name = $1
-        """,
-            metric_name,
+        # Перевіряємо пороги за кешованою таблицею
+        thresholds = await get_metric_thresholds(conn)
+        await create_security_alerts_bulk(
+            conn,
+            evaluate_metric_thresholds(
+                [{"metric_name": metric_name, "value": value}], thresholds
+            ),
         )
 
-        if thresholds:
-            if value >= thresholds["critical_threshold"]:
-                await create_security_alert(
-                    conn,
-                    "metric_threshold_exceeded",
-                    5,
-                    {
-                        "metric": metric_name,
-                        "value": value,
-                        "threshold": thresholds["critical_threshold"],
-                        "level": "critical",
-                    },
-                )
-            elif value >= thresholds["warning_threshold"]:
-                await create_security_alert(
-                    conn,
-                    "metric_threshold_exceeded",
-                    3,
-                    {
-                        "metric": metric_name,
-                        "value": value,
-                        "threshold": thresholds["warning_threshold"],
-                        "level": "warning",
-                    },
-                )
-
         return metric_id
     except Exception as e:
-        logger.error(f"Помилка при записі метрики: {str(e)}")
+        logger.error("Помилка при записі метрики: %s", e)
         return None
 
 
@@ -1344,62 +2048,32 @@ async def record_security_metric(
 async def calculate_security_metrics(conn) -> dict:
     """Розрахунок метрик безпеки"""
     try:
-        metrics = {}
+        # Періодично звіряємо лічильники з таблицями, щоб виправити дрейф
+        if security_counters.reconciliation_due():
+            await security_counters.reconcile(conn)
 
-        # Коефіцієнт невдалих входів
-        login_stats = await conn.fetchrow(
-            """
-            SELECT 
-                COALESCE(SUM(failed_logins), 0) as total_failed,
-                COALESCE(SUM(successful_logins), 0) as total_successful
-            FROM auth_statistics
-            WHERE last_successful_login > NOW() - INTERVAL '24 hours'
-            OR last_failed_login > NOW() - INTERVAL '24 hours'
-        """
-        )
+        # Коефіцієнти беруться з інкрементальних лічильників, без сканування таблиць
+        metrics = await security_counters.rates()
 
-        total_attempts = login_stats["total_failed"] + login_stats["total_successful"]
-        if total_attempts > 0:
-            failed_rate = login_stats["total_failed"] / total_attempts
-            await record_security_metric(conn, "failed_login_rate", failed_rate)
-            metrics["failed_login_rate"] = failed_rate
-
-        # Відсоток підозрілих сесій
-        session_stats = await conn.fetchrow(
-            """
-            SELECT 
-                COUNT(*) FILTER (WHERE is_suspicious) as suspicious,
-                COUNT(*) as total
-            FROM user_sessions
-            WHERE last_activity > NOW() - INTERVAL '24 hours'
-        """
+        # Записуємо всі метрики одним пакетом
+        await write_metrics(
+            conn, [{"metric_name": name, "value": value} for name, value in metrics.items()]
         )
 
-        if session_stats["total"] > 0:
-            suspicious_rate = session_stats["suspicious"] / session_stats["total"]
-            await record_security_metric(conn, "suspicious_sessions_rate", suspicious_rate)
-            metrics["suspicious_sessions_rate"] = suspicious_rate
-
         return metrics
     except Exception as e:
-        logger.error(f"Помилка при розрахунку метрик: {str(e)}")
+        logger.error("Помилка при розрахунку метрик: %s", e)
         return {}
 
 
 @with_connection
 async def create_security_alert(conn, alert_type: str, severity: int, details: dict) -> int:
-    """Створення сповіщення безпеки"""
+    """Створення сповіщення безпеки (повтори з тим самим відбитком об'єднуються)"""
     try:
-        query = """
-        INSERT INTO security_alerts (alert_type, severity, details)
-        VALUES ($1, $2, $3)
-        RETURNING id
-        """
-        alert_id = await conn.fetchval(query, alert_type, severity, details)
-        logger.warning(f"Створено сповіщення безпеки: {alert_type} (severity: {severity})")
-        return alert_id
+        alert_ids = await record_security_alerts(conn, [(alert_type, severity, details)])
+        return alert_ids[0]
     except Exception as e:
-        logger.error(f"Помилка при створенні сповіщення: {str(e)}")
+        logger.error("Помилка при створенні сповіщення: %s", e)
         return None
 
 
@@ -1408,21 +2082,62 @@ async def get_active_alerts(conn) -> List[dict]:
     """Отримання активних сповіщень"""
     try:
         query = """
-        SELECT id, alert_type, severity, details, created_at
+        SELECT id, alert_type, severity, details, created_at,
+               fingerprint, occurrence_count, last_seen_at
         FROM security_alerts
         WHERE NOT is_resolved
-        ORDER BY severity DESC, created_at DESC
+        ORDER BY severity DESC, last_seen_at DESC
         """
         alerts = await conn.fetch(query)
         return [dict(alert) for alert in alerts]
     except Exception as e:
-        logger.error(f"Помилка при отриманні сповіщень: {str(e)}")
+        logger.error("Помилка при отриманні сповіщень: %s", e)
         return []
 
 
+@with_connection
+async def get_alert_groups(conn, limit: int = 100) -> List[dict]:
+    """Агреговані групи сповіщень (усі епізоди одного відбитка)"""
+    try:
+        groups = await conn.fetch(
+            """
+            SELECT fingerprint, alert_type, severity, sample_details, occurrence_count,
+                   alert_count, last_alert_id, first_seen_at, last_seen_at
+            FROM security_alert_groups
+            ORDER BY last_seen_at DESC
+            LIMIT $1
+            """,
+            limit,
+        )
+        return [dict(group) for group in groups]
+    except Exception as e:
+        logger.error("Помилка при отриманні груп сповіщень: %s", e)
+        return []
+
+
+@with_connection
+async def _write_alert_occurrences(conn, pending: List[tuple]):
+    await flush_alert_occurrences(conn, pending)
+
+
+async def flush_alert_suppressor():
+    """Запис усіх накопичених повторів (періодично та при зупинці сервера)"""
+    pending = alert_suppressor.take_pending()
+    if not pending:
+        return
+    try:
+        await _write_alert_occurrences(pending)
+    except Exception as e:
+        # Лічильники повертаються до наступного запису
+        alert_suppressor.restore_pending(pending)
+        logger.error("Помилка при записі повторів сповіщень (%s): %s", len(pending), e)
+
+
 @with_connection
 async def resolve_alert(conn, alert_id: int, resolved_by: str):
     """Позначення сповіщення як вирішеного"""
+    # Невраховані повтори записуємо до закриття, далі відкривається нове сповіщення
+    pending = alert_suppressor.take_pending()
     try:
         query = """
         UPDATE security_alerts
@@ -1431,10 +2146,19 @@ async def resolve_alert(conn, alert_id: int, resolved_by: str):
             resolved_by = $2
         WHERE id = $1
         """
+        await flush_alert_occurrences(conn, pending)
         await conn.execute(query, alert_id, resolved_by)
-        logger.info(f"Сповіщення {alert_id} позначено як вирішене користувачем {resolved_by}")
+        await notify_alert_events(
+            conn, [alert_event("resolved", {"id": alert_id, "resolved_by": resolved_by})]
+        )
+        # Вікна закриваються лише після коміту; інші процеси закривають свої
+        # при отриманні події "resolved"
+        after_commit(conn, lambda: alert_suppressor.forget_alert(alert_id))
+        logger.info("Сповіщення %s позначено як вирішене користувачем %s", alert_id, resolved_by)
     except Exception as e:
-        logger.error(f"Помилка при вирішенні сповіщення: {str(e)}")
+        # Транзакцію буде відкочено разом із записаними лічильниками
+        alert_suppressor.restore_pending(pending)
+        logger.error("Помилка при вирішенні сповіщення: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при вирішенні сповіщення")
 
 
@@ -1494,7 +2218,7 @@ async def detect_attack_patterns(conn, username: str, activity_data: dict) -> Li
 
         return detected_patterns
     except Exception as e:
-        logger.error(f"Помилка при виявленні шаблонів атак: {str(e)}")
+        logger.error("Помилка при виявленні шаблонів атак: %s", e)
         return []
 
 
@@ -1504,18 +2228,20 @@ async def evaluate_pattern_match(conn, username: str, rules: dict, activity_data
     try:
         confidence = 0.0
         conditions = rules.get("conditions", {})
+        # Вікно у хвилинах, напр. «5m»
+        window_minutes = int(str(conditions.get("time_window", "5m")).rstrip("m"))
 
         if "failed_attempts" in conditions:
-            # Перевірка брутфорсу
+            # Перевірка брутфорсу (індекс auth_events за username та часом)
             failed_count = await conn.fetchval(
                 """
-                SELECT COUNT(*) FROM user_activity
-                WHERE username = $1 
-                AND action = 'failed_login'
-                AND created_at > NOW() - INTERVAL '1 minute' * $2
+                SELECT COUNT(*) FROM auth_events
+                WHERE username = $1
+                AND NOT success
+                AND occurred_at > NOW() - make_interval(mins => $2)
             """,
                 username,
-                conditions["time_window"].replace("m", ""),
+                window_minutes,
             )
 
             if failed_count >= conditions["failed_attempts"]:
@@ -1525,11 +2251,11 @@ async def evaluate_pattern_match(conn, username: str, rules: dict, activity_data
             # Перевірка password spray
             unique_users = await conn.fetchval(
                 """
-                SELECT COUNT(DISTINCT username) FROM user_activity
-                WHERE action = 'failed_login'
-                AND created_at > NOW() - INTERVAL '1 minute' * $1
+                SELECT COUNT(DISTINCT username) FROM auth_events
+                WHERE NOT success
+                AND occurred_at > NOW() - make_interval(mins => $1)
             """,
-                conditions["time_window"].replace("m", ""),
+                window_minutes,
             )
 
             if unique_users >= conditions["unique_users"]:
@@ -1537,7 +2263,7 @@ async def evaluate_pattern_match(conn, username: str, rules: dict, activity_data
 
         return min(confidence, 1.0)
     except Exception as e:
-        logger.error(f"Помилка при оцінці шаблону: {str(e)}")
+        logger.error("Помилка при оцінці шаблону: %s", e)
         return 0.0
 
 
@@ -1557,30 +2283,56 @@ async def mark_false_positive(conn, attack_id: int, reviewer: str):
             reviewer,
         )
 
-        logger.info(f"Атаку {attack_id} позначено як хибне спрацювання користувачем {reviewer}")
+        logger.info("Атаку %s позначено як хибне спрацювання користувачем %s", attack_id, reviewer)
     except Exception as e:
-        logger.error(f"Помилка при позначенні хибного спрацювання: {str(e)}")
+        logger.error("Помилка при позначенні хибного спрацювання: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при оновленні статусу атаки")
 
 
-@with_connection
 async def generate_security_report(
-    conn, report_type: str, period_start: datetime, period_end: datetime, generated_by: str
+    report_type: str,
+    period_start: datetime,
+    period_end: datetime,
+    generated_by: str,
+    exact_distinct: bool = None,
 ) -> dict:
     """Генерація аналітичного звіту безпеки"""
+    from .security_report_service import build_report_metrics
+
+    # Метрики збираються з щоденних знімків (лише відсутні дні обчислюються) до
+    # запису звіту: знімки займають власні з'єднання пулу, і утримане з'єднання
+    # запису чекало б на них
+    try:
+        report_metrics = await build_report_metrics(period_start, period_end, exact_distinct)
+    except Exception as e:
+        logger.error("Помилка при розрахунку метрик звіту: %s", e)
+        raise HTTPException(status_code=500, detail="Помилка при генерації звіту")
+    return await _store_security_report(
+        report_type, period_start, period_end, generated_by, report_metrics
+    )
+
+
+@with_connection
+async def _store_security_report(
+    conn,
+    report_type: str,
+    period_start: datetime,
+    period_end: datetime,
+    generated_by: str,
+    report_metrics: dict,
+) -> dict:
     try:
         metrics = {}
         insights = []
         recommendations = []
 
-        # Збираємо базові метрики
-        auth_metrics = await calculate_period_metrics(conn, period_start, period_end)
-        metrics.update(auth_metrics)
+        trends = report_metrics.pop("trends", None)
+        metrics.update(report_metrics)
 
         # Аналізуємо тенденції
-        trends = await analyze_security_trends(conn, period_start, period_end)
         if trends:
             metrics["trends"] = trends
+            await save_security_trend(conn, trends)
 
         # Генеруємо інсайти
         if metrics["failed_login_rate"] > 0.2:
@@ -1624,7 +2376,7 @@ async def generate_security_report(
             "recommendations": recommendations,
         }
     except Exception as e:
-        logger.error(f"Помилка при генерації звіту: {str(e)}")
+        logger.error("Помилка при генерації звіту: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при генерації звіту")
 
 
@@ -1638,12 +2390,12 @@ async def calculate_period_metrics(conn, start: datetime, end: datetime) -> dict
         auth_stats = await conn.fetchrow(
             """
             SELECT 
-                COUNT(*) FILTER (WHERE action = 'login' AND details->>'success' = 'true') as successful_logins,
-                COUNT(*) FILTER (WHERE action = 'login' AND details->>'success' = 'false') as failed_logins,
+                COUNT(*) FILTER (WHERE success) as successful_logins,
+                COUNT(*) FILTER (WHERE NOT success) as failed_logins,
                 COUNT(DISTINCT username) as unique_users,
                 COUNT(DISTINCT ip_address) as unique_ips
-            FROM user_activity
-            WHERE created_at BETWEEN $1 AND $2
+            FROM auth_events
+            WHERE occurred_at BETWEEN $1 AND $2
         """,
             start,
             end,
@@ -1686,7 +2438,7 @@ async def calculate_period_metrics(conn, start: datetime, end: datetime) -> dict
 
         return metrics
     except Exception as e:
-        logger.error(f"Помилка при розрахунку метрик: {str(e)}")
+        logger.error("Помилка при розрахунку метрик: %s", e)
         return {}
 
 
@@ -1698,13 +2450,12 @@ async def analyze_security_trends(conn, start: datetime, end: datetime) -> Optio
         daily_metrics = await conn.fetch(
             """
             SELECT 
-                DATE_TRUNC('day', created_at) as day,
-                COUNT(*) FILTER (WHERE details->>'success' = 'true') as successes,
-                COUNT(*) FILTER (WHERE details->>'success' = 'false') as failures
-            FROM user_activity
-            WHERE created_at BETWEEN $1 AND $2
-            AND action = 'login'
-            GROUP BY DATE_TRUNC('day', created_at)
+                DATE_TRUNC('day', occurred_at) as day,
+                COUNT(*) FILTER (WHERE success) as successes,
+                COUNT(*) FILTER (WHERE NOT success) as failures
+            FROM auth_events
+            WHERE occurred_at BETWEEN $1 AND $2
+            GROUP BY DATE_TRUNC('day', occurred_at)
             ORDER BY day
         """,
             start,
@@ -1714,53 +2465,97 @@ async def analyze_security_trends(conn, start: datetime, end: datetime) -> Optio
         if not daily_metrics:
             return None
 
-        # Конвертуємо в pandas DataFrame для аналізу
-        df = pd.DataFrame(
-            [
-                {
-                    "day": record["day"],
-                    "success_rate": (
-                        record["successes"] / (record["successes"] + record["failures"])
-                        if (record["successes"] + record["failures"]) > 0
-                        else 0
-                    ),
-                }
-                for record in daily_metrics
-            ]
-        )
+        from .analytics_pool import analytics_pool
 
-        # Аналізуємо тренд
-        trend_data = {
-            "direction": (
-                "increasing"
-                if df["success_rate"].is_monotonic_increasing
-                else "decreasing" if df["success_rate"].is_monotonic_decreasing else "fluctuating"
-            ),
-            "mean": float(df["success_rate"].mean()),
-            "std": float(df["success_rate"].std()),
-            "days_analyzed": len(df),
-        }
+        # numpy-аналіз рядів виконується поза циклом подій
+        daily = dense_daily_counts(daily_metrics, start.date(), end.date())
+        trend_data = await analytics_pool.run(summarize_success_rate_trend, daily, size=len(daily))
 
         # Зберігаємо тренд
-        await conn.execute(
-            """
-            INSERT INTO security_trends (
-                trend_type, metric_name, trend_data, confidence
-            )
-            VALUES ($1, $2, $3, $4)
-        """,
-            "auth_success_rate",
-            "login_success_rate",
-            trend_data,
-            0.8,
-        )
+        await save_security_trend(conn, trend_data)
 
         return trend_data
     except Exception as e:
-        logger.error(f"Помилка при аналізі тенденцій: {str(e)}")
+        logger.error("Помилка при аналізі тенденцій: %s", e)
         return None
 
 
+def dense_daily_counts(daily, first_day: date, last_day: date) -> List[dict]:
+    """Щоденні лічильники входів для кожного дня first_day..last_day
+
+    Дні без спроб входу заповнюються нулями: аналіз тенденцій вважає ряд
+    суцільним, і пропуски зсували б нахил та тижневу сезонність.
+    """
+    counts = {}
+    for record in daily:
+        day = record["day"]
+        counts[day.date() if isinstance(day, datetime) else day] = record
+    result = []
+    day = first_day
+    while day <= last_day:
+        record = counts.get(day)
+        result.append(
+            {
+                "day": day,
+                "successes": record["successes"] if record else 0,
+                "failures": record["failures"] if record else 0,
+            }
+        )
+        day += timedelta(days=1)
+    return result
+
+
+def summarize_success_rate_trend(daily: List[dict]) -> dict:
+    """Зведення тенденцій входів за щоденними лічильниками (без пропущених днів)"""
+    import numpy as np
+    from . import trend_engine
+
+    successes = np.array([record["successes"] for record in daily], dtype=np.float64)
+    failures = np.array([record["failures"] for record in daily], dtype=np.float64)
+    attempts = successes + failures
+    success_rate = np.divide(
+        successes, attempts, out=np.zeros_like(successes), where=attempts > 0
+    )
+    active = attempts > 0
+    if active.any():
+        # День без спроб не має частки успіху: береться частка попереднього активного дня
+        source = np.maximum.accumulate(np.where(active, np.arange(len(daily)), -1))
+        source[source < 0] = np.argmax(active)
+        success_rate = success_rate[source]
+
+    # Усі ряди аналізуються разом одним векторизованим проходом
+    names = ["login_success_rate", "successful_logins", "failed_logins"]
+    days = [record["day"] for record in daily]
+    result = trend_engine.analyze_series(
+        np.vstack([success_rate, successes, failures]), phase_offset=days[0].weekday()
+    )
+    series = trend_engine.summarize(names, result, days)
+
+    rate = series["login_success_rate"]
+    return {
+        "direction": rate["direction"],
+        "mean": rate["mean"],
+        "std": rate["std"],
+        "days_analyzed": len(daily),
+        "series": series,
+    }
+
+
+async def save_security_trend(conn, trend_data: dict):
+    await conn.execute(
+        """
+        INSERT INTO security_trends (
+            trend_type, metric_name, trend_data, confidence
+        )
+        VALUES ($1, $2, $3, $4)
+    """,
+        "auth_success_rate",
+        "login_success_rate",
+        trend_data,
+        0.8,
+    )
+
+
 @with_connection
 async def get_report_history(
     conn, report_type: str = None, start_date: date = None, end_date: date = None
@@ -1796,5 +2591,130 @@ async def get_report_history(
         reports = await conn.fetch(query, *params)
         return [dict(report) for report in reports]
     except Exception as e:
-        logger.error(f"Помилка при отриманні звітів: {str(e)}")
+        logger.error("Помилка при отриманні звітів: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при отриманні звітів")
+
+
+# Розмір пакету для перенесення історичних входів з user_activity
+AUTH_EVENTS_BACKFILL_BATCH = 10000
+
+
+async def backfill_auth_events(batch_size: int = AUTH_EVENTS_BACKFILL_BATCH) -> int:
+    """Перенесення історичних входів з user_activity до auth_events
+
+    Працює пакетами за activity_id, кожен пакет у власній транзакції, тому
+    перерваний запуск можна безпечно продовжити.
+    """
+    pool = await get_pool()
+    total = 0
+    async with pool.acquire() as conn:
+        last_id = await conn.fetchval(
+            "SELECT COALESCE(MAX(source_activity_id), 0) FROM auth_events"
+        )
+    while True:
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                result = await conn.fetchrow(
+                    """
+                    WITH batch AS (
+                        SELECT ua.activity_id, ua.created_at, u.id as user_id, ua.username,
+                               (ua.details->>'success')::boolean as success, ua.ip_address
+                        FROM user_activity ua
+                        LEFT JOIN users u ON u.username = ua.username
+                        WHERE ua.activity_id > $1
+                        AND ua.action = 'login'
+                        AND ua.details ? 'success'
+                        ORDER BY ua.activity_id
+                        LIMIT $2
+                    ), inserted AS (
+                        INSERT INTO auth_events (
+                            occurred_at, user_id, username, success, ip_address, source_activity_id
+                        )
+                        SELECT created_at, user_id, username, success, ip_address, activity_id
+                        FROM batch
+                        ON CONFLICT (source_activity_id) DO NOTHING
+                    )
+                    SELECT MAX(activity_id) as last_id, COUNT(*) as batch_size FROM batch
+                    """,
+                    last_id,
+                    batch_size,
+                )
+        if not result["batch_size"]:
+            break
+        last_id = result["last_id"]
+        total += result["batch_size"]
+        logger.info("Перенесено подій входу: %s (activity_id до %s)", total, last_id)
+    return total
+
+
+async def _merge_location_profiles(conn, profiles: List[tuple]):
+    await conn.executemany(
+        """
+        INSERT INTO user_location_profiles (
+            username, location_key, country_code, city, latitude, longitude,
+            last_ip_address, first_seen, last_seen, hit_count, is_trusted
+        )
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
+        ON CONFLICT (username, location_key) DO UPDATE SET
+            first_seen = LEAST(user_location_profiles.first_seen, EXCLUDED.first_seen),
+            last_seen = GREATEST(user_location_profiles.last_seen, EXCLUDED.last_seen),
+            hit_count = user_location_profiles.hit_count + EXCLUDED.hit_count,
+            is_trusted = user_location_profiles.is_trusted OR EXCLUDED.is_trusted
+        """,
+        profiles,
+    )
+
+
+async def compact_user_locations(batch_size: int = 5000) -> int:
+    """Стиснення історії user_locations у профілі локацій (рядок на користувача і geohash)
+
+    Рядки спершу групуються в SQL за точними координатами, далі в Python
+    за geohash. Повторний запуск додасть лічильники ще раз, тому після
+    перенесення таблицю user_locations слід очистити.
+    """
+    pool = await get_pool()
+    merged = 0
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            profiles: Dict[tuple, list] = {}
+            async for row in conn.cursor(
+                """
+                SELECT username, latitude::float8 as latitude, longitude::float8 as longitude,
+                       MAX(country_code) as country_code, MAX(city) as city,
+                       (ARRAY_AGG(ip_address ORDER BY last_seen DESC))[1] as last_ip_address,
+                       MIN(first_seen) as first_seen, MAX(last_seen) as last_seen,
+                       COUNT(*) as hit_count, BOOL_OR(is_trusted) as is_trusted
+                FROM user_locations
+                WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+                GROUP BY username, latitude, longitude
+                """,
+                prefetch=batch_size,
+            ):
+                key = (row["username"], geohash_encode(row["latitude"], row["longitude"]))
+                profile = profiles.get(key)
+                if profile is None:
+                    profiles[key] = [
+                        *key,
+                        row["country_code"],
+                        row["city"],
+                        row["latitude"],
+                        row["longitude"],
+                        row["last_ip_address"],
+                        row["first_seen"],
+                        row["last_seen"],
+                        row["hit_count"],
+                        row["is_trusted"],
+                    ]
+                    continue
+                if row["last_seen"] > profile[8]:
+                    profile[6], profile[8] = row["last_ip_address"], row["last_seen"]
+                profile[7] = min(profile[7], row["first_seen"])
+                profile[9] += row["hit_count"]
+                profile[10] = profile[10] or row["is_trusted"]
+
+            items = [tuple(profile) for profile in profiles.values()]
+            for start in range(0, len(items), batch_size):
+                await _merge_location_profiles(conn, items[start : start + batch_size])
+            merged = len(items)
+    logger.info("Створено профілів локацій: %s", merged)
+    return merged
@@ -0,0 +1,174 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .auth_service import get_pool
+
+logger = logging.getLogger(__name__)
+
+HOURS_PER_DAY = 24
+WEEK_HOURS = 7 * HOURS_PER_DAY
+
+# Вікно профілю та поріг типової години як в analyze_user_behavior
+PROFILE_WINDOW_DAYS = 30
+TYPICAL_HOUR_MIN_LOGINS = 5
+PROFILE_CONFIDENCE = 0.8
+PROFILE_FLUSH_BATCH = 1000
+
+# Один агрегатний прохід по сесіях: нові сесії додаються, сесії, що
+# випали з вікна, віднімаються. Слот = (день тижня ISO - 1) * 24 + година
+DELTA_QUERY = """
+SELECT username,
+       ((EXTRACT(ISODOW FROM created_at)::int - 1) * 24
+        + EXTRACT(HOUR FROM created_at)::int) as slot,
+       SUM(CASE WHEN created_at >= $3 THEN 1 ELSE -1 END)::int as delta
+FROM user_sessions
+WHERE (created_at >= $1 AND created_at < $2)
+   OR (created_at >= $3 AND created_at < $4)
+GROUP BY username, slot
+ORDER BY username
+"""
+
+
+def hour_histogram(week_hours: np.ndarray) -> np.ndarray:
+    """24-бінова гістограма годин з матриці день тижня x година"""
+    return week_hours.reshape(7, HOURS_PER_DAY).sum(axis=0)
+
+
+def typical_hours(hour_counts: np.ndarray, min_logins: int = TYPICAL_HOUR_MIN_LOGINS) -> List[int]:
+    return [int(hour) for hour in np.flatnonzero(hour_counts > min_logins)]
+
+
+async def iter_user_deltas(rows) -> AsyncIterator[Tuple[str, np.ndarray]]:
+    """Групування відсортованих за username рядків (username, slot, delta) у вектори 168 слотів"""
+    username, week_hours = None, None
+    async for row in rows:
+        if row["username"] != username:
+            if username is not None:
+                yield username, week_hours
+            username, week_hours = row["username"], np.zeros(WEEK_HOURS, dtype=np.int64)
+        week_hours[row["slot"]] += row["delta"]
+    if username is not None:
+        yield username, week_hours
+
+
+def delta_ranges(
+    processed_until: Optional[datetime], now: datetime, window_days: int = PROFILE_WINDOW_DAYS
+) -> Tuple[Optional[tuple], tuple, bool]:
+    """Діапазони віднімання та додавання сесій для інкрементального оновлення
+
+    Повертає (expired, added, full_rebuild). Якщо попередній запуск був
+    давніше за вікно, профілі перебудовуються з нуля.
+    """
+    window = timedelta(days=window_days)
+    window_start = now - window
+    if processed_until is None or processed_until <= window_start:
+        return None, (window_start, now), True
+    return (processed_until - window, window_start), (processed_until, now), False
+
+
+async def _flush_profiles(conn, deltas: Dict[str, np.ndarray], full_rebuild: bool):
+    """Додавання дельт до збережених профілів та оновлення user_behavior_patterns"""
+    usernames = list(deltas)
+    existing = {}
+    if not full_rebuild:
+        rows = await conn.fetch(
+            """
+            SELECT username, week_hour_counts
+            FROM user_activity_profiles
+            WHERE username = ANY($1::varchar[])
+            """,
+            usernames,
+        )
+        existing = {row["username"]: row["week_hour_counts"] for row in rows}
+
+    profiles, patterns = [], []
+    for username in usernames:
+        week_hours = deltas[username]
+        if username in existing:
+            week_hours = week_hours + np.asarray(existing[username], dtype=np.int64)
+        week_hours = np.clip(week_hours, 0, None)
+        hours = hour_histogram(week_hours)
+        profiles.append((username, hours.tolist(), week_hours.tolist(), int(week_hours.sum())))
+        patterns.append((username, {"typical_hours": typical_hours(hours)}))
+
+    await conn.executemany(
+        """
+        INSERT INTO user_activity_profiles (username, hour_counts, week_hour_counts, total_sessions)
+        VALUES ($1, $2, $3, $4)
+        ON CONFLICT (username) DO UPDATE SET
+            hour_counts = EXCLUDED.hour_counts,
+            week_hour_counts = EXCLUDED.week_hour_counts,
+            total_sessions = EXCLUDED.total_sessions,
+            updated_at = NOW()
+        """,
+        profiles,
+    )
+    await conn.executemany(
+        """
+        INSERT INTO user_behavior_patterns (username, pattern_type, pattern_data, confidence)
+        VALUES ($1, 'login_time', $2, $3)
+        ON CONFLICT (username, pattern_type)
+        DO UPDATE SET pattern_data = EXCLUDED.pattern_data,
+                      confidence = EXCLUDED.confidence,
+                      last_updated = NOW()
+        """,
+        [(username, pattern, PROFILE_CONFIDENCE) for username, pattern in patterns],
+    )
+
+
+async def refresh_behavior_profiles(
+    window_days: int = PROFILE_WINDOW_DAYS,
+    batch_size: int = PROFILE_FLUSH_BATCH,
+    now: datetime = None,
+) -> int:
+    """Пакетне оновлення профілів активності всіх користувачів
+
+    Один потоковий агрегатний запит по user_sessions з моменту попереднього
+    запуску; профілі оновлюються пакетами в одній транзакції. Повертає
+    кількість оновлених профілів.
+    """
+    now = now or datetime.now(timezone.utc)
+    pool = await get_pool()
+    updated = 0
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            # Блокування рядка стану не дає двом запускам працювати одночасно
+            processed_until = await conn.fetchval(
+                """
+                INSERT INTO behavior_profile_state (id) VALUES (TRUE)
+                ON CONFLICT (id) DO UPDATE SET id = EXCLUDED.id
+                RETURNING processed_until
+                """
+            )
+            expired, added, full_rebuild = delta_ranges(processed_until, now, window_days)
+            if full_rebuild:
+                await conn.execute("DELETE FROM user_activity_profiles")
+                # Порожній діапазон віднімання
+                expired = (added[0], added[0])
+
+            batch: Dict[str, np.ndarray] = {}
+            rows = conn.cursor(DELTA_QUERY, *expired, *added, prefetch=batch_size * 8)
+            async for username, week_hours in iter_user_deltas(rows):
+                if week_hours.any():
+                    batch[username] = week_hours
+                if len(batch) >= batch_size:
+                    await _flush_profiles(conn, batch, full_rebuild)
+                    updated += len(batch)
+                    batch = {}
+            if batch:
+                await _flush_profiles(conn, batch, full_rebuild)
+                updated += len(batch)
+
+            await conn.execute(
+                "UPDATE behavior_profile_state SET processed_until = $1, updated_at = NOW()",
+                now,
+            )
+
+    logger.info(
+        "Оновлено профілів активності: %s%s", updated, " (повна перебудова)" if full_rebuild else ""
+    )
+    return updated
+
@@ -0,0 +1,256 @@
+import time
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from api.config import settings
+
+COMPRESSION_ATTRIBUTE = "__compression__"
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "application/x-ndjson",
+)
+
+
+def compression(gzip: int = None, zstd: int = None, enabled: bool = True):
+    """Рівні стиснення для маршруту (замість COMPRESSION_*_LEVEL) або його вимкнення"""
+
+    def decorator(endpoint):
+        setattr(endpoint, COMPRESSION_ATTRIBUTE, {"gzip": gzip, "zstd": zstd, "enabled": enabled})
+        return endpoint
+
+    return decorator
+
+
+def _zstandard():
+    # zstandard необов'язковий: без нього клієнтам пропонується лише gzip
+    try:
+        import zstandard
+
+        return zstandard
+    except ImportError:
+        return None
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Кодування з Accept-Encoding та їхні ваги q"""
+    encodings = {}
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        encodings[name.strip().lower()] = quality
+    return encodings
+
+
+def choose_encoding(header: str, zstd_available: bool = True) -> Optional[str]:
+    """zstd, якщо клієнт його приймає, інакше gzip; None — без стиснення"""
+    accepted = parse_accept_encoding(header)
+    candidates = ["zstd", "gzip"] if zstd_available else ["gzip"]
+    wildcard = accepted.get("*", 0.0)
+    scored = [(accepted.get(name, wildcard), name) for name in candidates]
+    quality, name = max(scored, key=lambda item: item[0])
+    return name if quality > 0 else None
+
+
+class GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, chunk: bytes) -> bytes:
+        # Sync flush: клієнт отримує дані фрагмента одразу, без очікування решти
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class ZstdEncoder:
+    def __init__(self, level: int):
+        zstandard = _zstandard()
+        self._flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.compress(chunk) + self._compressor.flush(self._flush_block)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+ENCODERS = {"gzip": GzipEncoder, "zstd": ZstdEncoder}
+
+
+def compress_body(encoding: str, level: int, body: bytes) -> bytes:
+    if encoding == "zstd":
+        return _zstandard().ZstdCompressor(level=level).compress(body)
+    return zlib.compress(body, level, wbits=16 + zlib.MAX_WBITS)
+
+
+class CompressionStats:
+    """Байти до/після стиснення та витрачений на нього час за кодуванням"""
+
+    def __init__(self):
+        self._stats: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {"responses": 0, "bytes_in": 0, "bytes_out": 0, "seconds": 0.0}
+        )
+        self.skipped_small = 0
+
+    def record(self, encoding: str, bytes_in: int, bytes_out: int, seconds: float, response=False):
+        stats = self._stats[encoding]
+        stats["responses"] += response
+        stats["bytes_in"] += bytes_in
+        stats["bytes_out"] += bytes_out
+        stats["seconds"] += seconds
+
+    def snapshot(self) -> dict:
+        result = {}
+        for encoding, stats in self._stats.items():
+            bytes_in, bytes_out = stats["bytes_in"], stats["bytes_out"]
+            saved_mb = (bytes_in - bytes_out) / 1e6
+            cpu_ms = stats["seconds"] * 1000
+            result[encoding] = {
+                "responses": stats["responses"],
+                "bytes_in": bytes_in,
+                "bytes_out": bytes_out,
+                "ratio": round(bytes_out / bytes_in, 4) if bytes_in else None,
+                "cpu_ms": round(cpu_ms, 3),
+                # Ціна стиснення: мс процесорного часу на кожен зекономлений мегабайт
+                "cpu_ms_per_mb_saved": round(cpu_ms / saved_mb, 3) if saved_mb > 0 else None,
+            }
+        return {"encodings": result, "skipped_small": self.skipped_small}
+
+
+class CompressionMiddleware:
+    """ASGI-стиснення відповідей gzip/zstd за Accept-Encoding
+
+    Повна відповідь стискається, якщо не менша за minimum_size. Потокова
+    відповідь (more_body) стискається фрагментами одразу, без буферизації, щоб
+    не затримувати доставку. Рівень задається маршрутом через @compression.
+    """
+
+    def __init__(
+        self,
+        app,
+        stats: CompressionStats,
+        minimum_size: int = None,
+        gzip_level: int = None,
+        zstd_level: int = None,
+    ):
+        self.app = app
+        self.stats = stats
+        self.minimum_size = settings.COMPRESSION_MIN_SIZE if minimum_size is None else minimum_size
+        self.levels = {
+            "gzip": gzip_level or settings.COMPRESSION_GZIP_LEVEL,
+            "zstd": zstd_level or settings.COMPRESSION_ZSTD_LEVEL,
+        }
+        self.zstd_available = _zstandard() is not None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = dict(scope["headers"]).get(b"accept-encoding", b"").decode("latin-1")
+        encoding = choose_encoding(accept, self.zstd_available)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSend(self, scope, encoding, send))
+
+    def route_level(self, scope, encoding: str) -> Optional[int]:
+        """Рівень для маршруту запиту; None — маршрут вимкнув стиснення"""
+        # Маршрутизатор Starlette записує endpoint у scope до початку відповіді
+        options = getattr(scope.get("endpoint"), COMPRESSION_ATTRIBUTE, None)
+        if options is None:
+            return self.levels[encoding]
+        if not options["enabled"]:
+            return None
+        return options[encoding] or self.levels[encoding]
+
+
+class _CompressingSend:
+    def __init__(self, middleware: CompressionMiddleware, scope, encoding: str, send):
+        self.middleware = middleware
+        self.scope = scope
+        self.encoding = encoding
+        self.send = send
+        self.start: Optional[dict] = None
+        self.encoder = None
+        self.level: Optional[int] = None
+        self.passthrough = False
+
+    def _headers(self, drop: Tuple[bytes, ...] = ()) -> List[tuple]:
+        return [(key, value) for key, value in self.start["headers"] if key.lower() not in drop]
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start = {**message, "headers": list(message.get("headers", []))}
+            headers = {key.lower(): value for key, value in self.start["headers"]}
+            content_type = headers.get(b"content-type", b"").decode("latin-1")
+            self.level = self.middleware.route_level(self.scope, self.encoding)
+            self.passthrough = (
+                self.level is None
+                or b"content-encoding" in headers
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            )
+            if self.passthrough:
+                await self.send(message)
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        stats = self.middleware.stats
+
+        if self.encoder is None and not more_body:
+            # Уся відповідь в одному повідомленні
+            if len(body) < self.middleware.minimum_size:
+                stats.skipped_small += 1
+                await self.send(self.start)
+                await self.send(message)
+                return
+            started = time.perf_counter()
+            compressed = compress_body(self.encoding, self.level, body)
+            stats.record(
+                self.encoding, len(body), len(compressed), time.perf_counter() - started, True
+            )
+            await self._send_start(content_length=len(compressed))
+            await self.send({"type": "http.response.body", "body": compressed})
+            return
+
+        if self.encoder is None:
+            self.encoder = ENCODERS[self.encoding](self.level)
+            await self._send_start()
+        started = time.perf_counter()
+        chunk = self.encoder.compress(body) if body else b""
+        if not more_body:
+            chunk += self.encoder.finish()
+        stats.record(
+            self.encoding, len(body), len(chunk), time.perf_counter() - started, not more_body
+        )
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    async def _send_start(self, content_length: int = None):
+        headers = self._headers(drop=(b"content-length", b"vary"))
+        vary = [value for key, value in self.start["headers"] if key.lower() == b"vary"]
+        headers.append((b"vary", b", ".join([*vary, b"Accept-Encoding"])))
+        headers.append((b"content-encoding", self.encoding.encode()))
+        if content_length is not None:
+            headers.append((b"content-length", str(content_length).encode()))
+        await self.send({**self.start, "headers": headers})
+
+
+compression_stats = CompressionStats()
@@ -0,0 +1,245 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Optional, Dict
+
+# NumPy імпортується лише у векторизованих функціях: шлях входу
+# використовує скалярну great_circle_km і не завантажує його
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Еліпсоїд WGS-84 для формули Вінсенті
+WGS84_A = 6378.137
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+VINCENTY_MAX_ITERATIONS = 200
+VINCENTY_TOLERANCE = 1e-12
+
+LAST_LOCATION_CACHE_SIZE = 100_000
+# Інші екземпляри API теж записують входи в профіль локацій, тож кеш
+# останньої локації довіряється лише коротко
+LAST_LOCATION_TTL_SECONDS = 60
+TRUSTED_LOCATION_CACHE_SIZE = 100_000
+
+# Точність geohash 5 символів відповідає клітинці ~5x5 км (рівень міста)
+GEOHASH_PRECISION = 5
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def great_circle_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Відстань по великому колу для однієї пари точок (без NumPy)"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(max(a, 0.0), 1.0)))
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Відстань по великому колу; приймає скаляри або масиви NumPy"""
+    import numpy as np
+
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Кодування координат у geohash"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        value, bounds = (longitude, lon_range) if even else (latitude, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            bounds[0] = middle
+        else:
+            bounds[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return "".join(chars)
+
+
+def vincenty_km(lat1, lon1, lat2, lon2):
+    """Векторизована обернена задача Вінсенті на еліпсоїді WGS-84
+
+    Точність до міліметрів; для майже антиподальних точок, де ітерації
+    не сходяться, повертається відстань за гаверсинусом.
+    """
+    import numpy as np
+
+    lat1, lon1, lat2, lon2 = (
+        np.atleast_1d(np.asarray(value, dtype=np.float64)) for value in (lat1, lon1, lat2, lon2)
+    )
+    lat1, lon1, lat2, lon2 = (
+        np.array(value) for value in np.broadcast_arrays(lat1, lon1, lat2, lon2)
+    )
+
+    u1 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat1)))
+    u2 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat2)))
+    delta_lon = np.radians(lon2 - lon1)
+    sin_u1, cos_u1 = np.sin(u1), np.cos(u1)
+    sin_u2, cos_u2 = np.sin(u2), np.cos(u2)
+
+    lam = delta_lon.copy()
+    sin_sigma, cos_sigma, sigma, cos_sq_alpha, cos_2sigma_m = (
+        np.zeros_like(lam) for _ in range(5)
+    )
+    # Ітерації рахуються лише для пар, що ще не зійшлися
+    active = np.arange(lam.size)
+    for _ in range(VINCENTY_MAX_ITERATIONS):
+        lam_a = lam.flat[active]
+        su1, cu1 = sin_u1.flat[active], cos_u1.flat[active]
+        su2, cu2 = sin_u2.flat[active], cos_u2.flat[active]
+        sin_lam, cos_lam = np.sin(lam_a), np.cos(lam_a)
+        s_sigma = np.sqrt((cu2 * sin_lam) ** 2 + (cu1 * su2 - su1 * cu2 * cos_lam) ** 2)
+        c_sigma = su1 * su2 + cu1 * cu2 * cos_lam
+        sig = np.arctan2(s_sigma, c_sigma)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            sin_alpha = np.where(s_sigma > 0, cu1 * cu2 * sin_lam / s_sigma, 0.0)
+            csq_alpha = 1 - sin_alpha**2
+            c2sm = np.where(csq_alpha > 0, c_sigma - 2 * su1 * su2 / csq_alpha, 0.0)
+        c = WGS84_F / 16 * csq_alpha * (4 + WGS84_F * (4 - 3 * csq_alpha))
+        lam_next = delta_lon.flat[active] + (1 - c) * WGS84_F * sin_alpha * (
+            sig + c * s_sigma * (c2sm + c * c_sigma * (-1 + 2 * c2sm**2))
+        )
+
+        sin_sigma.flat[active], cos_sigma.flat[active], sigma.flat[active] = s_sigma, c_sigma, sig
+        cos_sq_alpha.flat[active], cos_2sigma_m.flat[active] = csq_alpha, c2sm
+        lam.flat[active] = lam_next
+        active = active[np.abs(lam_next - lam_a) >= VINCENTY_TOLERANCE]
+        if not active.size:
+            break
+
+    u_sq = cos_sq_alpha * (WGS84_A**2 - WGS84_B**2) / WGS84_B**2
+    a_coef = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+    b_coef = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+    delta_sigma = (
+        b_coef
+        * sin_sigma
+        * (
+            cos_2sigma_m
+            + b_coef
+            / 4
+            * (
+                cos_sigma * (-1 + 2 * cos_2sigma_m**2)
+                - b_coef / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma**2) * (-3 + 4 * cos_2sigma_m**2)
+            )
+        )
+    )
+    distance = WGS84_B * a_coef * (sigma - delta_sigma)
+    if active.size:
+        distance.flat[active] = haversine_km(
+            lat1.flat[active], lon1.flat[active], lat2.flat[active], lon2.flat[active]
+        )
+    return distance
+
+
+def find_impossible_travel(
+    usernames: "np.ndarray",
+    timestamps: "np.ndarray",
+    latitudes: "np.ndarray",
+    longitudes: "np.ndarray",
+    max_distance_km: float,
+    max_interval_seconds: float,
+) -> Dict[str, "np.ndarray"]:
+    """Пошук пар послідовних входів одного користувача з неможливим переміщенням
+
+    timestamps задаються в секундах. Повертає індекси (у вхідних масивах)
+    попереднього та поточного входу, відстань і інтервал для кожної пари.
+    """
+    import numpy as np
+
+    order = np.lexsort((timestamps, usernames))
+    users = usernames[order]
+    same_user = users[1:] == users[:-1]
+    previous, current = order[:-1][same_user], order[1:][same_user]
+
+    distance = haversine_km(
+        latitudes[previous], longitudes[previous], latitudes[current], longitudes[current]
+    )
+    interval = timestamps[current] - timestamps[previous]
+    suspicious = (distance > max_distance_km) & (interval < max_interval_seconds)
+
+    return {
+        "previous": previous[suspicious],
+        "current": current[suspicious],
+        "distance_km": distance[suspicious],
+        "interval_seconds": interval[suspicious],
+    }
+
+
+class LastLocationCache:
+    """LRU-кеш останньої відомої локації кожного користувача з TTL"""
+
+    def __init__(
+        self,
+        max_size: int = LAST_LOCATION_CACHE_SIZE,
+        ttl_seconds: float = LAST_LOCATION_TTL_SECONDS,
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, username: str, now: float = None) -> Optional[tuple]:
+        """(latitude, longitude, seen_at) або None, якщо запису немає чи він застарів"""
+        entry = self._entries.get(username)
+        if entry is None:
+            return None
+        if (time.monotonic() if now is None else now) >= entry[1]:
+            del self._entries[username]
+            return None
+        self._entries.move_to_end(username)
+        return entry[0]
+
+    def set(self, username: str, latitude: float, longitude: float, seen_at, now: float = None):
+        expires_at = (time.monotonic() if now is None else now) + self.ttl_seconds
+        self._entries[username] = ((latitude, longitude, seen_at), expires_at)
+        self._entries.move_to_end(username)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def discard(self, username: str):
+        self._entries.pop(username, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class TrustedLocationCache:
+    """LRU-кеш множин довірених локацій (geohash) кожного користувача"""
+
+    def __init__(self, max_size: int = TRUSTED_LOCATION_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, set]" = OrderedDict()
+
+    def get(self, username: str) -> Optional[set]:
+        entry = self._entries.get(username)
+        if entry is not None:
+            self._entries.move_to_end(username)
+        return entry
+
+    def set(self, username: str, location_keys):
+        self._entries[username] = set(location_keys)
+        self._entries.move_to_end(username)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def add(self, username: str, location_key: str):
+        """Додавання ключа, якщо множина користувача вже завантажена"""
+        entry = self._entries.get(username)
+        if entry is not None:
+            entry.add(location_key)
+
+
+last_location_cache = LastLocationCache()
+trusted_location_cache = TrustedLocationCache()
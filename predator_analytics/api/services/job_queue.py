@@ -0,0 +1,371 @@
+import asyncio
+import logging
+import os
+import random
+import socket
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from api.config import settings
+from .auth_service import get_pool
+
+logger = logging.getLogger(__name__)
+
+# Обробники завдань: тип -> async функція(payload) -> результат (JSON)
+JOB_HANDLERS: Dict[str, Callable[[dict], Awaitable[object]]] = {}
+
+JOB_COLUMNS = """
+id, job_type, payload, status, attempts, max_attempts, run_after, result, error,
+created_by, created_at, started_at, finished_at, expires_at
+"""
+
+# Кілька воркерів забирають різні завдання: зайняті рядки пропускаються, а не очікуються
+CLAIM_QUERY = f"""
+UPDATE analytics_jobs j SET
+    status = 'running',
+    attempts = j.attempts + 1,
+    locked_by = $1,
+    locked_until = NOW() + $3 * INTERVAL '1 second',
+    started_at = NOW(),
+    error = NULL
+FROM (
+    SELECT id FROM analytics_jobs
+    WHERE status = 'queued' AND run_after <= NOW()
+    ORDER BY run_after, id
+    FOR UPDATE SKIP LOCKED
+    LIMIT $2
+) claimed
+WHERE j.id = claimed.id
+RETURNING {", ".join(f"j.{column.strip()}" for column in JOB_COLUMNS.split(","))}
+"""
+
+# Завдання воркера, що зник без завершення, повертаються в чергу після закінчення оренди
+REQUEUE_EXPIRED_QUERY = """
+UPDATE analytics_jobs SET
+    status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+    error = 'Оренда завдання закінчилася (воркер не відповідає)',
+    finished_at = CASE WHEN attempts >= max_attempts THEN NOW() END,
+    expires_at = CASE WHEN attempts >= max_attempts
+        THEN NOW() + $1 * INTERVAL '1 second' END,
+    locked_by = NULL,
+    locked_until = NULL
+WHERE status = 'running' AND locked_until < NOW()
+RETURNING id
+"""
+
+
+# Типи завдань, які можна поставити через API, та ролі, яким це дозволено;
+# решта (scheduled_report) ставиться лише сервером
+CLIENT_JOB_ROLES = {
+    "sql_query": {"admin", "analyst"},
+    "security_report": {"admin", "analyst"},
+    "visualization": {"admin", "analyst", "user"},
+}
+
+# Обов'язкові поля payload клієнтських завдань: без них обробник лише впаде у воркері
+CLIENT_JOB_FIELDS = {
+    "sql_query": ("query",),
+    "security_report": ("period_start", "period_end"),
+    "visualization": ("viz_id",),
+}
+
+
+def authorize_client_job(job_type: str, payload: dict, user: dict) -> dict:
+    """Перевірка права користувача на тип завдання; повертає payload для черги"""
+    roles = CLIENT_JOB_ROLES.get(job_type)
+    if roles is None:
+        raise HTTPException(status_code=400, detail=f"Невідомий тип завдання: {job_type}")
+    if not roles & set(user["roles"]):
+        raise HTTPException(status_code=403, detail="Недостатньо прав для виконання операції")
+    payload = dict(payload or {})
+    missing = [
+        field for field in CLIENT_JOB_FIELDS.get(job_type, ()) if payload.get(field) is None
+    ]
+    if missing:
+        raise HTTPException(
+            status_code=400, detail=f"Відсутні обов'язкові поля: {', '.join(missing)}"
+        )
+    # Автор звіту — завжди користувач запиту, а не значення від клієнта
+    if job_type == "security_report":
+        try:
+            datetime.fromisoformat(payload["period_start"])
+            datetime.fromisoformat(payload["period_end"])
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Некоректний формат дати періоду")
+        payload["generated_by"] = user["username"]
+    return payload
+
+
+def job_handler(job_type: str):
+    """Реєстрація обробника завдань типу job_type"""
+
+    def decorator(func):
+        JOB_HANDLERS[job_type] = func
+        return func
+
+    return decorator
+
+
+def retry_delay(attempts: int, jitter: float = None) -> float:
+    """Експоненційна затримка перед повтором з випадковим розкидом (50–100%)"""
+    delay = min(
+        settings.JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.JOB_RETRY_MAX_SECONDS
+    )
+    jitter = random.uniform(0.5, 1.0) if jitter is None else jitter
+    return delay * jitter
+
+
+async def enqueue_job(
+    conn, job_type: str, payload: dict = None, created_by: str = None, max_attempts: int = None
+) -> int:
+    """Постановка завдання в чергу; повертає id"""
+    if job_type not in JOB_HANDLERS:
+        raise HTTPException(status_code=400, detail=f"Невідомий тип завдання: {job_type}")
+    job_id = await conn.fetchval(
+        """
+        INSERT INTO analytics_jobs (job_type, payload, created_by, max_attempts)
+        VALUES ($1, $2, $3, $4)
+        RETURNING id
+        """,
+        job_type,
+        payload or {},
+        created_by,
+        max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+    logger.info("Завдання %s (%s) поставлено в чергу", job_id, job_type)
+    return job_id
+
+
+async def get_job(conn, job_id: int) -> Optional[dict]:
+    row = await conn.fetchrow(f"SELECT {JOB_COLUMNS} FROM analytics_jobs WHERE id = $1", job_id)
+    return dict(row) if row else None
+
+
+async def claim_jobs(conn, worker_id: str, limit: int, lease_seconds: float) -> List[dict]:
+    rows = await conn.fetch(CLAIM_QUERY, worker_id, limit, lease_seconds)
+    return [dict(row) for row in rows]
+
+
+async def extend_lease(conn, job_id: int, worker_id: str, lease_seconds: float) -> bool:
+    status = await conn.execute(
+        """
+        UPDATE analytics_jobs SET locked_until = NOW() + $3 * INTERVAL '1 second'
+        WHERE id = $1 AND locked_by = $2 AND status = 'running'
+        """,
+        job_id,
+        worker_id,
+        lease_seconds,
+    )
+    return status.endswith(" 1")
+
+
+async def complete_job(conn, job_id: int, worker_id: str, result, ttl_seconds: float) -> bool:
+    """Збереження результату; завдання, перехоплене іншим воркером, не змінюється"""
+    status = await conn.execute(
+        """
+        UPDATE analytics_jobs SET
+            status = 'succeeded', result = $3, finished_at = NOW(),
+            expires_at = NOW() + $4 * INTERVAL '1 second',
+            locked_by = NULL, locked_until = NULL
+        WHERE id = $1 AND locked_by = $2 AND status = 'running'
+        """,
+        job_id,
+        worker_id,
+        result,
+        ttl_seconds,
+    )
+    return status.endswith(" 1")
+
+
+async def fail_job(
+    conn, job: dict, worker_id: str, error: str, ttl_seconds: float, retry: bool = True
+) -> str:
+    """Повтор із затримкою, поки є спроби, інакше остаточна помилка; повертає новий статус"""
+    if retry and job["attempts"] < job["max_attempts"]:
+        await conn.execute(
+            """
+            UPDATE analytics_jobs SET
+                status = 'queued', error = $3,
+                run_after = NOW() + $4 * INTERVAL '1 second',
+                locked_by = NULL, locked_until = NULL
+            WHERE id = $1 AND locked_by = $2 AND status = 'running'
+            """,
+            job["id"],
+            worker_id,
+            error,
+            retry_delay(job["attempts"]),
+        )
+        return "queued"
+    await conn.execute(
+        """
+        UPDATE analytics_jobs SET
+            status = 'failed', error = $3, finished_at = NOW(),
+            expires_at = NOW() + $4 * INTERVAL '1 second',
+            locked_by = NULL, locked_until = NULL
+        WHERE id = $1 AND locked_by = $2 AND status = 'running'
+        """,
+        job["id"],
+        worker_id,
+        error,
+        ttl_seconds,
+    )
+    return "failed"
+
+
+async def requeue_expired_jobs(conn, ttl_seconds: float) -> int:
+    return len(await conn.fetch(REQUEUE_EXPIRED_QUERY, ttl_seconds))
+
+
+async def purge_expired_jobs(conn) -> int:
+    """Видалення завершених завдань, чий результат пережив TTL"""
+    status = await conn.execute("DELETE FROM analytics_jobs WHERE expires_at < NOW()")
+    return int(status.split()[-1])
+
+
+class JobWorker:
+    """Воркер черги: не більше concurrency завдань одночасно
+
+    Поки завдання виконується, воркер подовжує його оренду; якщо процес
+    зникне, завдання після закінчення оренди повернеться в чергу.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = None,
+        poll_interval: float = None,
+        lease_seconds: float = None,
+        result_ttl_seconds: float = None,
+        handlers: Dict[str, Callable] = None,
+    ):
+        self.concurrency = concurrency or settings.JOB_WORKER_CONCURRENCY
+        self.poll_interval = poll_interval or settings.JOB_POLL_INTERVAL_SECONDS
+        self.lease_seconds = lease_seconds or settings.JOB_LEASE_SECONDS
+        self.result_ttl_seconds = result_ttl_seconds or settings.JOB_RESULT_TTL_SECONDS
+        self.handlers = JOB_HANDLERS if handlers is None else handlers
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+        self._running: set = set()
+        self._stopping = asyncio.Event()
+        self.processed = {"succeeded": 0, "queued": 0, "failed": 0}
+
+    async def run(self):
+        logger.info("Воркер завдань %s запущено (паралельно: %s)", self.worker_id, self.concurrency)
+        pool = await get_pool()
+        maintenance_due = 0.0
+        loop = asyncio.get_running_loop()
+        while not self._stopping.is_set():
+            claimed = []
+            try:
+                async with pool.acquire() as conn:
+                    if loop.time() >= maintenance_due:
+                        await requeue_expired_jobs(conn, self.result_ttl_seconds)
+                        await purge_expired_jobs(conn)
+                        maintenance_due = loop.time() + self.lease_seconds / 4
+                    free = self.concurrency - len(self._running)
+                    if free > 0:
+                        claimed = await claim_jobs(conn, self.worker_id, free, self.lease_seconds)
+            except Exception as e:
+                logger.error("Помилка отримання завдань: %s", e)
+
+            for job in claimed:
+                task = asyncio.create_task(self.execute(job))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+
+            # Без паузи, якщо черга віддала все, що могла взяти: ймовірно, там є ще
+            if not claimed or len(self._running) >= self.concurrency:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+        logger.info("Воркер завдань %s зупинено", self.worker_id)
+
+    def stop(self):
+        self._stopping.set()
+
+    async def _keep_lease(self, job_id: int):
+        pool = await get_pool()
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                async with pool.acquire() as conn:
+                    await extend_lease(conn, job_id, self.worker_id, self.lease_seconds)
+            except Exception as e:
+                logger.warning("Не вдалося подовжити оренду завдання %s: %s", job_id, e)
+
+    async def execute(self, job: dict) -> str:
+        handler = self.handlers.get(job["job_type"])
+        lease = asyncio.create_task(self._keep_lease(job["id"]))
+        started = datetime.utcnow()
+        try:
+            if handler is None:
+                raise LookupError(f"Невідомий тип завдання: {job['job_type']}")
+            result = await handler(job["payload"] or {})
+        except Exception as e:
+            error = f"{type(e).__name__}: {getattr(e, 'detail', None) or e}"
+            logger.warning("Завдання %s (спроба %s): %s", job["id"], job["attempts"], error)
+            # Клієнтські помилки (4xx), некоректний payload та невідомий тип не повторюються
+            retry = (
+                handler is not None
+                and not isinstance(e, (KeyError, ValueError))
+                and getattr(e, "status_code", 500) >= 500
+            )
+            pool = await get_pool()
+            async with pool.acquire() as conn:
+                status = await fail_job(
+                    conn, job, self.worker_id, error, self.result_ttl_seconds, retry
+                )
+        else:
+            pool = await get_pool()
+            async with pool.acquire() as conn:
+                await complete_job(conn, job["id"], self.worker_id, result, self.result_ttl_seconds)
+            status = "succeeded"
+            logger.info(
+                "Завдання %s виконано за %.1f с",
+                job["id"],
+                (datetime.utcnow() - started).total_seconds(),
+            )
+        finally:
+            lease.cancel()
+        self.processed[status] += 1
+        return status
+
+
+@job_handler("sql_query")
+async def run_sql_query(payload: dict):
+    """Важкий SQL-запит з /query/: рядки результату"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        return await conn.fetch(payload["query"])
+
+
+@job_handler("security_report")
+async def run_security_report(payload: dict):
+    from .auth_service import generate_security_report
+
+    return await generate_security_report(
+        payload.get("report_type", "security"),
+        datetime.fromisoformat(payload["period_start"]),
+        datetime.fromisoformat(payload["period_end"]),
+        payload.get("generated_by"),
+    )
+
+
+@job_handler("visualization")
+async def run_visualization(payload: dict):
+    # pandas та plotly завантажуються лише у воркері
+    from .visualization_service import generate_visualization
+
+    return await generate_visualization(payload["viz_id"], payload.get("params"))
+
+
+@job_handler("scheduled_report")
+async def run_scheduled_report(payload: dict):
+    """Запуск розкладу report_schedules, поставлений планувальником звітів"""
+    from .report_scheduler import execute_scheduled_report
+
+    return await execute_scheduled_report(payload)
@@ -0,0 +1,68 @@
+from decimal import Decimal
+
+import asyncpg
+import orjson
+from fastapi.responses import JSONResponse
+
+# Ключі-не рядки (int, datetime) та масиви NumPy серіалізуються без перетворень
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+# Бінарний формат jsonb: байт версії, за ним текст JSON
+JSONB_VERSION = b"\x01"
+
+
+def _default(value):
+    """Типи, яких orjson не знає: записи asyncpg, Decimal та множини"""
+    if isinstance(value, asyncpg.Record):
+        return dict(value)
+    if isinstance(value, Decimal):
+        # Як у jsonable_encoder: без дробової частини в записі числа -> int
+        return int(value) if value.is_finite() and value.as_tuple().exponent >= 0 else float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Тип {type(value).__name__} не серіалізується в JSON")
+
+
+def dumps(value) -> bytes:
+    return orjson.dumps(value, default=_default, option=ORJSON_OPTIONS)
+
+
+def _encode_jsonb(value) -> bytes:
+    return JSONB_VERSION + dumps(value)
+
+
+def _decode_jsonb(data: bytes):
+    return orjson.loads(data[1:])
+
+
+async def init_connection(conn):
+    """Кодеки json/jsonb на orjson у бінарному форматі (працюють і для COPY)
+
+    Параметри JSONB передаються як dict/list, результати повертаються розібраними.
+    """
+    await conn.set_type_codec(
+        "jsonb",
+        encoder=_encode_jsonb,
+        decoder=_decode_jsonb,
+        schema="pg_catalog",
+        format="binary",
+    )
+    await conn.set_type_codec(
+        "json",
+        encoder=dumps,
+        decoder=orjson.loads,
+        schema="pg_catalog",
+        format="binary",
+    )
+
+
+class ORJSONRecordResponse(JSONResponse):
+    """JSON-відповідь через orjson: записи asyncpg, datetime та Decimal без jsonable_encoder
+
+    jsonable_encoder оминається лише тоді, коли маршрут повертає екземпляр
+    відповіді; для словників FastAPI спершу застосовує його сам.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -0,0 +1,181 @@
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from api.config import settings
+
+# Стандартні атрибути LogRecord; решта потрапляє в JSON як додаткові поля
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_exception_formatter = logging.Formatter()
+_listener: Optional[QueueListener] = None
+_handler: Optional["DroppingQueueHandler"] = None
+_lock = threading.Lock()
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Обробник, що лише кладе запис у чергу і ніколи не блокує
+
+    Форматування рядка (JSON чи текст) відкладається до потоку слухача. Якщо
+    черга заповнена, запис відкидається з підрахунком за рівнем.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped: Counter = Counter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Аргументи можуть змінитися, поки запис чекає в черзі, тому текст
+        # повідомлення фіксується тут; трасування виключення теж, щоб черга
+        # не тримала кадри стеку
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped[record.levelname] += 1
+
+
+class SamplingFilter(logging.Filter):
+    """Вибірка повідомлень нижче WARNING для гучних логерів
+
+    rates: префікс імені логера -> частка записів, що пропускається (0..1).
+    """
+
+    def __init__(self, rates: Dict[str, float] = None):
+        super().__init__()
+        # Довші префікси перевіряються першими
+        self.rates = dict(sorted((rates or {}).items(), key=lambda item: -len(item[0])))
+        self.sampled_out: Counter = Counter()
+
+    def rate_for(self, logger_name: str) -> float:
+        for prefix, rate in self.rates.items():
+            if logger_name == prefix or logger_name.startswith(prefix + "."):
+                return rate
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self.rate_for(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        self.sampled_out[record.name] += 1
+        return False
+
+
+class JsonFormatter(logging.Formatter):
+    """Структурований JSON-рядок на запис"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "function": record.funcName,
+            "line": record.lineno,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def parse_sampling(spec: str) -> Dict[str, float]:
+    """Розбір рядка «logger=0.1,other=0.5»"""
+    rates = {}
+    for item in (spec or "").split(","):
+        name, _, rate = item.strip().partition("=")
+        if name and rate:
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+def setup_logging(
+    level: str = None,
+    json_format: bool = None,
+    queue_size: int = None,
+    sampling: Dict[str, float] = None,
+    stream=None,
+) -> QueueListener:
+    """Налаштування асинхронного логування (повторний виклик нічого не змінює)
+
+    Кореневий логер отримує обробник-чергу, а вивід виконує окремий потік.
+    """
+    global _listener, _handler
+    with _lock:
+        if _listener is not None:
+            return _listener
+
+        level = level or settings.LOG_LEVEL
+        json_format = settings.LOG_FORMAT == "json" if json_format is None else json_format
+        queue_size = queue_size or settings.LOG_QUEUE_SIZE
+        if sampling is None:
+            sampling = parse_sampling(settings.LOG_SAMPLING)
+
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(
+            JsonFormatter()
+            if json_format
+            else logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        )
+
+        _handler = DroppingQueueHandler(queue.Queue(queue_size))
+        _handler.addFilter(SamplingFilter(sampling))
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(_handler)
+        root.setLevel(level)
+
+        _listener = QueueListener(_handler.queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+        return _listener
+
+
+def shutdown_logging():
+    """Зупинка слухача з дописуванням черги"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def logging_stats() -> dict:
+    """Лічильники відкинутих та відфільтрованих вибіркою записів"""
+    if _handler is None:
+        return {"dropped": {}, "sampled_out": {}, "queue_size": 0}
+    sampling = next(
+        (item for item in _handler.filters if isinstance(item, SamplingFilter)), None
+    )
+    return {
+        "dropped": dict(_handler.dropped),
+        "sampled_out": dict(sampling.sampled_out) if sampling else {},
+        "queue_size": _handler.queue.qsize(),
+    }
@@ -0,0 +1,299 @@
+import asyncio
+import hashlib
+import logging
+import random
+from collections import deque
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional
+
+import asyncpg
+
+from api.config import settings
+from .alert_dedup import ALERT_FLUSH_INTERVAL_SECONDS
+from .json_codecs import init_connection
+
+logger = logging.getLogger(__name__)
+
+# Зареєстровані періодичні завдання: назва -> PeriodicTask
+PERIODIC_TASKS: Dict[str, "PeriodicTask"] = {}
+
+
+def advisory_key(name: str) -> int:
+    """Стабільний між процесами ключ advisory-блокування (hash() рандомізований)"""
+    digest = hashlib.blake2b(f"periodic:{name}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+class TaskStats:
+    """Лічильники запусків завдання та історія останніх виконань"""
+
+    def __init__(self, history_size: int = None):
+        self.counts = {"succeeded": 0, "failed": 0, "timeout": 0, "overlap": 0, "not_leader": 0}
+        self.history: deque = deque(maxlen=history_size or settings.PERIODIC_TASK_HISTORY)
+        self.total_seconds = 0.0
+        self.last_success: Optional[datetime] = None
+
+    def skip(self, reason: str):
+        self.counts[reason] += 1
+
+    def record(self, status: str, started_at: datetime, duration: float, error: str = None):
+        self.counts[status] += 1
+        self.total_seconds += duration
+        if status == "succeeded":
+            self.last_success = started_at
+        self.history.append(
+            {
+                "started_at": started_at.isoformat(),
+                "duration_ms": round(duration * 1000, 3),
+                "status": status,
+                "error": error,
+            }
+        )
+
+    def snapshot(self) -> dict:
+        runs = self.counts["succeeded"] + self.counts["failed"] + self.counts["timeout"]
+        return {
+            **self.counts,
+            "avg_ms": round(self.total_seconds * 1000 / runs, 3) if runs else None,
+            "last_success": self.last_success.isoformat() if self.last_success else None,
+            "history": list(self.history),
+        }
+
+
+class PeriodicTask:
+    """Завдання, що виконується кожні interval ± jitter секунд
+
+    leader=True — у кластері його виконує лише екземпляр, що тримає
+    advisory-блокування завдання; решта пропускають свої запуски.
+    essential=True — завдання запускається навіть з PERIODIC_TASKS_ENABLED=false
+    (запис буферів у пам'яті, без якого вони ростуть і губляться).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[object]],
+        interval: float,
+        timeout: float = None,
+        jitter: float = None,
+        leader: bool = True,
+        essential: bool = False,
+    ):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.timeout = timeout or interval
+        self.jitter = settings.PERIODIC_TASK_JITTER if jitter is None else jitter
+        self.leader = leader
+        self.essential = essential
+        self.lock_key = advisory_key(name)
+        self.stats = TaskStats()
+
+    def next_delay(self, elapsed: float = 0.0) -> float:
+        """Пауза до наступного запуску з урахуванням тривалості поточного"""
+        spread = random.uniform(-self.jitter, self.jitter)
+        return max(0.0, self.interval * (1 + spread) - elapsed)
+
+
+def periodic_task(
+    name: str,
+    interval: float,
+    timeout: float = None,
+    jitter: float = None,
+    leader: bool = True,
+    essential: bool = False,
+):
+    """Реєстрація періодичного завдання name"""
+
+    def decorator(func):
+        PERIODIC_TASKS[name] = PeriodicTask(
+            name, func, interval, timeout, jitter, leader, essential
+        )
+        return func
+
+    return decorator
+
+
+async def _connect():
+    conn = await asyncpg.connect(
+        host=settings.POSTGRES_HOST,
+        database=settings.POSTGRES_DB,
+        user=settings.POSTGRES_USER,
+        password=settings.POSTGRES_PASSWORD,
+        port=settings.POSTGRES_PORT,
+    )
+    await init_connection(conn)
+    return conn
+
+
+class AdvisoryLeadership:
+    """Лідерство завдань через сесійні advisory-блокування одного з'єднання
+
+    Лідер тримає блокування, поки живе його з'єднання; якщо процес зникне,
+    Postgres звільнить блокування, і його візьме наступний екземпляр під час
+    свого запуску. Окреме з'єднання не займає місце в пулі.
+    """
+
+    def __init__(self, connect: Callable[[], Awaitable[object]] = None):
+        self._connect = connect or _connect
+        self._conn = None
+        self._held: set = set()
+        # Одне з'єднання не виконує кілька запитів одночасно
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, key: int) -> bool:
+        async with self._lock:
+            try:
+                if self._conn is None or self._conn.is_closed():
+                    self._held.clear()
+                    self._conn = await self._connect()
+                acquired = await self._conn.fetchval("SELECT pg_try_advisory_lock($1)", key)
+                if acquired and key in self._held:
+                    # Блокування реентрантне: лічильник сесії повертається до одиниці
+                    await self._conn.execute("SELECT pg_advisory_unlock($1)", key)
+            except Exception as e:
+                logger.warning("Вибір лідера періодичних завдань недоступний: %s", e)
+                self._drop()
+                return False
+            if acquired:
+                self._held.add(key)
+            else:
+                self._held.discard(key)
+            return acquired
+
+    def _drop(self):
+        self._held.clear()
+        if self._conn is not None and not self._conn.is_closed():
+            self._conn.terminate()
+        self._conn = None
+
+    async def close(self):
+        # Закриття сесії звільняє всі її блокування
+        async with self._lock:
+            if self._conn is not None and not self._conn.is_closed():
+                await self._conn.close()
+            self._conn = None
+            self._held.clear()
+
+
+class PeriodicTaskRunner:
+    """Виконавець періодичних завдань у lifespan застосунку
+
+    Кожне завдання має власний цикл: розкид інтервалу, тайм-аут, пропуск
+    запуску, якщо попередній ще триває, та вибір лідера між екземплярами.
+    """
+
+    def __init__(self, tasks: Dict[str, PeriodicTask] = None, leadership=None):
+        self.tasks = PERIODIC_TASKS if tasks is None else tasks
+        self.leadership = leadership or AdvisoryLeadership()
+        self._loops: list = []
+        self._running: set = set()
+
+    async def start(self, essential_only: bool = False):
+        """Запуск циклів завдань; essential_only — лише обов'язкових"""
+        if self._loops:
+            return
+        tasks = [task for task in self.tasks.values() if task.essential or not essential_only]
+        for task in tasks:
+            self._loops.append(asyncio.create_task(self._loop(task)))
+        logger.info("Періодичні завдання запущено: %s", ", ".join(task.name for task in tasks))
+
+    async def stop(self):
+        for loop_task in self._loops:
+            loop_task.cancel()
+        await asyncio.gather(*self._loops, return_exceptions=True)
+        self._loops = []
+        await self.leadership.close()
+
+    async def _loop(self, task: PeriodicTask):
+        loop = asyncio.get_running_loop()
+        # Початковий розкид: екземпляри, запущені разом, не виконують завдання одночасно
+        delay = random.uniform(0, task.interval * task.jitter)
+        while True:
+            await asyncio.sleep(delay)
+            started = loop.time()
+            await self.run_once(task)
+            delay = task.next_delay(loop.time() - started)
+
+    async def run_once(self, task: PeriodicTask) -> str:
+        """Один запуск завдання; повертає статус (включно з причиною пропуску)"""
+        if task.name in self._running:
+            task.stats.skip("overlap")
+            return "overlap"
+        if task.leader and not await self.leadership.acquire(task.lock_key):
+            task.stats.skip("not_leader")
+            return "not_leader"
+
+        self._running.add(task.name)
+        loop = asyncio.get_running_loop()
+        started_at = datetime.utcnow()
+        started = loop.time()
+        error = None
+        try:
+            await asyncio.wait_for(task.func(), task.timeout)
+            status = "succeeded"
+        except asyncio.TimeoutError:
+            status = "timeout"
+            error = f"Перевищено тайм-аут {task.timeout} с"
+            logger.error("Періодичне завдання %s: %s", task.name, error)
+        except Exception as e:
+            status = "failed"
+            error = f"{type(e).__name__}: {getattr(e, 'detail', None) or e}"
+            logger.error("Помилка періодичного завдання %s: %s", task.name, error)
+        finally:
+            self._running.discard(task.name)
+        task.stats.record(status, started_at, loop.time() - started, error)
+        return status
+
+    def snapshot(self) -> dict:
+        return {name: task.stats.snapshot() for name, task in self.tasks.items()}
+
+
+@periodic_task("cleanup_expired_data", settings.CLEANUP_INTERVAL_SECONDS, timeout=600)
+async def cleanup_expired_data():
+    # Включає очищення вимкнених 2FA (cleanup_2fa_data)
+    from .auth_service import cleanup_expired_data
+
+    await cleanup_expired_data()
+
+
+@periodic_task("security_metrics", settings.SECURITY_METRICS_INTERVAL_SECONDS, timeout=120)
+async def security_metrics():
+    from .auth_service import calculate_security_metrics
+
+    await calculate_security_metrics()
+
+
+@periodic_task("behavior_profiles", settings.BEHAVIOR_PROFILES_INTERVAL_SECONDS, timeout=1800)
+async def behavior_profiles():
+    # Пакетний аналог analyze_user_behavior для всіх користувачів (numpy — лише тут)
+    from .behavior_profiles import refresh_behavior_profiles
+
+    await refresh_behavior_profiles()
+
+
+# Лічильники придушених сповіщень живуть у пам'яті кожного екземпляра,
+# тож їх записує кожен екземпляр, а не лише лідер
+@periodic_task(
+    "alert_suppressor_flush", ALERT_FLUSH_INTERVAL_SECONDS, leader=False, essential=True
+)
+async def alert_suppressor_flush():
+    from .auth_service import flush_alert_suppressor
+
+    await flush_alert_suppressor()
+
+
+@periodic_task(
+    "risk_assessments_flush",
+    settings.RISK_ASSESSMENT_FLUSH_INTERVAL_SECONDS,
+    leader=False,
+    essential=True,
+)
+async def risk_assessments_flush():
+    # Буфер оцінок ризику також у пам'яті кожного екземпляра
+    from .risk_engine import risk_engine
+
+    await risk_engine.flush()
+
+
+periodic_runner = PeriodicTaskRunner()
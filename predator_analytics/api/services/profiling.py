@@ -0,0 +1,304 @@
+import asyncio
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+from uuid import uuid4
+
+import asyncpg
+
+from api.config import settings
+from .query_accounting import query_accounting
+from .tracing import trace_sampled, tracer
+
+logger = logging.getLogger(__name__)
+
+DEBUG_HEADER = b"x-debug-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+MAX_SPANS_PER_REQUEST = 1000
+MAX_STACK_DEPTH = 128
+QUERY_LABEL_LENGTH = 200
+# Довгоживучі відповіді (SSE) завжди перевищували б поріг
+EXCLUDED_PATHS = ("/alerts/stream", "/debug/profiles")
+
+_current_trace: ContextVar[Optional["RequestTrace"]] = ContextVar("request_trace", default=None)
+
+
+class RequestTrace:
+    """Іменовані відрізки часу одного запиту (зміщення від початку запиту, мс)"""
+
+    def __init__(self):
+        self.id = uuid4().hex[:12]
+        self.started = time.perf_counter()
+        self.spans: List[dict] = []
+        self.dropped_spans = 0
+
+    def add(self, name: str, started: float, attrs: dict):
+        if len(self.spans) >= MAX_SPANS_PER_REQUEST:
+            self.dropped_spans += 1
+            return
+        self.spans.append(
+            {
+                "name": name,
+                "start_ms": round((started - self.started) * 1000, 3),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                **attrs,
+            }
+        )
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Відрізок часу в трасі поточного запиту; поза запитом нічого не записує
+
+    Якщо запит входить до вибраної розподіленої траси, відрізок також
+    експортується трасувальником.
+    """
+    with tracer.child_span(name, **attrs):
+        trace = _current_trace.get()
+        if trace is None:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            trace.add(name, started, attrs)
+
+
+def query_label(query: str) -> str:
+    """Текст запиту в один рядок для назви відрізка (параметри не включаються)"""
+    return re.sub(r"\s+", " ", query).strip()[:QUERY_LABEL_LENGTH]
+
+
+def _row_count(operation: str, result) -> int:
+    if operation == "fetch":
+        return len(result)
+    if operation in ("fetchrow", "fetchval"):
+        return int(result is not None)
+    return 0
+
+
+class TracedConnection(asyncpg.Connection):
+    """З'єднання, що записує кожен запит до бази як відрізок поточного запиту
+
+    Кожен обмін з сервером також потрапляє в облік запитів по функціях
+    (query_accounting) та, якщо перевищує поріг, у журнал повільних запитів.
+    """
+
+    async def _traced(self, operation: str, call, query: str, *args, queries: int = 1, **kwargs):
+        started = time.perf_counter()
+        rows = 0
+        try:
+            if _current_trace.get() is None and not trace_sampled():
+                result = await call(query, *args, **kwargs)
+            else:
+                with span(f"db.{operation}", query=query_label(query)):
+                    result = await call(query, *args, **kwargs)
+            rows = _row_count(operation, result)
+            return result
+        finally:
+            # Запит, що завершився помилкою (напр. тайм-аут), теж займав з'єднання
+            query_accounting.record(
+                operation, query, args, time.perf_counter() - started, rows=rows, queries=queries
+            )
+
+    async def execute(self, query, *args, **kwargs):
+        return await self._traced("execute", super().execute, query, *args, **kwargs)
+
+    async def executemany(self, command, args, **kwargs):
+        # Усі набори параметрів надсилаються конвеєром за один обмін
+        args = list(args)
+        return await self._traced(
+            "executemany", super().executemany, command, args, queries=len(args), **kwargs
+        )
+
+    async def fetch(self, query, *args, **kwargs):
+        return await self._traced("fetch", super().fetch, query, *args, **kwargs)
+
+    async def fetchrow(self, query, *args, **kwargs):
+        return await self._traced("fetchrow", super().fetchrow, query, *args, **kwargs)
+
+    async def fetchval(self, query, *args, **kwargs):
+        return await self._traced("fetchval", super().fetchval, query, *args, **kwargs)
+
+    async def copy_records_to_table(self, table_name, **kwargs):
+        started = time.perf_counter()
+        try:
+            with span("db.copy", table=table_name):
+                return await super().copy_records_to_table(table_name, **kwargs)
+        finally:
+            query_accounting.record(
+                "copy", f"COPY {table_name}", (), time.perf_counter() - started
+            )
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Вибірковий профайлер: окремий потік періодично знімає стек цільового потоку
+
+    Результат у форматі collapsed stacks («a;b;c кількість»), який читають
+    flamegraph.pl та speedscope. Цикл подій спільний для всіх запитів, тому при
+    паралельних запитах у вибірку потрапляє і їхня робота.
+    """
+
+    def __init__(self, thread_id: int, interval_seconds: float):
+        self.thread_id = thread_id
+        self.interval_seconds = interval_seconds
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        labels = []
+        while frame is not None and len(labels) < MAX_STACK_DEPTH:
+            labels.append(_frame_label(frame))
+            frame = frame.f_back
+        if labels:
+            self.stacks[";".join(reversed(labels))] += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            self.sample()
+
+
+def collapsed_stacks(stacks: Dict[str, int]) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.items())
+
+
+class ProfileStore:
+    """Останні збережені профілі запитів (найстаріші витісняються)"""
+
+    def __init__(self, max_size: int = None):
+        self.max_size = max_size or settings.PROFILE_STORE_SIZE
+        self._profiles: "OrderedDict[str, dict]" = OrderedDict()
+
+    def add(self, profile: dict):
+        self._profiles[profile["id"]] = profile
+        while len(self._profiles) > self.max_size:
+            self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        return self._profiles.get(profile_id)
+
+    def summaries(self) -> List[dict]:
+        return [
+            {key: value for key, value in profile.items() if key not in ("spans", "stacks")}
+            for profile in reversed(self._profiles.values())
+        ]
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+
+class ProfilingMiddleware:
+    """ASGI-проміжний шар профілювання запитів
+
+    Кожен запит отримує трасу з відрізками викликів бази та бекендів; вона
+    зберігається, якщо запит триває довше за поріг. Вибірковий профіль стеків
+    знімається для запитів із заголовком X-Debug-Profile від адміністратора
+    та для випадкової частки запитів (PROFILE_SAMPLE_RATE).
+    """
+
+    def __init__(
+        self,
+        app,
+        store: ProfileStore,
+        authorize: Callable[[str], Awaitable[bool]] = None,
+        slow_ms: float = None,
+        sample_rate: float = None,
+        interval_ms: float = None,
+    ):
+        self.app = app
+        self.store = store
+        self.authorize = authorize
+        self.slow_ms = settings.PROFILE_SLOW_MS if slow_ms is None else slow_ms
+        self.sample_rate = settings.PROFILE_SAMPLE_RATE if sample_rate is None else sample_rate
+        interval_ms = settings.PROFILE_INTERVAL_MS if interval_ms is None else interval_ms
+        self.interval_seconds = interval_ms / 1000
+
+    async def _debug_requested(self, headers: dict) -> bool:
+        if not headers.get(DEBUG_HEADER) or self.authorize is None:
+            return False
+        scheme, _, token = headers.get(b"authorization", b"").decode().partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return False
+        try:
+            return await self.authorize(token)
+        except Exception as e:
+            logger.warning("Відхилено запит профілювання: %s", e)
+            return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(EXCLUDED_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        debug = await self._debug_requested(dict(scope["headers"]))
+        sampler = None
+        if debug or random.random() < self.sample_rate:
+            sampler = StackSampler(threading.get_ident(), self.interval_seconds)
+            sampler.start()
+
+        trace = RequestTrace()
+        token = _current_trace.set(trace)
+        status = 500
+
+        async def send_with_profile_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if debug:
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (PROFILE_ID_HEADER, trace.id.encode()),
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            _current_trace.reset(token)
+            duration_ms = (time.perf_counter() - trace.started) * 1000
+            # join() чекає на поточну вибірку потоку: не блокуємо цикл подій
+            stacks = await asyncio.to_thread(sampler.stop) if sampler else Counter()
+            if debug or duration_ms >= self.slow_ms:
+                self.store.add(
+                    {
+                        "id": trace.id,
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status,
+                        "duration_ms": round(duration_ms, 3),
+                        "reason": "debug" if debug else "slow",
+                        "samples": sum(stacks.values()),
+                        "dropped_spans": trace.dropped_spans,
+                        "created_at": datetime.utcnow().isoformat(),
+                        "spans": trace.spans,
+                        "stacks": dict(stacks),
+                    }
+                )
+
+
+profile_store = ProfileStore()
@@ -0,0 +1,181 @@
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from api.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Запити поза функціями з with_connection (пряме pool.acquire())
+UNSCOPED = "<unscoped>"
+
+_current_call: ContextVar[Optional["CallAccounting"]] = ContextVar("db_call", default=None)
+
+
+class FunctionStats:
+    """Накопичена статистика звернень до бази однієї функції"""
+
+    __slots__ = (
+        "calls",
+        "errors",
+        "queries",
+        "round_trips",
+        "rows",
+        "acquire_seconds",
+        "execute_seconds",
+        "commit_seconds",
+        "max_queries_per_call",
+    )
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def as_dict(self) -> dict:
+        calls = self.calls or 1
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "queries": self.queries,
+            "round_trips": self.round_trips,
+            "rows": self.rows,
+            "acquire_ms": round(self.acquire_seconds * 1000, 3),
+            "execute_ms": round(self.execute_seconds * 1000, 3),
+            "commit_ms": round(self.commit_seconds * 1000, 3),
+            # Середня кількість запитів на виклик, що росте з даними, вказує на N+1
+            "queries_per_call": round(self.queries / calls, 2),
+            "max_queries_per_call": self.max_queries_per_call,
+        }
+
+
+class CallAccounting:
+    """Лічильники одного виклику функції; переносяться в FunctionStats при завершенні"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.queries = 0
+        self.round_trips = 0
+        self.rows = 0
+        self.acquire_seconds = 0.0
+        self.execute_seconds = 0.0
+        self.commit_seconds = 0.0
+        # BEGIN/COMMIT самого with_connection рахуються лише як обміни з сервером
+        self.internal = False
+
+    @contextmanager
+    def timed(self, phase: str):
+        """Час фази acquire або commit; запити всередині не рахуються як запити функції"""
+        started = time.perf_counter()
+        self.internal = True
+        try:
+            yield
+        finally:
+            self.internal = False
+            elapsed = time.perf_counter() - started
+            setattr(self, f"{phase}_seconds", getattr(self, f"{phase}_seconds") + elapsed)
+
+
+class QueryAccounting:
+    """Облік запитів, обмінів з сервером, рядків та часу по функціях"""
+
+    def __init__(self, slow_query_ms: float = None):
+        self.slow_query_ms = settings.SLOW_QUERY_MS if slow_query_ms is None else slow_query_ms
+        self._stats: Dict[str, FunctionStats] = {}
+        self.slow_queries = 0
+
+    def _function(self, name: str) -> FunctionStats:
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = FunctionStats()
+        return stats
+
+    @contextmanager
+    def track(self, name: str):
+        """Облік звернень до бази всередині виклику функції name"""
+        call = CallAccounting(name)
+        token = _current_call.set(call)
+        failed = False
+        try:
+            yield call
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            _current_call.reset(token)
+            self._merge(call, failed)
+
+    def _merge(self, call: CallAccounting, failed: bool = False):
+        stats = self._function(call.name)
+        stats.calls += 1
+        stats.errors += failed
+        stats.queries += call.queries
+        stats.round_trips += call.round_trips
+        stats.rows += call.rows
+        stats.acquire_seconds += call.acquire_seconds
+        stats.execute_seconds += call.execute_seconds
+        stats.commit_seconds += call.commit_seconds
+        stats.max_queries_per_call = max(stats.max_queries_per_call, call.queries)
+
+    def record(
+        self,
+        operation: str,
+        query: str,
+        args: tuple,
+        elapsed: float,
+        rows: int = 0,
+        queries: int = 1,
+    ):
+        """Облік одного обміну з сервером (executemany передає кілька запитів за раз)"""
+        call = _current_call.get()
+        if call is None:
+            stats = self._function(UNSCOPED)
+            stats.queries += queries
+            stats.round_trips += 1
+            stats.rows += rows
+            stats.execute_seconds += elapsed
+        else:
+            call.round_trips += 1
+            if not call.internal:
+                call.queries += queries
+                call.rows += rows
+                call.execute_seconds += elapsed
+
+        if elapsed * 1000 >= self.slow_query_ms:
+            self.slow_queries += 1
+            logger.warning(
+                "Повільний запит (%.1f мс) у %s: %s %s, параметри: %s",
+                elapsed * 1000,
+                call.name if call else UNSCOPED,
+                operation,
+                " ".join(query.split()),
+                redact_params(args),
+            )
+
+    def snapshot(self) -> dict:
+        return {name: stats.as_dict() for name, stats in sorted(self._stats.items())}
+
+    def reset(self):
+        self._stats.clear()
+        self.slow_queries = 0
+
+
+def redact_params(args: tuple) -> list:
+    """Параметри запиту без значень: лише тип та розмір"""
+    redacted = []
+    for value in args:
+        if value is None:
+            redacted.append(None)
+        elif isinstance(value, (str, bytes, list, tuple, dict)):
+            redacted.append(f"<{type(value).__name__}:{len(value)}>")
+        else:
+            redacted.append(f"<{type(value).__name__}>")
+    return redacted
+
+
+def function_name(func) -> str:
+    return f"{func.__module__.rsplit('.', 1)[-1]}.{func.__qualname__}"
+
+
+query_accounting = QueryAccounting()
@@ -0,0 +1,363 @@
+import asyncio
+import calendar
+import logging
+from collections import deque
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import FrozenSet, List, Tuple
+
+from fastapi import HTTPException
+
+from api.config import settings
+from .auth_service import get_pool
+from .job_queue import enqueue_job
+
+logger = logging.getLogger(__name__)
+
+# Поля cron-виразу: назва, мінімум, максимум (день тижня 7 — також неділя)
+CRON_FIELDS = (
+    ("minute", 0, 59),
+    ("hour", 0, 23),
+    ("day", 1, 31),
+    ("month", 1, 12),
+    ("weekday", 0, 7),
+)
+
+# Період звіту за замовчуванням (днів), якщо parameters.period_days не задано
+DEFAULT_PERIOD_DAYS = {"daily": 1, "weekly": 7, "monthly": 30, "cron": 1}
+
+# Розклади, що настали; зайняті іншим екземпляром планувальника пропускаються
+CLAIM_SCHEDULES_QUERY = """
+SELECT id, report_type, schedule_config, parameters, created_by, next_run
+FROM report_schedules
+WHERE next_run <= NOW()
+ORDER BY next_run
+FOR UPDATE SKIP LOCKED
+LIMIT $1
+"""
+
+
+def _parse_cron_field(field: str, low: int, high: int) -> FrozenSet[int]:
+    values = set()
+    for part in field.split(","):
+        part, has_step, step = part.partition("/")
+        step = int(step) if has_step else 1
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(value) for value in part.split("-", 1))
+        else:
+            start = int(part)
+            # "5/15" — з 5-ї до кінця діапазону кожні 15
+            end = high if has_step else start
+        if step < 1 or start < low or end > high or start > end:
+            raise ValueError(f"Значення поза межами {low}-{high}: {field}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+class CronExpression:
+    """Cron-вираз з п'яти полів: хвилина, година, день місяця, місяць, день тижня
+
+    Підтримуються *, діапазони (1-5), кроки (*/15, 8-18/2) та списки (1,15).
+    День тижня 0 або 7 — неділя. Якщо обмежені і день місяця, і день тижня,
+    достатньо збігу будь-якого з них (як у cron).
+    """
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron-вираз має містити 5 полів: {expression!r}")
+        self.expression = expression
+        parsed = [
+            _parse_cron_field(field, low, high)
+            for field, (_, low, high) in zip(fields, CRON_FIELDS)
+        ]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = frozenset(day % 7 for day in weekdays)
+        self.day_restricted = not fields[2].startswith("*")
+        self.weekday_restricted = not fields[4].startswith("*")
+
+    def _day_matches(self, moment: datetime) -> bool:
+        in_month = moment.day in self.days
+        # cron рахує дні тижня з неділі, datetime.weekday() — з понеділка
+        in_week = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.day_restricted and self.weekday_restricted:
+            return in_month or in_week
+        return in_month and in_week
+
+    def next_after(self, after: datetime) -> datetime:
+        """Перша хвилина строго після after, що відповідає виразу"""
+        moment = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=366 * 5)
+        # Невідповідний місяць/день/година пропускаються цілком, а не по хвилині
+        while moment <= limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1) + timedelta(days=32)).replace(
+                    day=1, hour=0, minute=0
+                )
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f"Cron-вираз не має запусків: {self.expression!r}")
+
+
+@lru_cache(maxsize=256)
+def parse_cron(expression: str) -> CronExpression:
+    return CronExpression(expression)
+
+
+def next_run_after(schedule: dict, after: datetime) -> datetime:
+    """Перший запуск розкладу строго після after
+
+    frequency: daily (hour, minute), weekly (day — 0 понеділок, hour, minute),
+    monthly (day — число місяця; у коротших місяцях останній день) або cron
+    (expression). Часовий пояс after (UTC) зберігається.
+    """
+    frequency = schedule.get("frequency")
+    if frequency == "cron":
+        return parse_cron(schedule["expression"]).next_after(after)
+
+    at = {"hour": schedule.get("hour", 0), "minute": schedule.get("minute", 0)}
+    if frequency == "daily":
+        candidate = after.replace(**at, second=0, microsecond=0)
+        if candidate <= after:
+            candidate += timedelta(days=1)
+        return candidate
+    if frequency == "weekly":
+        candidate = after.replace(**at, second=0, microsecond=0) + timedelta(
+            days=(schedule["day"] - after.weekday()) % 7
+        )
+        if candidate <= after:
+            candidate += timedelta(days=7)
+        return candidate
+    if frequency == "monthly":
+        year, month = after.year, after.month
+        for _ in range(2):
+            day = min(schedule["day"], calendar.monthrange(year, month)[1])
+            candidate = after.replace(
+                year=year, month=month, day=day, **at, second=0, microsecond=0
+            )
+            if candidate > after:
+                return candidate
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    raise ValueError(f"Невідома періодичність розкладу: {frequency}")
+
+
+def validate_schedule(schedule: dict) -> datetime:
+    """Перевірка розкладу від клієнта; повертає наступний запуск"""
+    try:
+        return next_run_after(schedule, datetime.utcnow())
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Некоректний розклад: {e}")
+
+
+def due_runs(
+    schedule: dict, next_run: datetime, now: datetime, max_catchup: int
+) -> Tuple[List[datetime], int, datetime]:
+    """Запуски, що настали до now включно, кількість відкинутих та наступний запуск
+
+    Після простою надолужуються лише max_catchup найпізніших пропущених
+    запусків; старіші відкидаються, щоб не генерувати застарілі звіти пачкою.
+    """
+    runs = deque(maxlen=max(max_catchup, 1))
+    skipped = 0
+    slot = next_run
+    while slot <= now:
+        if len(runs) == runs.maxlen:
+            skipped += 1
+        runs.append(slot)
+        slot = next_run_after(schedule, slot)
+    return list(runs), skipped, slot
+
+
+async def _enqueue_runs(conn, schedule: dict, now: datetime, max_catchup: int) -> int:
+    config = schedule["schedule_config"]
+    runs, skipped, next_run = due_runs(config, schedule["next_run"], now, max_catchup)
+    if skipped:
+        logger.warning(
+            "Розклад %s: відкинуто %s пропущених запусків після простою", schedule["id"], skipped
+        )
+
+    parameters = schedule["parameters"] or {}
+    period = timedelta(
+        days=parameters.get("period_days") or DEFAULT_PERIOD_DAYS.get(config["frequency"], 1)
+    )
+    enqueued = 0
+    for slot in runs:
+        # Унікальний слот (schedule_id, scheduled_for): повторна постановка неможлива
+        result_id = await conn.fetchval(
+            """
+            INSERT INTO scheduled_report_results (schedule_id, scheduled_for, status)
+            VALUES ($1, $2, 'queued')
+            ON CONFLICT (schedule_id, scheduled_for) DO NOTHING
+            RETURNING id
+            """,
+            schedule["id"],
+            slot,
+        )
+        if result_id is None:
+            continue
+        job_id = await enqueue_job(
+            conn,
+            "scheduled_report",
+            {
+                "result_id": result_id,
+                "schedule_id": schedule["id"],
+                "report_type": schedule["report_type"],
+                "period_start": (slot - period).isoformat(),
+                "period_end": slot.isoformat(),
+                "generated_by": schedule["created_by"],
+            },
+            created_by=schedule["created_by"],
+        )
+        await conn.execute(
+            "UPDATE scheduled_report_results SET job_id = $2 WHERE id = $1", result_id, job_id
+        )
+        enqueued += 1
+
+    await conn.execute(
+        "UPDATE report_schedules SET next_run = $2 WHERE id = $1", schedule["id"], next_run
+    )
+    return enqueued
+
+
+async def schedule_due_reports(conn, batch_size: int, max_catchup: int) -> Tuple[int, int]:
+    """Одна транзакція планувальника: (забрано розкладів, поставлено запусків)
+
+    Розклади блокуються до кінця транзакції, а next_run зсувається в ній же
+    разом зі створенням завдань — після коміту слот уже не є таким, що настав.
+    """
+    enqueued = 0
+    async with conn.transaction():
+        # Час бази, а не вузла: годинники екземплярів можуть розходитися
+        now = await conn.fetchval("SELECT NOW()")
+        schedules = await conn.fetch(CLAIM_SCHEDULES_QUERY, batch_size)
+        for row in schedules:
+            schedule = dict(row)
+            try:
+                enqueued += await _enqueue_runs(conn, schedule, now, max_catchup)
+            except (KeyError, TypeError, ValueError) as e:
+                # Некоректний розклад вимикається, щоб не забирати його щоразу
+                logger.error("Розклад %s вимкнено: %s", schedule["id"], e)
+                await conn.execute(
+                    """
+                    UPDATE report_schedules SET
+                        next_run = 'infinity', last_status = 'invalid', last_error = $2
+                    WHERE id = $1
+                    """,
+                    schedule["id"],
+                    f"Некоректний розклад: {e}",
+                )
+    return len(schedules), enqueued
+
+
+async def _record_run(conn, payload: dict, status: str, report_id: int = None, error: str = None):
+    await conn.execute(
+        """
+        UPDATE scheduled_report_results SET status = $2, report_id = $3, error_message = $4
+        WHERE id = $1
+        """,
+        payload["result_id"],
+        status,
+        report_id,
+        error,
+    )
+    await conn.execute(
+        """
+        UPDATE report_schedules SET last_run = NOW(), last_status = $2, last_error = $3
+        WHERE id = $1
+        """,
+        payload["schedule_id"],
+        status,
+        error,
+    )
+
+
+async def execute_scheduled_report(payload: dict) -> dict:
+    """Обробник завдання scheduled_report: звіт за період слота та запис результату
+
+    Помилка фіксується в scheduled_report_results і передається черзі, яка
+    повторить завдання; після останньої спроби рядок лишається 'failed'.
+    """
+    from .auth_service import generate_security_report
+
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        await conn.execute(
+            "UPDATE scheduled_report_results SET status = 'running', run_at = NOW() WHERE id = $1",
+            payload["result_id"],
+        )
+    try:
+        report = await generate_security_report(
+            payload["report_type"],
+            datetime.fromisoformat(payload["period_start"]),
+            datetime.fromisoformat(payload["period_end"]),
+            payload.get("generated_by"),
+        )
+    except Exception as e:
+        async with pool.acquire() as conn:
+            await _record_run(
+                conn, payload, "failed", error=f"{getattr(e, 'detail', None) or e}"
+            )
+        raise
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await _record_run(conn, payload, "success", report_id=report["id"])
+    return {"schedule_id": payload["schedule_id"], "report_id": report["id"]}
+
+
+class ReportScheduler:
+    """Планувальник звітів: ставить у чергу analytics_jobs запуски, що настали
+
+    Екземплярів може бути скільки завгодно: розклади забираються через
+    FOR UPDATE SKIP LOCKED, тож кожен слот ставиться в чергу рівно один раз.
+    Самі звіти виконують воркери черги (обмежена паралельність, повтори).
+    """
+
+    def __init__(self, interval: float = None, batch_size: int = None, max_catchup: int = None):
+        self.interval = interval or settings.REPORT_SCHEDULER_INTERVAL_SECONDS
+        self.batch_size = batch_size or settings.REPORT_SCHEDULER_BATCH_SIZE
+        self.max_catchup = (
+            settings.REPORT_SCHEDULER_MAX_CATCHUP if max_catchup is None else max_catchup
+        )
+        self._stopping = asyncio.Event()
+        self.enqueued = 0
+
+    async def tick(self) -> int:
+        """Постановка всіх запусків, що настали; повертає їх кількість"""
+        pool = await get_pool()
+        enqueued = 0
+        while True:
+            async with pool.acquire() as conn:
+                claimed, batch_enqueued = await schedule_due_reports(
+                    conn, self.batch_size, self.max_catchup
+                )
+            enqueued += batch_enqueued
+            if claimed < self.batch_size:
+                break
+        self.enqueued += enqueued
+        return enqueued
+
+    async def run(self):
+        logger.info("Планувальник звітів запущено (інтервал: %s с)", self.interval)
+        while not self._stopping.is_set():
+            try:
+                enqueued = await self.tick()
+                if enqueued:
+                    logger.info("Поставлено в чергу запланованих звітів: %s", enqueued)
+            except Exception as e:
+                logger.error("Помилка планувальника звітів: %s", e)
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+        logger.info("Планувальник звітів зупинено")
+
+    def stop(self):
+        self._stopping.set()
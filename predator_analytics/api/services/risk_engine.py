@@ -0,0 +1,391 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from .auth_service import get_pool
+from .geo_utils import geohash_encode
+
+logger = logging.getLogger(__name__)
+
+FEATURE_CACHE_SIZE = 100_000
+WEIGHTS_CACHE_TTL_SECONDS = 300
+RESCORE_BATCH_SIZE = 5000
+# Буфер оцінок: з цього розміру запис запускається одразу (у фоновій задачі),
+# а після невдалих записів зберігаються лише останні ASSESSMENT_BUFFER_LIMIT
+ASSESSMENT_FLUSH_SIZE = 200
+ASSESSMENT_BUFFER_LIMIT = 10_000
+
+# Відсутні в кеші дані користувача (щоб не запитувати їх повторно до кінця TTL)
+_MISSING = object()
+
+
+class FeatureCache:
+    """LRU-кеш даних ознаки по користувачах з TTL"""
+
+    def __init__(self, ttl_seconds: float, max_size: int = FEATURE_CACHE_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, username: str, now: float = None):
+        """Дані користувача або _MISSING, якщо запису немає чи він застарів"""
+        entry = self._entries.get(username)
+        if entry is None:
+            return _MISSING
+        if (time.monotonic() if now is None else now) >= entry[1]:
+            del self._entries[username]
+            return _MISSING
+        self._entries.move_to_end(username)
+        return entry[0]
+
+    def set(self, username: str, value, now: float = None):
+        expires_at = (time.monotonic() if now is None else now) + self.ttl_seconds
+        self._entries[username] = (value, expires_at)
+        self._entries.move_to_end(username)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def discard(self, username: str):
+        self._entries.pop(username, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class Feature:
+    """Ознака ризику: пакетне завантаження даних користувачів та синхронна оцінка 0..1
+
+    Ознаки без load (ttl_seconds=0) оцінюються лише з контексту входу.
+    """
+
+    name: str = ""
+    default_weight: float = 0.0
+    ttl_seconds: float = 0
+
+    def __init__(self):
+        self.cache = FeatureCache(self.ttl_seconds) if self.ttl_seconds else None
+
+    async def load(self, conn, usernames: List[str]) -> Dict[str, object]:
+        return {}
+
+    def score(self, data, context: dict) -> float:
+        raise NotImplementedError
+
+
+FEATURES: Dict[str, Feature] = {}
+
+
+def register_feature(name: str, default_weight: float, ttl_seconds: float = 0):
+    """Декоратор реєстрації ознаки ризику"""
+
+    def decorator(cls):
+        cls.name = name
+        cls.default_weight = default_weight
+        cls.ttl_seconds = ttl_seconds
+        FEATURES[name] = cls()
+        return cls
+
+    return decorator
+
+
+@register_feature("unusual_time", default_weight=20, ttl_seconds=900)
+class UnusualTimeFeature(Feature):
+    """Вхід поза типовими годинами користувача (патерн login_time)"""
+
+    async def load(self, conn, usernames):
+        rows = await conn.fetch(
+            """
+            SELECT username, pattern_data
+            FROM user_behavior_patterns
+            WHERE pattern_type = 'login_time' AND username = ANY($1::varchar[])
+            """,
+            usernames,
+        )
+        return {
+            row["username"]: frozenset(row["pattern_data"].get("typical_hours", []))
+            for row in rows
+        }
+
+    def score(self, data, context):
+        if data is None:
+            return 0.0
+        return float(context["hour"] not in data)
+
+
+@register_feature("suspicious_location", default_weight=40)
+class SuspiciousLocationFeature(Feature):
+    """Аномалія локації, вже виявлена під час автентифікації"""
+
+    def score(self, data, context):
+        return float(bool(context.get("location_anomaly")))
+
+
+@register_feature("unfamiliar_location", default_weight=10, ttl_seconds=900)
+class UnfamiliarLocationFeature(Feature):
+    """Вхід з локації поза довіреними для користувача з наявною історією"""
+
+    async def load(self, conn, usernames):
+        rows = await conn.fetch(
+            """
+            SELECT username, ARRAY_AGG(location_key) as location_keys
+            FROM user_location_profiles
+            WHERE username = ANY($1::varchar[]) AND (is_trusted OR hit_count >= 5)
+            GROUP BY username
+            """,
+            usernames,
+        )
+        return {row["username"]: frozenset(row["location_keys"]) for row in rows}
+
+    def score(self, data, context):
+        location_key = context.get("location_key")
+        if not data or not location_key:
+            return 0.0
+        return float(location_key not in data)
+
+
+@register_feature("recent_failures", default_weight=15, ttl_seconds=60)
+class RecentFailuresFeature(Feature):
+    """Невдалі спроби входу за останню годину (насичення на 5 спробах)"""
+
+    async def load(self, conn, usernames):
+        rows = await conn.fetch(
+            """
+            SELECT username, COUNT(*) as failures
+            FROM auth_events
+            WHERE username = ANY($1::varchar[])
+            AND NOT success
+            AND occurred_at > NOW() - INTERVAL '1 hour'
+            GROUP BY username
+            """,
+            usernames,
+        )
+        return {row["username"]: row["failures"] for row in rows}
+
+    def score(self, data, context):
+        return min((data or 0) / 5, 1.0)
+
+
+def build_context(current_activity: dict, at: datetime = None) -> dict:
+    """Контекст входу для оцінки ознак"""
+    location_data = current_activity.get("location_data") or {}
+    location_key = location_data.get("location_key")
+    if not location_key and location_data.get("latitude") is not None:
+        location_key = geohash_encode(location_data["latitude"], location_data["longitude"])
+    return {
+        "hour": (at or datetime.utcnow()).hour,
+        "ip_address": current_activity.get("ip_address"),
+        "location_key": location_key,
+        "location_anomaly": current_activity.get("location_anomaly"),
+    }
+
+
+class RiskEngine:
+    """Оцінка ризику як зважена сума ознак з кешованими даними користувачів"""
+
+    def __init__(self, features: Dict[str, Feature] = None):
+        self.features = features if features is not None else FEATURES
+        self.names = list(self.features)
+        self._weights = [float(feature.default_weight) for feature in self.features.values()]
+        self._weights_loaded_at: Optional[float] = None
+        self._pending: List[tuple] = []
+        self._flush_task: Optional[asyncio.Task] = None
+
+    @property
+    def weights(self) -> Dict[str, float]:
+        return dict(zip(self.names, self._weights))
+
+    def set_weights(self, weights: Dict[str, float]):
+        for index, name in enumerate(self.names):
+            if name in weights:
+                self._weights[index] = float(weights[name])
+
+    async def load_weights(self, conn, force: bool = False):
+        """Ваги з таблиці risk_weights; ознаки без запису мають вагу за замовчуванням"""
+        now = time.monotonic()
+        if (
+            not force
+            and self._weights_loaded_at is not None
+            and now - self._weights_loaded_at < WEIGHTS_CACHE_TTL_SECONDS
+        ):
+            return
+        rows = await conn.fetch("SELECT feature_name, weight FROM risk_weights")
+        self._weights = [float(feature.default_weight) for feature in self.features.values()]
+        self.set_weights({row["feature_name"]: row["weight"] for row in rows})
+        self._weights_loaded_at = now
+
+    def invalidate(self, username: str = None):
+        """Скидання кешованих ознак користувача (або всіх)"""
+        for feature in self.features.values():
+            if feature.cache is None:
+                continue
+            if username is None:
+                feature.cache.clear()
+            else:
+                feature.cache.discard(username)
+
+    async def prefetch(self, conn, usernames: List[str]):
+        """Пакетне завантаження даних ознак, яких немає в кеші"""
+        for feature in self.features.values():
+            if feature.cache is None:
+                continue
+            missing = [name for name in usernames if feature.cache.get(name) is _MISSING]
+            if not missing:
+                continue
+            loaded = await feature.load(conn, missing)
+            for username in missing:
+                feature.cache.set(username, loaded.get(username))
+
+    def _feature_data(self, feature: Feature, username: str):
+        if feature.cache is None:
+            return None
+        data = feature.cache.get(username)
+        return None if data is _MISSING else data
+
+    def feature_vector(self, username: str, context: dict) -> List[float]:
+        return [
+            float(feature.score(self._feature_data(feature, username), context))
+            for feature in self.features.values()
+        ]
+
+    def score(self, username: str, context: dict) -> Tuple[int, List[str]]:
+        """Синхронна оцінка одного входу лише з кешованих даних"""
+        # Для одного входу numpy не потрібен: кілька множень дешевші за його імпорт
+        values = self.feature_vector(username, context)
+        factors = [name for name, value in zip(self.names, values) if value > 0]
+        total = sum(value * weight for value, weight in zip(values, self._weights))
+        return int(round(total)), factors
+
+    def score_batch(self, usernames: List[str], contexts: List[dict]) -> Tuple["np.ndarray", "np.ndarray"]:
+        """Векторизована оцінка: матриця ознак (користувачі x ознаки) на вектор ваг"""
+        import numpy as np
+
+        matrix = np.empty((len(usernames), len(self.names)), dtype=np.float64)
+        for row, (username, context) in enumerate(zip(usernames, contexts)):
+            matrix[row] = self.feature_vector(username, context)
+        return np.rint(matrix @ np.asarray(self._weights)).astype(np.int64), matrix
+
+    async def assess(self, conn, username: str, context: dict) -> Tuple[int, List[str]]:
+        """Оцінка входу: дозавантаження відсутніх ознак, оцінка та буферизований запис
+
+        Оцінка лише додається в буфер: запис окремим з'єднанням тут займав би
+        друге з'єднання пулу на шляху входу, поки викликач тримає своє. Буфер
+        записує періодичне завдання, а заповнений — фонова задача.
+        """
+        await self.load_weights(conn)
+        await self.prefetch(conn, [username])
+        risk_score, factors = self.score(username, context)
+        self._pending.append((username, risk_score, {"factors": factors}, datetime.utcnow()))
+        if len(self._pending) >= ASSESSMENT_FLUSH_SIZE and (
+            self._flush_task is None or self._flush_task.done()
+        ):
+            # Запис стартує після повернення керування циклу подій, не чекаючи на вхід
+            self._flush_task = asyncio.create_task(self.flush())
+        return risk_score, factors
+
+    async def flush(self):
+        """Пакетний запис накопичених оцінок в risk_assessments окремим з'єднанням"""
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        try:
+            pool = await get_pool()
+            async with pool.acquire() as conn:
+                await write_assessments(conn, pending)
+        except Exception as e:
+            # Пакет повертається в буфер до наступного запису; найстаріші
+            # оцінки понад ліміт відкидаються
+            self._pending = pending + self._pending
+            dropped = len(self._pending) - ASSESSMENT_BUFFER_LIMIT
+            if dropped > 0:
+                del self._pending[:dropped]
+            logger.error(
+                "Помилка при записі оцінок ризику (у буфері %s, відкинуто %s): %s",
+                len(self._pending),
+                max(dropped, 0),
+                e,
+            )
+
+    async def rescore_active_users(self, conn, hours: int = 24) -> int:
+        """Переоцінка всіх користувачів, що входили за останні hours годин"""
+        await self.load_weights(conn)
+        rows = await conn.fetch(
+            """
+            SELECT DISTINCT ON (e.username)
+                   e.username, e.occurred_at, e.ip_address, e.latitude::float8 as latitude,
+                   e.longitude::float8 as longitude,
+                   EXISTS (
+                       SELECT 1 FROM user_anomalies a
+                       WHERE a.username = e.username
+                       AND a.anomaly_type = 'impossible_travel'
+                       AND a.created_at > NOW() - make_interval(hours => $1)
+                   ) as location_anomaly
+            FROM auth_events e
+            WHERE e.success AND e.occurred_at > NOW() - make_interval(hours => $1)
+            ORDER BY e.username, e.occurred_at DESC
+            """,
+            hours,
+        )
+        assessed_at = datetime.utcnow()
+        for start in range(0, len(rows), RESCORE_BATCH_SIZE):
+            chunk = rows[start : start + RESCORE_BATCH_SIZE]
+            usernames = [row["username"] for row in chunk]
+            contexts = [
+                build_context(
+                    {
+                        "ip_address": row["ip_address"],
+                        "location_data": {"latitude": row["latitude"], "longitude": row["longitude"]},
+                        "location_anomaly": row["location_anomaly"],
+                    },
+                    row["occurred_at"],
+                )
+                for row in chunk
+            ]
+            await self.prefetch(conn, usernames)
+            scores, matrix = self.score_batch(usernames, contexts)
+            await write_assessments(
+                conn,
+                [
+                    (
+                        username,
+                        int(risk_score),
+                        {"factors": [name for name, value in zip(self.names, values) if value > 0]},
+                        assessed_at,
+                    )
+                    for username, risk_score, values in zip(usernames, scores, matrix)
+                ],
+            )
+        logger.info("Переоцінено ризик для користувачів: %s", len(rows))
+        return len(rows)
+
+
+async def write_assessments(conn, assessments: List[tuple]):
+    """Запис пакету (username, risk_score, risk_factors, assessed_at)"""
+    await conn.executemany(
+        """
+        INSERT INTO risk_assessments (username, risk_score, risk_factors, assessed_at)
+        VALUES ($1, $2, $3, $4)
+        """,
+        assessments,
+    )
+
+
+async def update_risk_weight(conn, feature_name: str, weight: float):
+    """Зміна ваги ознаки з негайним застосуванням у поточному процесі"""
+    if feature_name not in FEATURES:
+        raise ValueError(f"Невідома ознака ризику: {feature_name}")
+    await conn.execute(
+        """
+        INSERT INTO risk_weights (feature_name, weight)
+        VALUES ($1, $2)
+        ON CONFLICT (feature_name) DO UPDATE SET weight = EXCLUDED.weight, updated_at = NOW()
+        """,
+        feature_name,
+        weight,
+    )
+    await risk_engine.load_weights(conn, force=True)
+
+
+risk_engine = RiskEngine()
@@ -0,0 +1,196 @@
+import logging
+import time
+from typing import Dict, Optional
+
+from api.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Вікно ковзних лічильників (24 години) та розмір кошика
+COUNTER_WINDOW_SECONDS = 24 * 3600
+MEMORY_BUCKET_SECONDS = 60
+REDIS_BUCKET_SECONDS = 600
+RECONCILE_INTERVAL_SECONDS = 900
+
+SUCCESSFUL_LOGINS = "successful_logins"
+FAILED_LOGINS = "failed_logins"
+SESSIONS = "sessions"
+SUSPICIOUS_SESSIONS = "suspicious_sessions"
+COUNTER_NAMES = (SUCCESSFUL_LOGINS, FAILED_LOGINS, SESSIONS, SUSPICIOUS_SESSIONS)
+
+# Запити для звірки лічильників з таблицями за останні 24 години
+RECONCILIATION_QUERY = """
+SELECT
+    (SELECT COUNT(*) FROM auth_events
+     WHERE success AND occurred_at > NOW() - INTERVAL '24 hours') as successful_logins,
+    (SELECT COUNT(*) FROM auth_events
+     WHERE NOT success AND occurred_at > NOW() - INTERVAL '24 hours') as failed_logins,
+    (SELECT COUNT(*) FROM user_sessions
+     WHERE created_at > NOW() - INTERVAL '24 hours') as sessions,
+    (SELECT COUNT(*) FROM user_sessions
+     WHERE created_at > NOW() - INTERVAL '24 hours' AND is_suspicious) as suspicious_sessions
+"""
+
+
+class RollingCounter:
+    """Лічильник подій у ковзному вікні з кільцевим буфером кошиків"""
+
+    def __init__(
+        self,
+        window_seconds: int = COUNTER_WINDOW_SECONDS,
+        bucket_seconds: int = MEMORY_BUCKET_SECONDS,
+    ):
+        self.bucket_seconds = bucket_seconds
+        self.size = window_seconds // bucket_seconds
+        self._buckets = [0] * self.size
+        self._head: Optional[int] = None
+        self._total = 0
+
+    def _advance(self, now: float) -> int:
+        epoch = int(now // self.bucket_seconds)
+        if self._head is None:
+            self._head = epoch
+        elif epoch > self._head:
+            # Обнуляємо кошики, що випали з вікна (не більше розміру буфера)
+            for expired in range(self._head + 1, min(epoch, self._head + self.size) + 1):
+                slot = expired % self.size
+                self._total -= self._buckets[slot]
+                self._buckets[slot] = 0
+            self._head = epoch
+        return self._head % self.size
+
+    def add(self, amount: int = 1, now: float = None):
+        slot = self._advance(time.time() if now is None else now)
+        self._buckets[slot] += amount
+        self._total += amount
+
+    def total(self, now: float = None) -> int:
+        self._advance(time.time() if now is None else now)
+        return self._total
+
+    def correct(self, actual: int, now: float = None) -> int:
+        """Корекція дрейфу: різниця з фактичним значенням додається до поточного кошика"""
+        drift = actual - self.total(now)
+        if drift:
+            self.add(drift, now)
+        return drift
+
+
+class MemoryCounterBackend:
+    """Лічильники в пам'яті процесу"""
+
+    def __init__(self):
+        self._counters = {name: RollingCounter() for name in COUNTER_NAMES}
+
+    async def incr(self, name: str, amount: int = 1):
+        self._counters[name].add(amount)
+
+    async def totals(self) -> Dict[str, int]:
+        return {name: counter.total() for name, counter in self._counters.items()}
+
+    async def correct(self, name: str, actual: int) -> int:
+        return self._counters[name].correct(actual)
+
+
+class RedisCounterBackend:
+    """Лічильники в Redis, спільні для всіх процесів API"""
+
+    def __init__(self, client, prefix: str = "security_counters"):
+        self.client = client
+        self.prefix = prefix
+        self.buckets = COUNTER_WINDOW_SECONDS // REDIS_BUCKET_SECONDS
+
+    def _key(self, name: str, epoch: int) -> str:
+        return f"{self.prefix}:{name}:{epoch}"
+
+    async def incr(self, name: str, amount: int = 1):
+        key = self._key(name, int(time.time() // REDIS_BUCKET_SECONDS))
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.incrby(key, amount)
+            pipe.expire(key, COUNTER_WINDOW_SECONDS + REDIS_BUCKET_SECONDS)
+            await pipe.execute()
+
+    async def totals(self) -> Dict[str, int]:
+        current = int(time.time() // REDIS_BUCKET_SECONDS)
+        epochs = range(current - self.buckets + 1, current + 1)
+        keys = [self._key(name, epoch) for name in COUNTER_NAMES for epoch in epochs]
+        values = await self.client.mget(keys)
+        totals = {}
+        for index, name in enumerate(COUNTER_NAMES):
+            chunk = values[index * self.buckets : (index + 1) * self.buckets]
+            totals[name] = sum(int(value) for value in chunk if value is not None)
+        return totals
+
+    async def correct(self, name: str, actual: int) -> int:
+        drift = actual - (await self.totals())[name]
+        if drift:
+            await self.incr(name, drift)
+        return drift
+
+
+class SecurityCounters:
+    """Інкрементальні лічильники для метрик безпеки"""
+
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryCounterBackend()
+        self.last_reconciled_at: Optional[float] = None
+
+    async def _incr(self, name: str, amount: int = 1):
+        try:
+            await self.backend.incr(name, amount)
+        except Exception as e:
+            # Лічильники не повинні ламати автентифікацію
+            logger.error("Помилка при оновленні лічильника %s: %s", name, e)
+
+    async def record_login(self, success: bool):
+        await self._incr(SUCCESSFUL_LOGINS if success else FAILED_LOGINS)
+
+    async def record_session(self):
+        await self._incr(SESSIONS)
+
+    async def record_suspicious_session(self):
+        await self._incr(SUSPICIOUS_SESSIONS)
+
+    async def rates(self) -> Dict[str, float]:
+        """Поточні коефіцієнти за 24 години без звернення до бази даних"""
+        totals = await self.backend.totals()
+        rates = {}
+        attempts = totals[SUCCESSFUL_LOGINS] + totals[FAILED_LOGINS]
+        if attempts > 0:
+            rates["failed_login_rate"] = totals[FAILED_LOGINS] / attempts
+        if totals[SESSIONS] > 0:
+            rates["suspicious_sessions_rate"] = totals[SUSPICIOUS_SESSIONS] / totals[SESSIONS]
+        return rates
+
+    def reconciliation_due(self) -> bool:
+        return (
+            self.last_reconciled_at is None
+            or time.time() - self.last_reconciled_at > RECONCILE_INTERVAL_SECONDS
+        )
+
+    async def reconcile(self, conn) -> Dict[str, int]:
+        """Звірка лічильників з таблицями для корекції дрейфу"""
+        actual = await conn.fetchrow(RECONCILIATION_QUERY)
+        drift = {}
+        for name in COUNTER_NAMES:
+            drift[name] = await self.backend.correct(name, actual[name])
+        self.last_reconciled_at = time.time()
+        if any(drift.values()):
+            logger.info("Скориговано дрейф лічильників безпеки: %s", drift)
+        return drift
+
+
+def create_counter_backend():
+    """Вибір сховища лічильників згідно з налаштуваннями"""
+    if settings.SECURITY_COUNTERS_BACKEND == "redis":
+        try:
+            import redis.asyncio as redis
+
+            client = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
+            return RedisCounterBackend(client)
+        except ImportError:
+            logger.warning("Пакет redis не встановлено, лічильники зберігаються в пам'яті")
+    return MemoryCounterBackend()
+
+
+security_counters = SecurityCounters(create_counter_backend())
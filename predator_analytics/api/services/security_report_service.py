@@ -0,0 +1,290 @@
+import asyncio
+import logging
+from datetime import datetime, date, timedelta
+from typing import List, Dict, Optional
+
+from api.config import settings
+from .analytics_pool import analytics_pool
+from .auth_service import (
+    dense_daily_counts,
+    generate_security_report,
+    get_pool,
+    summarize_success_rate_trend,
+)
+from .hyperloglog import HyperLogLog
+
+logger = logging.getLogger(__name__)
+
+# Скільки днів обчислюється одночасно при заповненні відсутніх знімків
+SNAPSHOT_CONCURRENCY = 4
+
+# Адитивні метрики дня; кожен запит виконується на окремому з'єднанні пулу
+DAY_METRIC_QUERIES = {
+    "auth": """
+        SELECT
+            COUNT(*) FILTER (WHERE success) as successful_logins,
+            COUNT(*) FILTER (WHERE NOT success) as failed_logins
+        FROM auth_events
+        WHERE occurred_at >= $1 AND occurred_at < $2
+    """,
+    "anomalies": """
+        SELECT
+            COUNT(*) as total_anomalies,
+            COUNT(*) FILTER (WHERE severity >= 4) as high_severity_anomalies
+        FROM user_anomalies
+        WHERE created_at >= $1 AND created_at < $2
+    """,
+}
+
+ADDITIVE_METRICS = (
+    "successful_logins",
+    "failed_logins",
+    "total_anomalies",
+    "high_severity_anomalies",
+)
+
+# Унікальні значення дня збираються у скетчі HyperLogLog, які об'єднуються для періоду
+DAY_DISTINCT_QUERIES = {
+    "users_hll": """
+        SELECT DISTINCT username as value FROM auth_events
+        WHERE occurred_at >= $1 AND occurred_at < $2
+    """,
+    "ips_hll": """
+        SELECT DISTINCT host(ip_address) as value FROM auth_events
+        WHERE occurred_at >= $1 AND occurred_at < $2 AND ip_address IS NOT NULL
+    """,
+}
+
+# Точний підрахунок за весь період для аудиту
+DISTINCT_QUERY = """
+SELECT
+    COUNT(DISTINCT username) as unique_users,
+    COUNT(DISTINCT ip_address) as unique_ips
+FROM auth_events
+WHERE occurred_at >= $1 AND occurred_at < $2
+"""
+
+
+def day_bounds(day: date) -> tuple:
+    start = datetime.combine(day, datetime.min.time())
+    return start, start + timedelta(days=1)
+
+
+def report_period(report_type: str, anchor: date) -> tuple:
+    """Межі звітного періоду (включно), що містить дату anchor"""
+    if report_type == "daily":
+        return anchor, anchor
+    if report_type == "weekly":
+        start = anchor - timedelta(days=anchor.weekday())
+        return start, start + timedelta(days=6)
+    if report_type == "monthly":
+        start = anchor.replace(day=1)
+        next_month = (start + timedelta(days=32)).replace(day=1)
+        return start, next_month - timedelta(days=1)
+    raise ValueError(f"Непідтримуваний тип звіту: {report_type}")
+
+
+async def _fetch_on_own_connection(pool, query: str, *args):
+    async with pool.acquire() as conn:
+        return await conn.fetchrow(query, *args)
+
+
+async def _sketch_on_own_connection(pool, query: str, *args) -> bytes:
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(query, *args)
+    return HyperLogLog().update(row["value"] for row in rows).to_bytes()
+
+
+async def compute_day_metrics(pool, day: date) -> dict:
+    """Обчислення метрик одного дня паралельними запитами"""
+    start, end = day_bounds(day)
+    rows = await asyncio.gather(
+        *(_fetch_on_own_connection(pool, query, start, end) for query in DAY_METRIC_QUERIES.values())
+    )
+    metrics = {}
+    for row in rows:
+        metrics.update({key: row[key] for key in row.keys()})
+    return metrics
+
+
+async def compute_day_sketches(pool, day: date) -> dict:
+    """Скетчі унікальних користувачів та IP за день"""
+    start, end = day_bounds(day)
+    sketches = await asyncio.gather(
+        *(_sketch_on_own_connection(pool, query, start, end) for query in DAY_DISTINCT_QUERIES.values())
+    )
+    return dict(zip(DAY_DISTINCT_QUERIES, sketches))
+
+
+async def compute_day_snapshot(pool, day: date) -> dict:
+    metrics, sketches = await asyncio.gather(
+        compute_day_metrics(pool, day), compute_day_sketches(pool, day)
+    )
+    return {"metrics": metrics, **sketches}
+
+
+async def ensure_daily_snapshots(pool, first_day: date, last_day: date) -> Dict[date, dict]:
+    """Отримання щоденних знімків; відсутні закриті дні обчислюються та зберігаються
+
+    Знімок дня: {"metrics": dict, "users_hll": bytes, "ips_hll": bytes}.
+    """
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT day, metrics, users_hll, ips_hll
+            FROM security_daily_snapshots
+            WHERE day BETWEEN $1 AND $2
+            """,
+            first_day,
+            last_day,
+        )
+    snapshots = {row["day"]: dict(row) for row in rows}
+
+    today = datetime.utcnow().date()
+    missing = [
+        first_day + timedelta(days=offset)
+        for offset in range((last_day - first_day).days + 1)
+        if first_day + timedelta(days=offset) not in snapshots
+    ]
+    # Знімки, збережені до появи скетчів, доповнюються лише скетчами
+    without_sketches = [day for day, snapshot in snapshots.items() if snapshot["users_hll"] is None]
+    if not missing and not without_sketches:
+        return snapshots
+
+    semaphore = asyncio.Semaphore(SNAPSHOT_CONCURRENCY)
+
+    async def compute(day: date, job):
+        async with semaphore:
+            return day, await job(pool, day)
+
+    computed, sketched = await asyncio.gather(
+        asyncio.gather(*(compute(day, compute_day_snapshot) for day in missing)),
+        asyncio.gather(*(compute(day, compute_day_sketches) for day in without_sketches)),
+    )
+
+    # Незмінні знімки зберігаємо лише для днів, що вже закрились
+    closed = [
+        (day, snapshot["metrics"], snapshot["users_hll"], snapshot["ips_hll"])
+        for day, snapshot in computed
+        if day < today
+    ]
+    async with pool.acquire() as conn:
+        if closed:
+            await conn.executemany(
+                """
+                INSERT INTO security_daily_snapshots (day, metrics, users_hll, ips_hll)
+                VALUES ($1, $2, $3, $4)
+                ON CONFLICT (day) DO NOTHING
+                """,
+                closed,
+            )
+        if sketched:
+            await conn.executemany(
+                """
+                UPDATE security_daily_snapshots SET users_hll = $2, ips_hll = $3
+                WHERE day = $1 AND users_hll IS NULL
+                """,
+                [(day, sketches["users_hll"], sketches["ips_hll"]) for day, sketches in sketched],
+            )
+
+    snapshots.update(dict(computed))
+    for day, sketches in sketched:
+        snapshots[day].update(sketches)
+    return snapshots
+
+
+def merge_distinct(snapshots: List[dict]) -> dict:
+    """Наближені унікальні значення періоду з об'єднаних денних скетчів"""
+    result = {}
+    for key, metric in (("users_hll", "unique_users"), ("ips_hll", "unique_ips")):
+        sketch = HyperLogLog.union(
+            HyperLogLog.from_bytes(snapshot[key]) for snapshot in snapshots
+        )
+        result[metric] = sketch.count()
+        result[f"{metric}_error"] = sketch.standard_error
+    return result
+
+
+def merge_snapshots(snapshots: List[dict]) -> dict:
+    """Об'єднання щоденних знімків у метрики періоду"""
+    merged = {name: sum(snapshot.get(name, 0) for snapshot in snapshots) for name in ADDITIVE_METRICS}
+    total_attempts = merged["successful_logins"] + merged["failed_logins"]
+    merged["failed_login_rate"] = (
+        merged["failed_logins"] / total_attempts if total_attempts > 0 else 0
+    )
+    return merged
+
+
+async def build_report_metrics(
+    period_start: datetime, period_end: datetime, exact_distinct: bool = None
+) -> dict:
+    """Метрики звіту за довільний період з об'єднаних щоденних знімків
+
+    exact_distinct=True рахує унікальних користувачів та IP точним
+    COUNT(DISTINCT) замість скетчів HyperLogLog (для аудиту).
+    """
+    if exact_distinct is None:
+        exact_distinct = settings.REPORT_EXACT_DISTINCT
+
+    pool = await get_pool()
+    first_day, last_day = period_start.date(), period_end.date()
+
+    if exact_distinct:
+        # Знімки та точні унікальні значення незалежні, тож запитуються паралельно
+        snapshots, distinct = await asyncio.gather(
+            ensure_daily_snapshots(pool, first_day, last_day),
+            _fetch_on_own_connection(
+                pool, DISTINCT_QUERY, day_bounds(first_day)[0], day_bounds(last_day)[1]
+            ),
+        )
+    else:
+        snapshots = await ensure_daily_snapshots(pool, first_day, last_day)
+    ordered_days = sorted(day for day in snapshots if first_day <= day <= last_day)
+    daily = [snapshots[day]["metrics"] for day in ordered_days]
+
+    metrics = merge_snapshots(daily)
+    if exact_distinct:
+        metrics.update(dict(distinct))
+    else:
+        metrics.update(merge_distinct([snapshots[day] for day in ordered_days]))
+
+    if metrics["successful_logins"] + metrics["failed_logins"] > 0:
+        days = dense_daily_counts(
+            [
+                {
+                    "day": day,
+                    "successes": day_metrics["successful_logins"],
+                    "failures": day_metrics["failed_logins"],
+                }
+                for day, day_metrics in zip(ordered_days, daily)
+            ],
+            first_day,
+            last_day,
+        )
+        metrics["trends"] = await analytics_pool.run(
+            summarize_success_rate_trend, days, size=len(days)
+        )
+
+    return metrics
+
+
+async def generate_period_report(
+    report_type: str,
+    anchor: date,
+    generated_by: str,
+    end: Optional[date] = None,
+    exact_distinct: bool = None,
+) -> dict:
+    """Генерація щоденного, тижневого, місячного або довільного звіту"""
+    if report_type == "custom":
+        first_day, last_day = anchor, end or anchor
+    else:
+        first_day, last_day = report_period(report_type, anchor)
+
+    return await generate_security_report(
+        report_type,
+        day_bounds(first_day)[0],
+        day_bounds(last_day)[1] - timedelta(microseconds=1),
+        generated_by,
+        exact_distinct,
+    )
@@ -0,0 +1,320 @@
+import json
+import logging
+import queue
+import random
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, NamedTuple, Optional
+
+from api.config import settings
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_HEADER = b"traceparent"
+_TRACEPARENT_RE = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+# Коди видів відрізків OTLP
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3}
+# Відрізки викликів бази та бекендів позначаються як клієнтські
+CLIENT_SPAN_PREFIXES = ("db.", "backend.")
+# Запит API, для якого відрізки не створюються (довгоживучі відповіді)
+EXCLUDED_PATHS = ("/alerts/stream",)
+# Скільки пакетів відрізків чекає на експорт; при переповненні пакет відкидається
+EXPORT_QUEUE_BATCHES = 100
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class SpanContext(NamedTuple):
+    trace_id: str
+    span_id: str
+    sampled: bool
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[SpanContext]:
+    """Розбір заголовка W3C traceparent; некоректний заголовок ігнорується"""
+    match = _TRACEPARENT_RE.match((header or "").strip().lower())
+    if not match:
+        return None
+    version, trace_id, span_id, flags = match.groups()
+    if version == "ff" or trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return SpanContext(trace_id, span_id, bool(int(flags, 16) & 1))
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits) or 1:0{bits // 4}x}"
+
+
+class Span:
+    __slots__ = (
+        "name",
+        "context",
+        "parent_id",
+        "kind",
+        "attributes",
+        "start_ns",
+        "end_ns",
+        "error",
+    )
+
+    def __init__(
+        self, name: str, context: SpanContext, parent_id: str = None, kind: str = "internal"
+    ):
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes: Dict[str, object] = {}
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def to_otlp(self) -> dict:
+        """Відрізок у форматі OTLP/JSON"""
+        span = {
+            "traceId": self.context.trace_id,
+            "spanId": self.context.span_id,
+            "name": self.name,
+            "kind": SPAN_KINDS[self.kind],
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 0},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def otlp_request(spans: List[Span], service_name: str) -> dict:
+    """Пакет відрізків як ExportTraceServiceRequest (OTLP/JSON)"""
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [_otlp_attribute("service.name", service_name)]},
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "predator_analytics"},
+                        "spans": [span.to_otlp() for span in spans],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+class SpanExporter(ABC):
+    """Базовий експортер: отримує пакети завершених відрізків у потоці експорту"""
+
+    @abstractmethod
+    def export(self, spans: List[Span], service_name: str):
+        ...
+
+    def shutdown(self):
+        pass
+
+
+class InMemoryExporter(SpanExporter):
+    """Відрізки залишаються в пам'яті (для тестів)"""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def export(self, spans: List[Span], service_name: str):
+        self.spans.extend(spans)
+
+
+class FileExporter(SpanExporter):
+    """Рядок OTLP/JSON на пакет, як у файловому експортері OpenTelemetry Collector"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span], service_name: str):
+        line = json.dumps(otlp_request(spans, service_name), ensure_ascii=False)
+        with self._lock, open(self.path, "a", encoding="utf-8") as output:
+            output.write(line + "\n")
+
+
+EXPORTERS = {
+    "file": lambda: FileExporter(settings.TRACE_FILE),
+    "memory": InMemoryExporter,
+}
+
+
+class Tracer:
+    """Трасування з поширенням контексту W3C traceparent
+
+    Рішення про вибірку приймається в кореневому відрізку (TRACE_SAMPLE_RATE)
+    або береться з вхідного traceparent. Відрізки невибраних трас не
+    створюються, але їхній контекст передається далі з прапорцем 00.
+    Пакети експортуються окремим потоком, як записи логування: файловий
+    вивід не блокує цикл подій.
+    """
+
+    def __init__(
+        self,
+        exporter: SpanExporter = None,
+        sample_rate: float = None,
+        service_name: str = None,
+        batch_size: int = None,
+    ):
+        self.sample_rate = settings.TRACE_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.service_name = service_name or settings.TRACE_SERVICE_NAME
+        self.batch_size = batch_size or settings.TRACE_EXPORT_BATCH_SIZE
+        if exporter is None and settings.TRACE_EXPORTER in EXPORTERS:
+            exporter = EXPORTERS[settings.TRACE_EXPORTER]()
+        self.exporter = exporter
+        self._finished: List[Span] = []
+        self._queue: queue.Queue = queue.Queue(EXPORT_QUEUE_BATCHES)
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+        self.dropped_spans = 0
+
+    @contextmanager
+    def start_span(
+        self,
+        name: str,
+        kind: str = "internal",
+        parent: Optional[SpanContext] = None,
+        attributes: dict = None,
+    ):
+        """Відрізок-нащадок поточного (або parent); без батька починає нову трасу"""
+        if parent is None and _current_span.get() is not None:
+            parent = _current_span.get().context
+        if parent is None:
+            context = SpanContext(_new_id(128), _new_id(64), random.random() < self.sample_rate)
+        else:
+            context = SpanContext(parent.trace_id, _new_id(64), parent.sampled)
+        span = Span(name, context, parent.span_id if parent else None, kind)
+        if attributes:
+            span.attributes.update(attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            if context.sampled and self.exporter is not None:
+                self._finished.append(span)
+                if len(self._finished) >= self.batch_size:
+                    self._submit()
+
+    @contextmanager
+    def child_span(self, name: str, **attributes):
+        """Відрізок лише всередині вибраної траси; інакше нічого не записує"""
+        parent = _current_span.get()
+        if parent is None or not parent.context.sampled:
+            yield None
+            return
+        kind = "client" if name.startswith(CLIENT_SPAN_PREFIXES) else "internal"
+        with self.start_span(name, kind, attributes=attributes) as span:
+            yield span
+
+    def _submit(self):
+        """Передача накопиченого пакета потоку експорту без очікування"""
+        spans, self._finished = self._finished, []
+        if not spans or self.exporter is None:
+            return
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._export_loop, name="trace-exporter", daemon=True
+                )
+                self._worker.start()
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            self.dropped_spans += len(spans)
+
+    def _export_loop(self):
+        while True:
+            spans = self._queue.get()
+            try:
+                self.exporter.export(spans, self.service_name)
+            except Exception as e:
+                logger.error("Помилка експорту відрізків трасування: %s", e)
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """Експорт усіх відрізків з очікуванням потоку (зупинка сервера, тести)"""
+        self._submit()
+        self._queue.join()
+
+
+def trace_sampled() -> bool:
+    span = _current_span.get()
+    return span is not None and span.context.sampled
+
+
+def current_traceparent() -> Optional[str]:
+    span = _current_span.get()
+    return span.context.traceparent if span else None
+
+
+def inject_headers(headers: dict = None) -> dict:
+    """Заголовки вихідного запиту з traceparent поточного відрізка"""
+    headers = dict(headers or {})
+    traceparent = current_traceparent()
+    if traceparent:
+        headers["traceparent"] = traceparent
+    return headers
+
+
+class TracingMiddleware:
+    """ASGI-проміжний шар: серверний відрізок на запит з вхідним traceparent"""
+
+    def __init__(self, app, tracer: Tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(EXCLUDED_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        parent = parse_traceparent(headers.get(TRACEPARENT_HEADER, b"").decode("latin-1"))
+        name = f"{scope['method']} {scope['path']}"
+        with self.tracer.start_span(name, "server", parent) as span:
+            span.attributes.update({"http.method": scope["method"], "http.target": scope["path"]})
+
+            async def send_with_traceparent(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (TRACEPARENT_HEADER, span.context.traceparent.encode()),
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_with_traceparent)
+
+
+tracer = Tracer()
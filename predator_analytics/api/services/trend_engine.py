@@ -0,0 +1,182 @@
+import math
+from typing import Dict, List
+
+import numpy as np
+
+# Параметри аналізу за замовчуванням
+ROLLING_WINDOW = 7
+SEASON_LENGTH = 7  # Тижнева сезонність для щоденних рядів
+EWMA_ALPHA = 0.3
+EWMA_VARIANCE_ALPHA = 0.1  # Дисперсія згладжується повільніше за середнє
+CHANGE_POINT_SIGMA = 3.5
+CHANGE_POINT_WARMUP_DAYS = 14
+SIGNIFICANCE_LEVEL = 0.05
+
+
+def _student_t_p_value(t_stat: np.ndarray, dof: int) -> np.ndarray:
+    """Двобічне p-значення t-розподілу Стьюдента з цілим dof (A&S 26.7.3, 26.7.4)
+
+    Скінченні суми за степенями cos θ, θ = atan(|t| / sqrt(dof)), точні для
+    будь-якої кількості днів, тож короткі ряди не отримують заниженого p.
+    """
+    theta = np.arctan(np.abs(t_stat) / math.sqrt(dof))
+    sin, cos = np.sin(theta), np.cos(theta)
+    cos2 = cos * cos
+    if dof % 2 == 0:
+        term = np.ones_like(theta)
+        total = term.copy()
+        for k in range(1, dof // 2):
+            term = term * cos2 * (2 * k - 1) / (2 * k)
+            total += term
+        inside = sin * total
+    else:
+        term = cos.copy()
+        total = term.copy() if dof > 1 else np.zeros_like(theta)
+        for k in range(1, (dof - 1) // 2):
+            term = term * cos2 * (2 * k) / (2 * k + 1)
+            total += term
+        inside = 2.0 / math.pi * (theta + sin * total)
+    return np.clip(1.0 - inside, 0.0, 1.0)
+
+
+def rolling_mean(values: np.ndarray, window: int = ROLLING_WINDOW) -> np.ndarray:
+    """Ковзне середнє по осі днів; перші дні усереднюються по наявній історії"""
+    cumsum = np.cumsum(values, axis=1)
+    result = np.empty_like(values, dtype=np.float64)
+    head = min(window, values.shape[1])
+    result[:, :head] = cumsum[:, :head] / np.arange(1, head + 1)
+    if values.shape[1] > window:
+        result[:, window:] = (cumsum[:, window:] - cumsum[:, :-window]) / window
+    return result
+
+
+def linear_trend(values: np.ndarray) -> Dict[str, np.ndarray]:
+    """МНК-нахил кожного ряду з t-статистикою та p-значенням"""
+    n_days = values.shape[1]
+    t = np.arange(n_days, dtype=np.float64)
+    t_centered = t - t.mean()
+    ss_t = (t_centered @ t_centered) or 1.0
+
+    means = values.mean(axis=1)
+    slope = (values @ t_centered) / ss_t
+    intercept = means - slope * t.mean()
+    fitted = intercept[:, None] + slope[:, None] * t
+    residuals = values - fitted
+
+    dof = max(n_days - 2, 1)
+    stderr = np.sqrt((residuals * residuals).sum(axis=1) / dof / ss_t)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_stat = np.where(stderr > 0, slope / stderr, np.where(slope == 0, 0.0, np.inf))
+    if n_days > 2:
+        p_value = _student_t_p_value(t_stat, dof)
+    else:
+        # Пряма через дві точки не має залишкових ступенів свободи
+        p_value = np.ones_like(slope)
+
+    return {
+        "slope": slope,
+        "intercept": intercept,
+        "t_stat": t_stat,
+        "p_value": p_value,
+        "fitted": fitted,
+    }
+
+
+def ewma_change_points(
+    values: np.ndarray, alpha: float = EWMA_ALPHA, sigma: float = CHANGE_POINT_SIGMA
+) -> Dict[str, np.ndarray]:
+    """EWMA та позначки точок зміни, де відхилення перевищує sigma ковзних std"""
+    n_series, n_days = values.shape
+    ewma = np.empty((n_series, n_days), dtype=np.float64)
+    flags = np.zeros((n_series, n_days), dtype=bool)
+
+    mean = values[:, 0].astype(np.float64)
+    var = np.zeros(n_series, dtype=np.float64)
+    ewma[:, 0] = mean
+    # Цикл лише по днях; всі ряди обробляються одночасно
+    for day in range(1, n_days):
+        deviation = values[:, day] - mean
+        flags[:, day] = np.abs(deviation) > sigma * np.sqrt(var) + 1e-12
+        mean = mean + alpha * deviation
+        var = (1.0 - EWMA_VARIANCE_ALPHA) * (var + EWMA_VARIANCE_ALPHA * deviation * deviation)
+        ewma[:, day] = mean
+
+    # Перші дні лише накопичують статистику
+    flags[:, :CHANGE_POINT_WARMUP_DAYS] = False
+    return {"ewma": ewma, "change_points": flags}
+
+
+def seasonal_residuals(
+    detrended: np.ndarray, season: int = SEASON_LENGTH, phase_offset: int = 0
+) -> Dict[str, np.ndarray]:
+    """Сезонні індекси за фазою (напр. днем тижня) та залишки після їх вилучення"""
+    n_series, n_days = detrended.shape
+    phases = (np.arange(n_days) + phase_offset) % season
+    seasonal_index = np.zeros((n_series, season), dtype=np.float64)
+    for phase in range(season):
+        columns = phases == phase
+        if columns.any():
+            seasonal_index[:, phase] = detrended[:, columns].mean(axis=1)
+    seasonal_index -= seasonal_index.mean(axis=1, keepdims=True)
+    return {
+        "seasonal_index": seasonal_index,
+        "residuals": detrended - seasonal_index[:, phases],
+    }
+
+
+def analyze_series(
+    values,
+    window: int = ROLLING_WINDOW,
+    season: int = SEASON_LENGTH,
+    alpha: float = EWMA_ALPHA,
+    sigma: float = CHANGE_POINT_SIGMA,
+    phase_offset: int = 0,
+) -> Dict[str, np.ndarray]:
+    """Аналіз тенденцій для матриці рядів (ряди x дні) за один векторизований прохід
+
+    Пропущені дні мають бути заповнені викликачем, NaN не підтримуються.
+    phase_offset задає фазу першого дня (напр. weekday() для тижневої сезонності).
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+
+    trend = linear_trend(values)
+    change = ewma_change_points(values, alpha, sigma)
+    seasonal = seasonal_residuals(values - trend.pop("fitted"), season, phase_offset)
+    diffs = np.diff(values, axis=1)
+
+    return {
+        "rolling_mean": rolling_mean(values, window),
+        **trend,
+        "significant": trend["p_value"] < SIGNIFICANCE_LEVEL,
+        **change,
+        **seasonal,
+        "mean": values.mean(axis=1),
+        "std": values.std(axis=1, ddof=1) if values.shape[1] > 1 else np.zeros(len(values)),
+        "increasing": (diffs >= 0).all(axis=1),
+        "decreasing": (diffs <= 0).all(axis=1),
+    }
+
+
+def summarize(names: List[str], result: Dict[str, np.ndarray], days=None) -> Dict[str, dict]:
+    """Перетворення результату analyze_series у JSON-сумісне зведення по кожному ряду"""
+    summary = {}
+    for index, name in enumerate(names):
+        change_days = np.flatnonzero(result["change_points"][index])
+        summary[name] = {
+            "direction": (
+                "increasing"
+                if result["increasing"][index]
+                else "decreasing" if result["decreasing"][index] else "fluctuating"
+            ),
+            "mean": float(result["mean"][index]),
+            "std": float(result["std"][index]),
+            "slope": float(result["slope"][index]),
+            "p_value": float(result["p_value"][index]),
+            "significant": bool(result["significant"][index]),
+            "last_rolling_mean": float(result["rolling_mean"][index, -1]),
+            "change_points": [
+                days[day].isoformat() if days is not None else int(day) for day in change_days
+            ],
+            "residual_std": float(result["residuals"][index].std()),
+        }
+    return summary
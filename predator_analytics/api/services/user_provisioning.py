@@ -0,0 +1,231 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import secrets
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import List, Optional
+
+import pyotp
+
+from .auth_service import get_pool, pwd_context, validate_password
+
+logger = logging.getLogger(__name__)
+
+# bcrypt навмисно повільний, тому хешування розподіляється між процесами
+HASH_WORKERS = os.cpu_count() or 2
+HASH_CHUNK_SIZE = 32
+BACKUP_CODES_COUNT = 8
+# Найбільший пакет, що приймає HTTP-ендпоінт (CLI ділить файл на пакети сам)
+HTTP_BATCH_LIMIT = 1000
+
+STAGING_TABLES = """
+CREATE TEMP TABLE staging_users (
+    username VARCHAR(255) NOT NULL,
+    password_hash VARCHAR(255) NOT NULL,
+    email VARCHAR(255)
+) ON COMMIT DROP;
+CREATE TEMP TABLE staging_user_roles (
+    username VARCHAR(255) NOT NULL,
+    role_name VARCHAR(50) NOT NULL
+) ON COMMIT DROP;
+CREATE TEMP TABLE staging_two_factor (
+    username VARCHAR(255) NOT NULL,
+    secret_key TEXT NOT NULL,
+    backup_codes TEXT[] NOT NULL
+) ON COMMIT DROP;
+"""
+
+# Конфлікти з наявними даними визначаються одним проходом по staging
+CONFLICTS_QUERY = """
+SELECT s.username, 'user_exists' as reason, NULL::varchar as detail
+FROM staging_users s JOIN users u ON u.username = s.username
+UNION ALL
+SELECT s.username, 'email_exists', s.email
+FROM staging_users s JOIN users u ON u.email = s.email AND u.username <> s.username
+UNION ALL
+SELECT sr.username, 'unknown_role', sr.role_name
+FROM staging_user_roles sr LEFT JOIN roles r ON r.role_name = sr.role_name
+WHERE r.role_id IS NULL
+"""
+
+# Конфлікт користувача або email пропускає користувача; невідома роль лише не призначається
+BLOCKING_REASONS = ("user_exists", "email_exists")
+
+
+def _hash_chunk(passwords: List[str]) -> List[str]:
+    return [pwd_context.hash(password) for password in passwords]
+
+
+def hash_executor() -> ProcessPoolExecutor:
+    # spawn, а не fork: fork скопіював би блокування, захоплені потоками процесу
+    return ProcessPoolExecutor(
+        max_workers=HASH_WORKERS, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+async def hash_passwords(passwords: List[str], executor: Optional[Executor] = None) -> List[str]:
+    """Паралельне хешування паролів у пулі процесів, не блокуючи цикл подій"""
+    loop = asyncio.get_running_loop()
+    chunks = [
+        passwords[start : start + HASH_CHUNK_SIZE]
+        for start in range(0, len(passwords), HASH_CHUNK_SIZE)
+    ]
+    own_executor = executor is None
+    executor = executor or hash_executor()
+    try:
+        hashed = await asyncio.gather(
+            *(loop.run_in_executor(executor, _hash_chunk, chunk) for chunk in chunks)
+        )
+    finally:
+        if own_executor:
+            executor.shutdown(wait=False)
+    return [password_hash for chunk in hashed for password_hash in chunk]
+
+
+def validate_batch(users: List[dict]) -> tuple:
+    """Відбір коректних записів пакету; повертає (записи, відхилені)
+
+    Повтор імені чи email у пакеті відхиляється тут: інакше друге злиття
+    пропустив би ON CONFLICT, і воно виглядало б як паралельна вставка.
+    """
+    accepted, rejected, seen, seen_emails = [], [], set(), set()
+    for user in users:
+        username = (user.get("username") or "").strip()
+        email = user.get("email")
+        detail = None
+        if not username:
+            reason = "missing_username"
+        elif username in seen:
+            reason = "duplicate_in_batch"
+        elif email and email in seen_emails:
+            reason, detail = "duplicate_email_in_batch", email
+        elif not validate_password(user.get("password") or ""):
+            reason = "weak_password"
+        else:
+            seen.add(username)
+            if email:
+                seen_emails.add(email)
+            accepted.append({**user, "username": username})
+            continue
+        rejected.append({"username": username, "reason": reason, "detail": detail})
+    return accepted, rejected
+
+
+def _two_factor_secret(username: str) -> dict:
+    secret = pyotp.random_base32()
+    return {
+        "secret": secret,
+        "backup_codes": [secrets.token_hex(4) for _ in range(BACKUP_CODES_COUNT)],
+        "provisioning_uri": pyotp.TOTP(secret).provisioning_uri(
+            username, issuer_name="Predator Analytics"
+        ),
+    }
+
+
+async def provision_users(users: List[dict], executor: Optional[Executor] = None) -> dict:
+    """Пакетне створення користувачів з ролями та початковими даними 2FA
+
+    Кожен запис: {"username", "password", "email", "roles": [..], "two_factor": bool}.
+    Усе злиття пакету виконується в одній транзакції; користувачі, що
+    конфліктують з наявними, пропускаються та потрапляють у звіт.
+    """
+    accepted, rejected = validate_batch(users)
+    report = {"created": [], "conflicts": rejected, "roles_assigned": 0, "two_factor": {}}
+    if not accepted:
+        return report
+
+    hashes = await hash_passwords([user["password"] for user in accepted], executor)
+    two_factor = {
+        user["username"]: _two_factor_secret(user["username"])
+        for user in accepted
+        if user.get("two_factor")
+    }
+
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute(STAGING_TABLES)
+            await conn.copy_records_to_table(
+                "staging_users",
+                records=[
+                    (user["username"], password_hash, user.get("email"))
+                    for user, password_hash in zip(accepted, hashes)
+                ],
+                columns=["username", "password_hash", "email"],
+            )
+            await conn.copy_records_to_table(
+                "staging_user_roles",
+                records=[
+                    (user["username"], role)
+                    for user in accepted
+                    for role in dict.fromkeys(user.get("roles") or [])
+                ],
+                columns=["username", "role_name"],
+            )
+            await conn.copy_records_to_table(
+                "staging_two_factor",
+                records=[
+                    (username, data["secret"], data["backup_codes"])
+                    for username, data in two_factor.items()
+                ],
+                columns=["username", "secret_key", "backup_codes"],
+            )
+
+            conflicts = [dict(row) for row in await conn.fetch(CONFLICTS_QUERY)]
+            blocked = sorted(
+                {row["username"] for row in conflicts if row["reason"] in BLOCKING_REASONS}
+            )
+
+            created = await conn.fetch(
+                """
+                INSERT INTO users (username, password_hash, email)
+                SELECT username, password_hash, email
+                FROM staging_users
+                WHERE NOT (username = ANY($1::varchar[]))
+                ON CONFLICT DO NOTHING
+                RETURNING username
+                """,
+                blocked,
+            )
+            created = [row["username"] for row in created]
+
+            roles_assigned = await conn.execute(
+                """
+                INSERT INTO user_roles (username, role_id)
+                SELECT sr.username, r.role_id
+                FROM staging_user_roles sr
+                JOIN roles r ON r.role_name = sr.role_name
+                WHERE sr.username = ANY($1::varchar[])
+                ON CONFLICT DO NOTHING
+                """,
+                created,
+            )
+            await conn.execute(
+                """
+                INSERT INTO two_factor_auth (username, secret_key, backup_codes)
+                SELECT username, secret_key, backup_codes
+                FROM staging_two_factor
+                WHERE username = ANY($1::varchar[])
+                ON CONFLICT (username) DO NOTHING
+                """,
+                created,
+            )
+
+    created_set = set(created)
+    # Користувачі, пропущені через паралельну вставку між перевіркою та злиттям
+    raced = [
+        {"username": user["username"], "reason": "user_exists", "detail": None}
+        for user in accepted
+        if user["username"] not in created_set and user["username"] not in blocked
+    ]
+    report["created"] = created
+    report["conflicts"] = rejected + conflicts + raced
+    report["roles_assigned"] = int(roles_assigned.split()[-1])
+    report["two_factor"] = {
+        username: data for username, data in two_factor.items() if username in created_set
+    }
+    logger.info(
+        "Створено користувачів: %s, конфліктів: %s", len(created), len(report["conflicts"])
+    )
+    return report
@@ -1,12 +1,11 @@
 from fastapi import HTTPException
-from datetime import datetime, timedelta
+from datetime import datetime
 import logging
 import json
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from typing import List, Dict, Optional
+from .analytics_pool import TableSource, analytics_pool, open_frame, records_to_columns
 from .auth_service import with_connection
+from .report_scheduler import next_run_after, validate_schedule
 
 logger = logging.getLogger(__name__)
 
@@ -44,10 +43,26 @@ async def create_visualization(
         )
         return viz_id
     except Exception as e:
-        logger.error(f"Помилка при створенні візуалізації: {str(e)}")
+        logger.error("Помилка при створенні візуалізації: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при створенні візуалізації")
 
 
+CHART_TYPES = ("line", "bar", "scatter", "pie")
+
+
+def render_chart(source: TableSource, visualization_type: str, chart_config: dict) -> dict:
+    """Графік plotly та дані візуалізації; виконується в пулі аналітики"""
+    # pandas та plotly імпортуються лише тут: вони потрібні тільки для побудови графіка
+    import plotly.express as px
+
+    with open_frame(source) as df:
+        fig = getattr(px, visualization_type)(df, **chart_config)
+        result = {"plot_data": fig.to_json(), "data": df.to_dict(orient="records")}
+        # Без посилань на стовпці сегмент спільної пам'яті закривається одразу
+        del df, fig
+    return result
+
+
 @with_connection
 async def generate_visualization(conn, viz_id: int, params: dict = None) -> dict:
     """Генерація візуалізації на основі збережених налаштувань"""
@@ -64,33 +79,24 @@ async def generate_visualization(conn, viz_id: int, params: dict = None) -> dict
         if not viz_config:
             raise HTTPException(status_code=404, detail="Візуалізацію не знайдено")
 
+        visualization_type = viz_config["visualization_type"]
+        if visualization_type not in CHART_TYPES:
+            raise ValueError(f"Непідтримуваний тип візуалізації: {visualization_type}")
+
         # Виконуємо запит з параметрами
         query = viz_config["data_query"]
         data = await conn.fetch(query)
 
-        # Конвертуємо дані в pandas DataFrame
-        df = pd.DataFrame([dict(row) for row in data])
-
-        # Створюємо візуалізацію за допомогою plotly
-        fig = None
-        chart_config = viz_config["chart_config"]
-
-        if viz_config["visualization_type"] == "line":
-            fig = px.line(df, **chart_config)
-        elif viz_config["visualization_type"] == "bar":
-            fig = px.bar(df, **chart_config)
-        elif viz_config["visualization_type"] == "scatter":
-            fig = px.scatter(df, **chart_config)
-        elif viz_config["visualization_type"] == "pie":
-            fig = px.pie(df, **chart_config)
-        else:
-            raise ValueError(
-                f"Непідтримуваний тип візуалізації: {viz_config['visualization_type']}"
-            )
-
-        return {"plot_data": fig.to_json(), "data": df.to_dict(orient="records")}
+        # Побудова графіка (pandas, plotly) не блокує цикл подій: великі дані
+        # обробляє пул процесів, малі — потік цього процесу
+        return await analytics_pool.run_table(
+            render_chart,
+            records_to_columns(data),
+            visualization_type,
+            viz_config["chart_config"],
+        )
     except Exception as e:
-        logger.error(f"Помилка при генерації візуалізації: {str(e)}")
+        logger.error("Помилка при генерації візуалізації: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при генерації візуалізації")
 
 
@@ -99,6 +105,8 @@ async def schedule_report(
     conn, report_type: str, schedule: dict, parameters: dict = None, created_by: str = None
 ) -> int:
     """Планування періодичного звіту"""
+    # Некоректний розклад (зокрема cron-вираз) — помилка клієнта, а не сервера
+    next_run = validate_schedule(schedule)
     try:
         query = """
         INSERT INTO report_schedules (
@@ -108,50 +116,19 @@ async def schedule_report(
         RETURNING id
         """
 
-        # Розраховуємо наступний запуск
-        next_run = calculate_next_run(schedule)
-
         schedule_id = await conn.fetchval(
             query, report_type, schedule, parameters, created_by, next_run
         )
 
         return schedule_id
     except Exception as e:
-        logger.error(f"Помилка при плануванні звіту: {str(e)}")
+        logger.error("Помилка при плануванні звіту: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при плануванні звіту")
 
 
-def calculate_next_run(schedule: dict) -> datetime:
+def calculate_next_run(schedule: dict, after: datetime = None) -> datetime:
     """Розрахунок наступного часу запуску звіту"""
-    now = datetime.utcnow()
-
-    if schedule["frequency"] == "daily":
-        next_run = now.replace(
-            hour=schedule.get("hour", 0), minute=schedule.get("minute", 0), second=0
-        )
-        if next_run <= now:
-            next_run += timedelta(days=1)
-    elif schedule["frequency"] == "weekly":
-        days_ahead = schedule["day"] - now.weekday()
-        if days_ahead <= 0:
-            days_ahead += 7
-        next_run = now.replace(
-            hour=schedule.get("hour", 0), minute=schedule.get("minute", 0), second=0
-        ) + timedelta(days=days_ahead)
-    elif schedule["frequency"] == "monthly":
-        next_run = now.replace(
-            day=schedule["day"],
-            hour=schedule.get("hour", 0),
-            minute=schedule.get("minute", 0),
-            second=0,
-        )
-        if next_run <= now:
-            if now.month == 12:
-                next_run = next_run.replace(year=now.year + 1, month=1)
-            else:
-                next_run = next_run.replace(month=now.month + 1)
-
-    return next_run
+    return next_run_after(schedule, after or datetime.utcnow())
 
 
 @with_connection
@@ -160,12 +137,12 @@ async def get_scheduled_reports(conn) -> List[dict]:
     try:
         query = """
         SELECT id, report_type, schedule_config, parameters,
-               created_by, created_at, next_run, last_run
+               created_by, created_at, next_run, last_run, last_status, last_error
         FROM report_schedules
         ORDER BY next_run ASC
         """
         schedules = await conn.fetch(query)
         return [dict(schedule) for schedule in schedules]
     except Exception as e:
-        logger.error(f"Помилка при отриманні запланованих звітів: {str(e)}")
+        logger.error("Помилка при отриманні запланованих звітів: %s", e)
         raise HTTPException(status_code=500, detail="Помилка при отриманні запланованих звітів")
@@ -1,30 +1,131 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
 import httpx
 import aiohttp
 import asyncpg
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Header
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel
 from typing import Optional, List
 from api.routes import auth, data, analytics
 from api.config import settings
+from api.services.alert_stream import alert_broadcaster, stream_alerts
+from api.services.analytics_pool import analytics_pool
+from api.services.compression import CompressionMiddleware, compression, compression_stats
+from api.services.job_queue import authorize_client_job, enqueue_job, get_job
+from api.services.json_codecs import ORJSONRecordResponse, init_connection
+from api.services.logging_pipeline import setup_logging, logging_stats
+from api.services.periodic_tasks import periodic_runner
+from api.services.query_accounting import query_accounting
+from api.services.tracing import TracingMiddleware, inject_headers, tracer
+from api.services.profiling import (
+    ProfilingMiddleware,
+    TracedConnection,
+    collapsed_stacks,
+    profile_store,
+    span,
+)
 import logging
 
-# Налаштування логування
-logging.basicConfig(level=logging.INFO)
+# Налаштування логування (черга та окремий потік виводу)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # Налаштування авторизації
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-app = FastAPI(title="Predator Analytics 5.0 API Server")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global db_pool
+    db_pool = await asyncpg.create_pool(
+        host=settings.POSTGRES_HOST,
+        database=settings.POSTGRES_DB,
+        user=settings.POSTGRES_USER,
+        password=settings.POSTGRES_PASSWORD,
+        port=settings.POSTGRES_PORT,
+        connection_class=TracedConnection,
+        # Кодеки jsonb/json на orjson для кожного нового з'єднання пулу
+        init=init_connection,
+    )
+    # Одне LISTEN-з'єднання на процес для стрічки сповіщень
+    await alert_broadcaster.start()
+    # Очищення, метрики безпеки та профілі виконує лише лідер кластера,
+    # буфери оцінок ризику та придушених сповіщень — кожен екземпляр, навіть
+    # з PERIODIC_TASKS_ENABLED=false
+    await periodic_runner.start(essential_only=not settings.PERIODIC_TASKS_ENABLED)
+    try:
+        yield
+    finally:
+        from api.services.risk_engine import risk_engine
+        from api.services.auth_service import flush_alert_suppressor
+
+        await periodic_runner.stop()
+        # Дописуємо буферизовані оцінки ризику та придушені повтори сповіщень
+        await risk_engine.flush()
+        await flush_alert_suppressor()
+        await alert_broadcaster.stop()
+        await db_pool.close()
+        analytics_pool.shutdown()
+        await asyncio.to_thread(tracer.flush)
+
+
+app = FastAPI(
+    title="Predator Analytics 5.0 API Server",
+    default_response_class=ORJSONRecordResponse,
+    lifespan=lifespan,
+)
+
+
+async def is_admin_token(token: str) -> bool:
+    from api.services.auth_service import verify_token
+
+    user = await verify_token(token)
+    return "admin" in user["roles"]
+
+
+async def require_admin(token: str = Depends(oauth2_scheme)):
+    if not await is_admin_token(token):
+        raise HTTPException(status_code=403, detail="Недостатньо прав для виконання операції")
+
+
+async def current_user(token: str = Depends(oauth2_scheme)) -> dict:
+    from api.services.auth_service import verify_token
+
+    return await verify_token(token)
+
+
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware, store=profile_store, authorize=is_admin_token)
+app.add_middleware(CompressionMiddleware, stats=compression_stats)
+# Додається останнім, тому є зовнішнім: серверний відрізок охоплює профілювання
+# та стиснення
+app.add_middleware(TracingMiddleware, tracer=tracer)
 
 
 # Моделі даних
 class QueryRequest(BaseModel):
     query: str
     data_source: str = "auto"  # auto, postgres, opensearch, ollama, h2o
+    # SQL-запит виконується воркером черги; відповідь містить id завдання
+    background: bool = False
+
+
+class JobRequest(BaseModel):
+    job_type: str  # sql_query, security_report, visualization
+    payload: dict = {}
+    max_attempts: Optional[int] = None
+
+
+class ProvisionedUser(BaseModel):
+    username: str
+    password: str
+    email: Optional[str] = None
+    roles: List[str] = []
+    two_factor: bool = False
 
 
 class Token(BaseModel):
@@ -50,33 +151,26 @@ def classify_query(query: str) -> str:
 db_pool: asyncpg.pool.Pool = None
 
 
-@app.on_event("startup")
-async def startup():
-    global db_pool
-    db_pool = await asyncpg.create_pool(
-        host=settings.POSTGRES_HOST,
-        database=settings.POSTGRES_DB,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        port=settings.POSTGRES_PORT,
-    )
-
-
-@app.on_event("shutdown")
-async def shutdown():
-    await db_pool.close()
-
-
 async def get_db_connection():
-    async with db_pool.acquire() as conn:
+    with span("db.acquire"):
+        conn = await db_pool.acquire()
+    try:
         yield conn
+    finally:
+        await db_pool.release(conn)
 
 
 # Обробка SQL-запитів
-async def handle_sql(query: str, conn: asyncpg.Connection = Depends(get_db_connection)):
+async def handle_sql(query: str):
     try:
-        result = await conn.fetch(query)
-        return [dict(record) for record in result]
+        with span("db.acquire"):
+            conn = await db_pool.acquire()
+        try:
+            result = await conn.fetch(query)
+        finally:
+            await db_pool.release(conn)
+        # Записи серіалізуються напряму, без dict() та jsonable_encoder
+        return ORJSONRecordResponse(result)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -92,8 +186,69 @@ async def read_root():
     return {"message": "Welcome to Predator Analytics 5.0"}
 
 
-@app.post("/query/", dependencies=[Depends(oauth2_scheme)])
-async def process_query(request: QueryRequest):
+@app.get("/alerts/stream", dependencies=[Depends(require_admin)])
+async def alerts_stream(last_event_id: Optional[str] = Header(None)):
+    """Стрічка сповіщень безпеки (SSE): знімок активних, далі зміни
+
+    Доступна лише адміністраторам, як і список активних сповіщень. При
+    перепідключенні з Last-Event-ID пропущені події відтворюються з буфера.
+    """
+    return StreamingResponse(
+        stream_alerts(alert_broadcaster, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/admin/users/bulk", dependencies=[Depends(require_admin)])
+async def bulk_provision_users(users: List[ProvisionedUser]):
+    """Пакетне створення користувачів; звіт містить дані 2FA створених"""
+    from api.services.user_provisioning import HTTP_BATCH_LIMIT, provision_users
+
+    if len(users) > HTTP_BATCH_LIMIT:
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                f"Пакет перевищує {HTTP_BATCH_LIMIT} користувачів, "
+                "використайте scripts/provision_users.py"
+            ),
+        )
+    # Хешування bcrypt — у спільному пулі процесів аналітики (spawn)
+    return await provision_users(
+        [user.model_dump() for user in users], analytics_pool.executor()
+    )
+
+
+async def submit_job(job_type: str, payload: dict, user: dict, max_attempts: int = None):
+    # Лише дозволені ролі типи завдань; автор береться з токена, а не з payload
+    payload = authorize_client_job(job_type, payload, user)
+    async with db_pool.acquire() as conn:
+        job_id = await enqueue_job(conn, job_type, payload, user["username"], max_attempts)
+    return JSONResponse(
+        {"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"},
+        status_code=202,
+    )
+
+
+@app.post("/jobs")
+async def create_job(request: JobRequest, user: dict = Depends(current_user)):
+    """Постановка довгого аналітичного завдання в чергу (202 та id завдання)"""
+    return await submit_job(request.job_type, request.payload, user, request.max_attempts)
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: int, user: dict = Depends(current_user)):
+    """Стан завдання; результат доступний до закінчення TTL"""
+    async with db_pool.acquire() as conn:
+        job = await get_job(conn, job_id)
+    # Чужі завдання бачить лише адміністратор
+    if job is None or (job["created_by"] != user["username"] and "admin" not in user["roles"]):
+        raise HTTPException(status_code=404, detail="Завдання не знайдено")
+    return ORJSONRecordResponse(job)
+
+
+@app.post("/query/")
+async def process_query(request: QueryRequest, token: str = Depends(oauth2_scheme)):
     query = request.query
     data_source = request.data_source.lower()
 
@@ -103,41 +258,87 @@ async def process_query(request: QueryRequest):
             if data_source == "unknown":
                 raise HTTPException(status_code=400, detail="Неможливо визначити тип запиту")
 
+        if data_source == "postgres" and request.background:
+            user = await current_user(token)
+            return await submit_job("sql_query", {"query": query}, user)
         if data_source == "postgres":
             return await handle_sql(query)
         elif data_source == "opensearch":
             async with httpx.AsyncClient() as client:
                 payload = {"query": {"match": {"_all": query}}}
-                response = await client.post(
-                    f"{settings.OPENSEARCH_HOSTS[0]['host']}:9200/customs_data/_search",
-                    json=payload,
-                )
+                with span("backend.opensearch"):
+                    response = await client.post(
+                        f"{settings.OPENSEARCH_HOSTS[0]['host']}:9200/customs_data/_search",
+                        json=payload,
+                        headers=inject_headers(),
+                    )
                 response.raise_for_status()
                 return response.json()
         elif data_source == "ollama":
             async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{settings.OLLAMA_HOST}:11434/api/generate", json={"prompt": query}
-                ) as resp:
-                    return await resp.json()
+                with span("backend.ollama"):
+                    async with session.post(
+                        f"{settings.OLLAMA_HOST}:11434/api/generate",
+                        json={"prompt": query},
+                        headers=inject_headers(),
+                    ) as resp:
+                        return await resp.json()
         elif data_source == "h2o":
             async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{settings.H2O_HOST}:54321/cluster",
-                    json={"data": query, "algorithm": "default"},
-                ) as resp:
-                    return await resp.json()
+                with span("backend.h2o"):
+                    async with session.post(
+                        f"{settings.H2O_HOST}:54321/cluster",
+                        json={"data": query, "algorithm": "default"},
+                        headers=inject_headers(),
+                    ) as resp:
+                        return await resp.json()
         else:
             raise HTTPException(status_code=400, detail="Невідоме джерело даних")
     except Exception as e:
-        logger.error(f"Помилка обробки запиту: {e}")
+        logger.error("Помилка обробки запиту: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/debug/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """Збережені профілі запитів, найновіші першими"""
+    return profile_store.summaries()
+
+
+@app.get("/debug/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_profile(profile_id: str):
+    """Профіль запиту з відрізками викликів бази та бекендів"""
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Профіль не знайдено")
+    return profile
+
+
+@app.get("/debug/profiles/{profile_id}/flame", dependencies=[Depends(require_admin)])
+@compression(gzip=9, zstd=19)
+async def download_flame(profile_id: str):
+    """Стеки профілю у форматі collapsed stacks для flamegraph.pl або speedscope"""
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Профіль не знайдено")
+    return PlainTextResponse(
+        collapsed_stacks(profile["stacks"]),
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.folded"'},
+    )
+
+
 @app.get("/metrics")
 async def metrics():
     return {
         "api_requests_total": 100,  # Реальний збір метрик потребує інтеграції з Prometheus
         "api_response_time_avg": 0.2,
         "errors_total": 0,
+        "logging": logging_stats(),
+        "compression": compression_stats.snapshot(),
+        "slow_queries_total": query_accounting.slow_queries,
+        # Облік звернень до бази по функціях with_connection
+        "db_functions": query_accounting.snapshot(),
+        # Запуски періодичних завдань цього екземпляра (включно з пропущеними)
+        "periodic_tasks": periodic_runner.snapshot(),
+        "analytics_pool": analytics_pool.snapshot(),
     }
@@ -14,5 +14,88 @@ class Settings:
     REDIS_HOST: str = os.getenv("REDIS_HOST", "redis")
     REDIS_PORT: int = int(os.getenv("REDIS_PORT", "6379"))
 
+    # Сховище лічильників безпеки: memory або redis
+    SECURITY_COUNTERS_BACKEND: str = os.getenv("SECURITY_COUNTERS_BACKEND", "memory")
+
+    # Точний COUNT(DISTINCT) у звітах замість HyperLogLog (для аудиту)
+    REPORT_EXACT_DISTINCT: bool = os.getenv("REPORT_EXACT_DISTINCT", "false").lower() == "true"
+
+    # Логування: рівень, формат (json або text), розмір черги та вибірка
+    # гучних логерів у форматі «logger=0.1,other=0.5» (лише нижче WARNING)
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    LOG_SAMPLING: str = os.getenv("LOG_SAMPLING", "")
+
+    # Профілювання запитів: зберігаються запити, довші за поріг, та запити
+    # адміністратора із заголовком X-Debug-Profile; стеки знімаються для них
+    # і для випадкової частки запитів
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILE_SLOW_MS: float = float(os.getenv("PROFILE_SLOW_MS", "1000"))
+    PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0.01"))
+    PROFILE_INTERVAL_MS: float = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+    PROFILE_STORE_SIZE: int = int(os.getenv("PROFILE_STORE_SIZE", "100"))
+
+    # Запити до бази, довші за поріг, пишуться в журнал (значення параметрів приховуються)
+    SLOW_QUERY_MS: float = float(os.getenv("SLOW_QUERY_MS", "500"))
+
+    # Трасування (W3C traceparent): частка кореневих трас, що записуються,
+    # та експортер відрізків: file (OTLP/JSON у TRACE_FILE), memory або none
+    TRACE_SAMPLE_RATE: float = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+    TRACE_EXPORTER: str = os.getenv("TRACE_EXPORTER", "none")
+    TRACE_FILE: str = os.getenv("TRACE_FILE", "traces.jsonl")
+    TRACE_SERVICE_NAME: str = os.getenv("TRACE_SERVICE_NAME", "predator-api")
+    TRACE_EXPORT_BATCH_SIZE: int = int(os.getenv("TRACE_EXPORT_BATCH_SIZE", "100"))
+
+    # Стиснення відповідей: менші за поріг (байт) повні відповіді не стискаються;
+    # рівні за замовчуванням, маршрут може задати власні через @compression
+    COMPRESSION_MIN_SIZE: int = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+    COMPRESSION_GZIP_LEVEL: int = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    COMPRESSION_ZSTD_LEVEL: int = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+
+    # Черга фонових завдань: паралельність воркера, інтервал опитування, оренда
+    # завдання, повтори з експоненційною затримкою та час зберігання результату
+    JOB_WORKER_CONCURRENCY: int = int(os.getenv("JOB_WORKER_CONCURRENCY", "4"))
+    JOB_POLL_INTERVAL_SECONDS: float = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "1"))
+    JOB_LEASE_SECONDS: float = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_RETRY_BASE_SECONDS: float = float(os.getenv("JOB_RETRY_BASE_SECONDS", "10"))
+    JOB_RETRY_MAX_SECONDS: float = float(os.getenv("JOB_RETRY_MAX_SECONDS", "600"))
+    JOB_RESULT_TTL_SECONDS: float = float(os.getenv("JOB_RESULT_TTL_SECONDS", "86400"))
+
+    # Планувальник звітів: інтервал перевірки розкладів, кількість розкладів за
+    # транзакцію та скільки пропущених запусків розкладу надолужувати після простою
+    REPORT_SCHEDULER_INTERVAL_SECONDS: float = float(
+        os.getenv("REPORT_SCHEDULER_INTERVAL_SECONDS", "30")
+    )
+    REPORT_SCHEDULER_BATCH_SIZE: int = int(os.getenv("REPORT_SCHEDULER_BATCH_SIZE", "50"))
+    REPORT_SCHEDULER_MAX_CATCHUP: int = int(os.getenv("REPORT_SCHEDULER_MAX_CATCHUP", "3"))
+
+    # Періодичні завдання API: розкид інтервалу (частка), скільки останніх
+    # запусків зберігати та інтервали (секунди) окремих завдань
+    PERIODIC_TASKS_ENABLED: bool = os.getenv("PERIODIC_TASKS_ENABLED", "true").lower() == "true"
+    PERIODIC_TASK_JITTER: float = float(os.getenv("PERIODIC_TASK_JITTER", "0.1"))
+    PERIODIC_TASK_HISTORY: int = int(os.getenv("PERIODIC_TASK_HISTORY", "20"))
+    CLEANUP_INTERVAL_SECONDS: float = float(os.getenv("CLEANUP_INTERVAL_SECONDS", "3600"))
+    SECURITY_METRICS_INTERVAL_SECONDS: float = float(
+        os.getenv("SECURITY_METRICS_INTERVAL_SECONDS", "300")
+    )
+    BEHAVIOR_PROFILES_INTERVAL_SECONDS: float = float(
+        os.getenv("BEHAVIOR_PROFILES_INTERVAL_SECONDS", "3600")
+    )
+    RISK_ASSESSMENT_FLUSH_INTERVAL_SECONDS: float = float(
+        os.getenv("RISK_ASSESSMENT_FLUSH_INTERVAL_SECONDS", "5")
+    )
+
+    # Пул процесів для важкої аналітики (графіки, тренди): кількість процесів,
+    # тайм-аут задачі та поріг (рядків), нижче якого задача виконується в потоці
+    ANALYTICS_POOL_WORKERS: int = int(
+        os.getenv("ANALYTICS_POOL_WORKERS", str(min(4, os.cpu_count() or 1)))
+    )
+    ANALYTICS_TASK_TIMEOUT_SECONDS: float = float(
+        os.getenv("ANALYTICS_TASK_TIMEOUT_SECONDS", "60")
+    )
+    ANALYTICS_INLINE_ROWS: int = int(os.getenv("ANALYTICS_INLINE_ROWS", "2000"))
+
 
 settings = Settings()
@@ -423,3 +423,177 @@ CREATE TABLE IF NOT EXISTS scheduled_report_results (
 
 CREATE INDEX IF NOT EXISTS idx_scheduled_report_results_schedule 
 ON scheduled_report_results(schedule_id);
+
+-- Додаємо таблицю незмінних щоденних знімків метрик безпеки
+CREATE TABLE IF NOT EXISTS security_daily_snapshots (
+    day DATE PRIMARY KEY,
+    metrics JSONB NOT NULL,
+    computed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Додаємо append-only таблицю подій входу з типізованими колонками
+CREATE TABLE IF NOT EXISTS auth_events (
+    id BIGSERIAL PRIMARY KEY,
+    occurred_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    user_id INTEGER,
+    username VARCHAR(255) NOT NULL,
+    success BOOLEAN NOT NULL,
+    ip_address INET,
+    country_code VARCHAR(2),
+    city VARCHAR(100),
+    latitude DECIMAL(9,6),
+    longitude DECIMAL(9,6),
+    risk_score SMALLINT,
+    source_activity_id INTEGER UNIQUE -- для ідемпотентного перенесення з user_activity
+);
+
+-- Події додаються в порядку часу, тому BRIN-індекс займає кілька сторінок
+CREATE INDEX IF NOT EXISTS idx_auth_events_occurred_brin
+ON auth_events USING BRIN (occurred_at);
+
+-- Покриваючий індекс для index-only сканів метрик періоду
+CREATE INDEX IF NOT EXISTS idx_auth_events_occurred_covering
+ON auth_events (occurred_at) INCLUDE (success, username, ip_address);
+
+CREATE INDEX IF NOT EXISTS idx_auth_events_username_time
+ON auth_events (username, occurred_at);
+
+-- Забороняємо зміну подій; видалення дозволене лише для очищення застарілих даних
+CREATE OR REPLACE FUNCTION prevent_auth_events_update()
+RETURNS TRIGGER AS $$
+BEGIN
+    RAISE EXCEPTION 'auth_events є append-only таблицею';
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS auth_events_append_only ON auth_events;
+CREATE TRIGGER auth_events_append_only
+    BEFORE UPDATE ON auth_events
+    FOR EACH ROW
+    EXECUTE FUNCTION prevent_auth_events_update();
+
+-- Додаємо скетчі HyperLogLog унікальних користувачів та IP до щоденних знімків
+ALTER TABLE security_daily_snapshots ADD COLUMN IF NOT EXISTS users_hll BYTEA;
+ALTER TABLE security_daily_snapshots ADD COLUMN IF NOT EXISTS ips_hll BYTEA;
+
+-- Додаємо компактні профілі локацій: один рядок на користувача та geohash (~5 км)
+CREATE TABLE IF NOT EXISTS user_location_profiles (
+    username VARCHAR(255) REFERENCES users(username) ON DELETE CASCADE,
+    location_key VARCHAR(12) NOT NULL,
+    country_code VARCHAR(2),
+    city VARCHAR(100),
+    latitude DECIMAL(9,6),
+    longitude DECIMAL(9,6),
+    last_ip_address INET,
+    first_seen TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    last_seen TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    hit_count INTEGER NOT NULL DEFAULT 1,
+    is_trusted BOOLEAN DEFAULT FALSE,
+    PRIMARY KEY (username, location_key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_user_location_profiles_last_seen
+ON user_location_profiles(username, last_seen DESC);
+
+-- Додаємо агреговані профілі активності: гістограма годин (24) та матриця день тижня x година (7x24)
+CREATE TABLE IF NOT EXISTS user_activity_profiles (
+    username VARCHAR(255) PRIMARY KEY REFERENCES users(username) ON DELETE CASCADE,
+    hour_counts INTEGER[] NOT NULL,
+    week_hour_counts INTEGER[] NOT NULL,
+    total_sessions INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    CHECK (array_length(hour_counts, 1) = 24),
+    CHECK (array_length(week_hour_counts, 1) = 168)
+);
+
+-- Момент, до якого сесії вже враховані в профілях (єдиний рядок)
+CREATE TABLE IF NOT EXISTS behavior_profile_state (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    processed_until TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_user_sessions_created_at ON user_sessions(created_at);
+
+-- Пакетне оновлення патернів потребує унікальності для ON CONFLICT
+CREATE UNIQUE INDEX IF NOT EXISTS idx_user_patterns_username_type_unique
+ON user_behavior_patterns(username, pattern_type);
+
+-- Додаємо ваги ознак рушія оцінки ризику
+CREATE TABLE IF NOT EXISTS risk_weights (
+    feature_name VARCHAR(50) PRIMARY KEY,
+    weight FLOAT NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO risk_weights (feature_name, weight) VALUES
+    ('unusual_time', 20),
+    ('suspicious_location', 40),
+    ('unfamiliar_location', 10),
+    ('recent_failures', 15)
+ON CONFLICT (feature_name) DO NOTHING;
+
+-- Додаємо дедуплікацію сповіщень: відбиток, лічильник повторів та час останнього повтору
+ALTER TABLE security_alerts ADD COLUMN IF NOT EXISTS fingerprint VARCHAR(64);
+ALTER TABLE security_alerts ADD COLUMN IF NOT EXISTS occurrence_count INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE security_alerts ADD COLUMN IF NOT EXISTS last_seen_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP;
+
+-- Не більше одного відкритого сповіщення на відбиток
+CREATE UNIQUE INDEX IF NOT EXISTS idx_security_alerts_open_fingerprint
+ON security_alerts(fingerprint) WHERE NOT is_resolved;
+
+-- Групи сповіщень: агрегат усіх епізодів одного відбитка, включно з вирішеними
+CREATE TABLE IF NOT EXISTS security_alert_groups (
+    fingerprint VARCHAR(64) PRIMARY KEY,
+    alert_type VARCHAR(50) NOT NULL,
+    severity INTEGER NOT NULL CHECK (severity BETWEEN 1 AND 5),
+    sample_details JSONB,
+    occurrence_count BIGINT NOT NULL DEFAULT 0,
+    alert_count INTEGER NOT NULL DEFAULT 0,
+    last_alert_id INTEGER,
+    first_seen_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    last_seen_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_security_alert_groups_last_seen ON security_alert_groups(last_seen_at);
+
+-- Додаємо індекси для пакетних запитів адмін-панелі (останні сесії та оцінки ризику користувача)
+CREATE INDEX IF NOT EXISTS idx_user_sessions_username_activity
+ON user_sessions(username, last_activity DESC);
+CREATE INDEX IF NOT EXISTS idx_risk_assessment_username_assessed
+ON risk_assessments(username, assessed_at DESC);
+
+-- Додаємо чергу фонових аналітичних завдань (воркери забирають їх через FOR UPDATE SKIP LOCKED)
+CREATE TABLE IF NOT EXISTS analytics_jobs (
+    id BIGSERIAL PRIMARY KEY,
+    job_type VARCHAR(50) NOT NULL,
+    payload JSONB NOT NULL DEFAULT '{}',
+    status VARCHAR(20) NOT NULL DEFAULT 'queued'
+        CHECK (status IN ('queued', 'running', 'succeeded', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    run_after TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_by VARCHAR(100),
+    locked_until TIMESTAMP WITH TIME ZONE,
+    result JSONB,
+    error TEXT,
+    created_by VARCHAR(255) REFERENCES users(username) ON DELETE SET NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP WITH TIME ZONE,
+    finished_at TIMESTAMP WITH TIME ZONE,
+    expires_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX IF NOT EXISTS idx_analytics_jobs_ready
+ON analytics_jobs(run_after, id) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_analytics_jobs_lease
+ON analytics_jobs(locked_until) WHERE status = 'running';
+CREATE INDEX IF NOT EXISTS idx_analytics_jobs_expires
+ON analytics_jobs(expires_at) WHERE expires_at IS NOT NULL;
+
+-- Додаємо слот розкладу та завдання черги до результатів запланованих звітів;
+-- унікальний слот не дає поставити один запуск розкладу двічі
+ALTER TABLE scheduled_report_results ADD COLUMN IF NOT EXISTS scheduled_for TIMESTAMP WITH TIME ZONE;
+ALTER TABLE scheduled_report_results ADD COLUMN IF NOT EXISTS job_id BIGINT;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_scheduled_report_results_slot
+ON scheduled_report_results(schedule_id, scheduled_for);
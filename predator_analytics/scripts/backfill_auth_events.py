@@ -0,0 +1,26 @@
+"""Перенесення історичних входів з user_activity до auth_events
+
+Запуск з каталогу predator_analytics:
+    python -m scripts.backfill_auth_events [--batch-size 10000]
+"""
+
+import argparse
+import asyncio
+
+from api.services.auth_service import backfill_auth_events, get_pool
+
+
+async def run(batch_size: int):
+    try:
+        total = await backfill_auth_events(batch_size)
+        print(f"Перенесено подій входу: {total}")
+    finally:
+        pool = await get_pool()
+        await pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+    asyncio.run(run(args.batch_size))
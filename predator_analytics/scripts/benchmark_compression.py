@@ -0,0 +1,50 @@
+"""Бенчмарк стиснення відповідей: процесорний час проти зекономлених байтів
+
+Стискає типову JSON-відповідь (рядки сповіщень) gzip та zstd на різних рівнях
+і виводить розмір, коефіцієнт, швидкість та мс процесора на зекономлений МБ.
+
+Запуск з каталогу predator_analytics:
+    python -m scripts.benchmark_compression [--rows 20000] [--repeat 5]
+"""
+
+import argparse
+import time
+
+from api.services.compression import _zstandard, compress_body
+from api.services.json_codecs import dumps
+from scripts.benchmark_json import make_rows
+
+LEVELS = {"gzip": (1, 6, 9), "zstd": (1, 3, 10, 19)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    body = dumps(make_rows(args.rows))
+    size_mb = len(body) / 1e6
+    print(f"Відповідь: {args.rows} рядків, {size_mb:.2f} МБ")
+    print(f"{'кодування':<10} {'рівень':>6} {'розмір, КБ':>11} {'коеф.':>7} {'МБ/с':>8} {'мс/МБ екон.':>12}")
+
+    for encoding, levels in LEVELS.items():
+        if encoding == "zstd" and _zstandard() is None:
+            print("zstandard не встановлено, zstd пропущено")
+            continue
+        for level in levels:
+            best = float("inf")
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                compressed = compress_body(encoding, level, body)
+                best = min(best, time.perf_counter() - started)
+            saved_mb = (len(body) - len(compressed)) / 1e6
+            print(
+                f"{encoding:<10} {level:>6} {len(compressed) / 1000:>11.1f} "
+                f"{len(compressed) / len(body):>7.3f} {size_mb / best:>8.1f} "
+                f"{best * 1000 / saved_mb:>12.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
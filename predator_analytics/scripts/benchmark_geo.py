@@ -0,0 +1,76 @@
+"""Бенчмарк обчислення відстаней для виявлення неможливих переміщень
+
+Порівнює попередній шлях (geopy.geodesic для кожної пари) з векторизованими
+гаверсинусом і формулою Вінсенті та пакетним пошуком по всіх входах.
+
+Запуск з каталогу predator_analytics:
+    python -m scripts.benchmark_geo [--pairs 100000] [--logins 1000000]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from api.services.geo_utils import haversine_km, vincenty_km, find_impossible_travel
+
+
+def timed(label: str, func, count: int):
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<32} {elapsed:8.3f} с  {elapsed / count * 1e6:8.2f} мкс/пара")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pairs", type=int, default=100_000)
+    parser.add_argument("--geodesic-sample", type=int, default=5_000)
+    parser.add_argument("--logins", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    lat1, lat2 = rng.uniform(-60, 70, (2, args.pairs))
+    lon1, lon2 = rng.uniform(-180, 180, (2, args.pairs))
+
+    haversine = timed("haversine (NumPy)", lambda: haversine_km(lat1, lon1, lat2, lon2), args.pairs)
+    vincenty = timed("vincenty (NumPy)", lambda: vincenty_km(lat1, lon1, lat2, lon2), args.pairs)
+
+    try:
+        from geopy.distance import geodesic
+
+        sample = args.geodesic_sample
+        geodesic_km = timed(
+            f"geopy.geodesic ({sample} пар)",
+            lambda: np.array(
+                [
+                    geodesic((lat1[i], lon1[i]), (lat2[i], lon2[i])).kilometers
+                    for i in range(sample)
+                ]
+            ),
+            sample,
+        )
+        print(
+            f"макс. відхилення від geodesic: haversine "
+            f"{np.abs(haversine[:sample] - geodesic_km).max():.2f} км, vincenty "
+            f"{np.abs(vincenty[:sample] - geodesic_km).max():.4f} км"
+        )
+    except ImportError:
+        print("geopy не встановлено, порівняння з geodesic пропущено")
+
+    usernames = rng.integers(0, args.users, args.logins).astype(str)
+    timestamps = np.sort(rng.uniform(0, 86400, args.logins))
+    latitudes = rng.uniform(44, 52, args.logins)
+    longitudes = rng.uniform(22, 40, args.logins)
+    pairs = timed(
+        f"пакетний пошук ({args.logins} входів)",
+        lambda: find_impossible_travel(usernames, timestamps, latitudes, longitudes, 500, 3600),
+        args.logins,
+    )
+    print(f"знайдено підозрілих пар: {len(pairs['current'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Бенчмарк серіалізації JSON для великих відповідей API
+
+Порівнює шлях FastAPI за замовчуванням (jsonable_encoder + json.dumps) з
+orjson-відповіддю та розбір JSONB стандартним json і кодеком orjson.
+
+Запуск з каталогу predator_analytics:
+    python -m scripts.benchmark_json [--rows 50000] [--repeat 5]
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+
+from api.services.json_codecs import _decode_jsonb, _encode_jsonb, dumps
+
+
+def make_rows(count: int) -> list:
+    """Рядки, схожі на security_alerts: дата, Decimal та вкладені деталі JSONB"""
+    started = datetime(2024, 1, 1)
+    return [
+        {
+            "id": index,
+            "alert_type": "suspicious_location",
+            "severity": index % 5,
+            "risk_score": Decimal(f"{index % 100}.25"),
+            "created_at": started + timedelta(seconds=index),
+            "details": {
+                "username": f"user{index % 1000}",
+                "ip_address": f"10.0.{index % 256}.{index % 200}",
+                "location": {"country": "UA", "city": "Київ", "lat": 50.45, "lon": 30.52},
+                "factors": ["unusual_time", "recent_failures"],
+            },
+        }
+        for index in range(count)
+    ]
+
+
+def timed(label: str, func, repeat: int, size: int):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    print(f"{label:<40} {best * 1000:9.1f} мс  {best / size * 1e6:7.2f} мкс/рядок")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    print(f"Відповідь ({args.rows} рядків):")
+    timed(
+        "jsonable_encoder + json.dumps",
+        lambda: json.dumps(jsonable_encoder(rows), ensure_ascii=False).encode(),
+        args.repeat,
+        args.rows,
+    )
+    timed(
+        "json.dumps(default=str)",
+        lambda: json.dumps(rows, default=str).encode(),
+        args.repeat,
+        args.rows,
+    )
+    timed("orjson (ORJSONRecordResponse)", lambda: dumps(rows), args.repeat, args.rows)
+
+    details = [row["details"] for row in rows]
+    texts = [json.dumps(item) for item in details]
+    encoded = [_encode_jsonb(item) for item in details]
+    print(f"Кодек JSONB ({args.rows} значень):")
+    cases = [
+        ("json.loads (текстовий формат)", lambda: [json.loads(text) for text in texts]),
+        ("orjson (бінарний формат)", lambda: [_decode_jsonb(data) for data in encoded]),
+        ("json.dumps", lambda: [json.dumps(item) for item in details]),
+        ("orjson", lambda: [_encode_jsonb(item) for item in details]),
+    ]
+    for label, func in cases:
+        timed(label, func, args.repeat, args.rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Бенчмарк холодного старту: час імпорту модулів API в окремому процесі
+
+Для кожного модуля виконує кілька запусків `python -X importtime` і виводить
+медіану та найдорожчі імпорти з останнього запуску.
+
+Запуск з каталогу predator_analytics:
+    python -m scripts.benchmark_startup [--runs 10] [--top 15] [module ...]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+DEFAULT_MODULES = ["api.services.auth_service", "api_server.app"]
+
+
+def import_profile(module: str) -> list:
+    """Рядки importtime: (власний час, кумулятивний час, модуль) у мікросекундах"""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(path or "." for path in sys.path)}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    entries = []
+    for line in result.stderr.splitlines():
+        parts = [part.strip() for part in line.removeprefix("import time:").split("|")]
+        if len(parts) == 3 and parts[0].isdigit():
+            entries.append((int(parts[0]), int(parts[1]), parts[2]))
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    for module in args.modules:
+        totals, entries = [], []
+        for _ in range(args.runs):
+            entries = import_profile(module)
+            totals.append(next(cumulative for _, cumulative, name in entries if name == module))
+        print(f"{module}: медіана {statistics.median(totals) / 1000:.1f} мс ({args.runs} запусків)")
+        for own, cumulative, name in sorted(entries, key=lambda entry: -entry[1])[: args.top]:
+            print(f"  {cumulative / 1000:9.1f} мс  {own / 1000:8.1f} мс  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Бенчмарк векторизованого аналізу тенденцій (10k рядів x 365 днів)
+
+Запуск з каталогу predator_analytics:
+    python -m scripts.benchmark_trend_engine [--series 10000] [--days 365]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from api.services.trend_engine import analyze_series
+
+
+def per_series_pandas(values: np.ndarray) -> list:
+    """Попередній підхід: окремий DataFrame та статистика для кожного ряду"""
+    results = []
+    for row in values:
+        df = pd.DataFrame({"value": row})
+        results.append(
+            {
+                "increasing": df["value"].is_monotonic_increasing,
+                "mean": float(df["value"].mean()),
+                "std": float(df["value"].std()),
+                "rolling": df["value"].rolling(7, min_periods=1).mean().iloc[-1],
+            }
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--series", type=int, default=10_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--pandas-sample", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    days = np.arange(args.days)
+    values = (
+        100
+        + rng.normal(0, 0.05, (args.series, 1)) * days
+        + 10 * np.sin(2 * np.pi * days / 7)
+        + rng.normal(0, 3, (args.series, args.days))
+    )
+
+    started = time.perf_counter()
+    result = analyze_series(values)
+    vectorized = time.perf_counter() - started
+    print(
+        f"trend_engine: {args.series} x {args.days} за {vectorized:.3f} с "
+        f"({vectorized / args.series * 1e6:.1f} мкс/ряд), "
+        f"значущих трендів: {int(result['significant'].sum())}, "
+        f"точок зміни: {int(result['change_points'].sum())}"
+    )
+
+    sample = values[: args.pandas_sample]
+    started = time.perf_counter()
+    per_series_pandas(sample)
+    legacy = (time.perf_counter() - started) / len(sample) * args.series
+    print(
+        f"pandas по рядах (екстраполяція з {len(sample)}): {legacy:.3f} с, "
+        f"прискорення x{legacy / vectorized:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""Міграція історії user_locations у компактні профілі локацій
+
+Запуск з каталогу predator_analytics:
+    python -m scripts.compact_user_locations [--truncate]
+"""
+
+import argparse
+import asyncio
+
+from api.services.auth_service import compact_user_locations, get_pool
+
+
+async def run(truncate: bool):
+    pool = await get_pool()
+    try:
+        merged = await compact_user_locations()
+        print(f"Створено профілів локацій: {merged}")
+        if truncate:
+            async with pool.acquire() as conn:
+                await conn.execute("TRUNCATE TABLE user_locations")
+            print("Таблицю user_locations очищено")
+    finally:
+        await pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--truncate",
+        action="store_true",
+        help="очистити user_locations після перенесення",
+    )
+    args = parser.parse_args()
+    asyncio.run(run(args.truncate))
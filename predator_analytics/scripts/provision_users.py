@@ -0,0 +1,66 @@
+"""Пакетне створення користувачів з CSV
+
+Колонки: username,email,password,roles,two_factor (ролі через «;», two_factor: true/false).
+Звіт (створені, конфлікти, дані 2FA) записується у JSON з правами 0600:
+він містить секрети TOTP та резервні коди.
+
+Запуск з каталогу predator_analytics:
+    python -m scripts.provision_users users.csv --report report.json [--batch-size 5000]
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+
+from api.services.auth_service import get_pool
+from api.services.user_provisioning import hash_executor, provision_users
+
+
+def read_users(path: str):
+    with open(path, newline="", encoding="utf-8") as source:
+        for row in csv.DictReader(source):
+            yield {
+                "username": row.get("username"),
+                "email": row.get("email") or None,
+                "password": row.get("password"),
+                "roles": [role.strip() for role in (row.get("roles") or "").split(";") if role.strip()],
+                "two_factor": (row.get("two_factor") or "").strip().lower() in ("1", "true", "yes"),
+            }
+
+
+async def run(path: str, report_path: str, batch_size: int):
+    users = list(read_users(path))
+    summary = {"created": [], "conflicts": [], "roles_assigned": 0, "two_factor": {}}
+    try:
+        with hash_executor() as executor:
+            for start in range(0, len(users), batch_size):
+                report = await provision_users(users[start : start + batch_size], executor)
+                summary["created"] += report["created"]
+                summary["conflicts"] += report["conflicts"]
+                summary["roles_assigned"] += report["roles_assigned"]
+                summary["two_factor"].update(report["two_factor"])
+                print(
+                    f"Пакет {start // batch_size + 1}: створено {len(report['created'])}, "
+                    f"конфліктів {len(report['conflicts'])}"
+                )
+    finally:
+        pool = await get_pool()
+        await pool.close()
+
+    # Файл створюється одразу з правами 0600; наявний файл отримує їх до запису
+    fd = os.open(report_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    os.fchmod(fd, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as target:
+        json.dump(summary, target, ensure_ascii=False, indent=2, default=str)
+    print(f"Створено користувачів: {len(summary['created'])}, звіт: {report_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("csv_path")
+    parser.add_argument("--report", default="provisioning_report.json")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(run(args.csv_path, args.report, args.batch_size))
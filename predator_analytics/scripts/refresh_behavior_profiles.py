@@ -0,0 +1,28 @@
+"""Пакетне оновлення профілів активності користувачів
+
+Запуск з каталогу predator_analytics (напр. з cron щогодини):
+    python -m scripts.refresh_behavior_profiles [--window-days 30]
+"""
+
+import argparse
+import asyncio
+
+from api.services.auth_service import get_pool
+from api.services.behavior_profiles import refresh_behavior_profiles, PROFILE_WINDOW_DAYS
+
+
+async def run(window_days: int, batch_size: int):
+    try:
+        updated = await refresh_behavior_profiles(window_days, batch_size)
+        print(f"Оновлено профілів активності: {updated}")
+    finally:
+        pool = await get_pool()
+        await pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--window-days", type=int, default=PROFILE_WINDOW_DAYS)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(run(args.window_days, args.batch_size))
@@ -0,0 +1,29 @@
+"""Пакетна переоцінка ризику для всіх активних користувачів
+
+Запуск з каталогу predator_analytics:
+    python -m scripts.rescore_risk [--hours 24]
+"""
+
+import argparse
+import asyncio
+
+from api.services.auth_service import get_pool
+from api.services.risk_engine import risk_engine
+
+
+async def run(hours: int):
+    pool = await get_pool()
+    try:
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                total = await risk_engine.rescore_active_users(conn, hours)
+        print(f"Переоцінено ризик для користувачів: {total}")
+    finally:
+        await pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hours", type=int, default=24)
+    args = parser.parse_args()
+    asyncio.run(run(args.hours))
@@ -0,0 +1,54 @@
+"""Воркери черги аналітичних завдань (analytics_jobs)
+
+Кожен процес виконує до --concurrency завдань одночасно; процеси та вузли
+розподіляють завдання між собою через FOR UPDATE SKIP LOCKED.
+
+Запуск з каталогу predator_analytics:
+    python -m scripts.run_job_worker [--processes 2] [--concurrency 4]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import signal
+
+from api.services.auth_service import get_pool
+from api.services.job_queue import JobWorker
+
+
+async def run(concurrency: int):
+    worker = JobWorker(concurrency=concurrency)
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, worker.stop)
+    pool = await get_pool()
+    try:
+        await worker.run()
+        print(f"Оброблено завдань: {worker.processed}")
+    finally:
+        await pool.close()
+
+
+def run_process(concurrency: int):
+    asyncio.run(run(concurrency))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.processes == 1:
+        run_process(args.concurrency)
+    else:
+        processes = [
+            multiprocessing.Process(target=run_process, args=(args.concurrency,))
+            for _ in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        # SIGTERM процесу-батька передається воркерам для плавної зупинки
+        signal.signal(signal.SIGTERM, lambda *_: [process.terminate() for process in processes])
+        for process in processes:
+            process.join()
@@ -0,0 +1,46 @@
+"""Планувальник звітів report_schedules разом з воркером черги завдань
+
+Планувальник ставить запуски, що настали (включно з пропущеними під час
+простою), у чергу analytics_jobs; воркер виконує до --concurrency звітів
+одночасно. Екземплярів можна запускати кілька: розклади та завдання
+розподіляються через FOR UPDATE SKIP LOCKED, тож жоден слот не виконується двічі.
+
+Запуск з каталогу predator_analytics:
+    python -m scripts.run_report_scheduler [--concurrency 4] [--no-worker]
+"""
+
+import argparse
+import asyncio
+import signal
+
+from api.services.auth_service import get_pool
+from api.services.job_queue import JobWorker
+from api.services.report_scheduler import ReportScheduler
+
+
+async def run(concurrency: int, with_worker: bool):
+    scheduler = ReportScheduler()
+    services = [scheduler]
+    if with_worker:
+        services.append(JobWorker(concurrency=concurrency))
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, lambda: [service.stop() for service in services])
+    pool = await get_pool()
+    try:
+        await asyncio.gather(*(service.run() for service in services))
+        print(f"Поставлено в чергу запланованих звітів: {scheduler.enqueued}")
+    finally:
+        await pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument(
+        "--no-worker",
+        action="store_true",
+        help="лише планувальник; звіти виконують окремі scripts.run_job_worker",
+    )
+    args = parser.parse_args()
+    asyncio.run(run(args.concurrency, not args.no_worker))
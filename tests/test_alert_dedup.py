@@ -0,0 +1,208 @@
+import asyncio
+
+import pytest
+from api.services.alert_dedup import AlertSuppressor, alert_fingerprint
+
+
+def test_fingerprint_ignores_volatile_details():
+    first = alert_fingerprint(
+        "metric_threshold_exceeded",
+        {"metric": "failed_login_rate", "value": 0.4, "level": "warning"},
+    )
+    second = alert_fingerprint(
+        "metric_threshold_exceeded",
+        {"metric": "failed_login_rate", "value": 0.7, "level": "warning"},
+    )
+    critical = alert_fingerprint(
+        "metric_threshold_exceeded",
+        {"metric": "failed_login_rate", "value": 0.9, "level": "critical"},
+    )
+    assert first == second
+    assert first != critical
+
+
+def test_fingerprint_uses_prefix_fields_for_attack_alerts():
+    details = {"pattern": "brute_force", "confidence": 0.8, "attack_data": {"username": "alice"}}
+    other_confidence = {**details, "confidence": 0.95}
+    other_user = {**details, "attack_data": {"username": "bob"}}
+
+    fingerprint = alert_fingerprint("attack_pattern_detected_brute_force", details)
+    assert fingerprint == alert_fingerprint("attack_pattern_detected_brute_force", other_confidence)
+    assert fingerprint != alert_fingerprint("attack_pattern_detected_brute_force", other_user)
+
+
+def test_suppressor_counts_repeats_in_memory():
+    suppressor = AlertSuppressor(window_seconds=60, flush_interval=10)
+    assert suppressor.suppress("fp", now=0) is None
+    suppressor.remember("fp", 42, now=0)
+
+    for second in range(1, 1001):
+        assert suppressor.suppress("fp", now=second / 100) == 42
+
+    assert suppressor.take_pending(now=10) == [(42, "fp", 1000)]
+    assert suppressor.take_pending(now=20) == []
+
+    # Після закінчення вікна повтор знову записується в базу
+    assert suppressor.suppress("fp", now=61) is None
+
+
+def test_suppressor_forgets_resolved_alert():
+    suppressor = AlertSuppressor(window_seconds=60)
+    suppressor.remember("fp", 7, now=0)
+    suppressor.forget_alert(7)
+    assert suppressor.suppress("fp", now=1) is None
+    assert len(suppressor) == 0
+
+
+def test_restored_counts_survive_closed_window():
+    suppressor = AlertSuppressor(window_seconds=60, max_size=2)
+    suppressor.remember("fp", 42, now=0)
+    suppressor.suppress("fp", now=1)
+    suppressor.suppress("fp", now=2)
+
+    # Запис не вдався вже після закриття вікна
+    pending = suppressor.take_pending(now=61)
+    assert len(suppressor) == 0
+    suppressor.restore_pending(pending)
+    suppressor.restore_pending([(42, "fp", 3), (7, "a", 1), (8, "b", 1)])
+
+    # Найстаріший запис понад max_size відкинуто
+    assert suppressor.take_pending(now=62) == [(7, "a", 1), (8, "b", 1)]
+
+    suppressor.restore_pending([(42, "fp", 2), (42, "fp", 3)])
+    assert suppressor.take_pending(now=63) == [(42, "fp", 5)]
+    assert suppressor.take_pending(now=64) == []
+
+
+def test_resolved_event_closes_window_in_every_process(monkeypatch):
+    from api.services import alert_stream
+    from api.services.alert_stream import AlertBroadcaster, alert_event
+
+    suppressor = AlertSuppressor(window_seconds=60)
+    monkeypatch.setattr(alert_stream, "alert_suppressor", suppressor)
+    suppressor.remember("fp", 7)
+
+    AlertBroadcaster().publish(alert_event("resolved", {"id": 7, "resolved_by": "admin"}))
+
+    assert suppressor.suppress("fp") is None
+
+
+class Transaction:
+    async def start(self):
+        pass
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+class Connection:
+    def transaction(self):
+        return Transaction()
+
+    async def execute(self, query, *args):
+        pass
+
+
+class Pool:
+    async def acquire(self):
+        return Connection()
+
+    async def release(self, conn):
+        pass
+
+
+async def get_pool():
+    return Pool()
+
+
+def test_failed_flush_keeps_pending_counts(monkeypatch):
+    from api.services import auth_service
+
+    writes = []
+
+    async def flush(conn, pending):
+        writes.append(pending)
+        if len(writes) == 1:
+            raise RuntimeError("база недоступна")
+
+    suppressor = AlertSuppressor(window_seconds=60)
+    monkeypatch.setattr(auth_service, "get_pool", get_pool)
+    monkeypatch.setattr(auth_service, "flush_alert_occurrences", flush)
+    monkeypatch.setattr(auth_service, "alert_suppressor", suppressor)
+    suppressor.remember("fp", 42)
+    suppressor.suppress("fp")
+
+    asyncio.run(auth_service.flush_alert_suppressor())
+    suppressor.suppress("fp")
+    asyncio.run(auth_service.flush_alert_suppressor())
+
+    assert writes == [[(42, "fp", 1)], [(42, "fp", 1), (42, "fp", 1)]]
+    assert suppressor.take_pending() == []
+
+
+def test_resolve_alert_keeps_window_on_rollback(monkeypatch):
+    from fastapi import HTTPException
+    from api.services import auth_service
+
+    async def flush(conn, pending):
+        pass
+
+    suppressor = AlertSuppressor(window_seconds=60)
+    monkeypatch.setattr(auth_service, "get_pool", get_pool)
+    monkeypatch.setattr(auth_service, "flush_alert_occurrences", flush)
+    monkeypatch.setattr(auth_service, "alert_suppressor", suppressor)
+    suppressor.remember("fp", 42)
+    suppressor.suppress("fp")
+
+    async def notify(conn, events):
+        raise RuntimeError("відкат")
+
+    monkeypatch.setattr(auth_service, "notify_alert_events", notify)
+    with pytest.raises(HTTPException):
+        asyncio.run(auth_service.resolve_alert(42, "admin"))
+    # Транзакцію відкочено: вікно відкрите, лічильник не втрачено
+    assert suppressor.alert_id("fp") == 42
+    assert suppressor.take_pending() == [(42, "fp", 1)]
+
+    async def delivered(conn, events):
+        pass
+
+    monkeypatch.setattr(auth_service, "notify_alert_events", delivered)
+    asyncio.run(auth_service.resolve_alert(42, "admin"))
+    assert suppressor.alert_id("fp") is None
+
+
+def test_suppression_window_opens_only_after_commit(monkeypatch):
+    from api.services import auth_service
+
+    async def upsert(conn, alerts):
+        return [{"fingerprint": alert[3], "id": 42, "inserted": True} for alert in alerts]
+
+    async def notify(conn, events):
+        pass
+
+    suppressor = AlertSuppressor(window_seconds=60)
+    monkeypatch.setattr(auth_service, "get_pool", get_pool)
+    monkeypatch.setattr(auth_service, "upsert_security_alerts", upsert)
+    monkeypatch.setattr(auth_service, "notify_alert_events", notify)
+    monkeypatch.setattr(auth_service, "alert_suppressor", suppressor)
+    alert = ("brute_force", "high", {"username": "alice"})
+
+    @auth_service.with_connection
+    async def failing(conn):
+        assert await auth_service.record_security_alerts(conn, [alert]) == [42]
+        raise RuntimeError("відкат")
+
+    @auth_service.with_connection
+    async def committed(conn):
+        return await auth_service.record_security_alerts(conn, [alert])
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(failing())
+    assert len(suppressor) == 0
+
+    assert asyncio.run(committed()) == [42]
+    assert suppressor.alert_id(alert_fingerprint(*alert[::2])) == 42
@@ -0,0 +1,63 @@
+import pytest
+from api.services.alert_stream import AlertBroadcaster, alert_event, stream_alerts
+
+
+def _broadcaster():
+    broadcaster = AlertBroadcaster()
+    broadcaster.load_snapshot(
+        [{"id": 1, "alert_type": "brute_force", "severity": 4, "occurrence_count": 1}]
+    )
+    return broadcaster
+
+
+def test_subscribe_without_event_id_gets_snapshot():
+    broadcaster = _broadcaster()
+    broadcaster.publish(alert_event("created", {"id": 2, "alert_type": "x", "severity": 5}))
+
+    subscriber, initial = broadcaster.subscribe()
+
+    assert [event for _, event, _ in initial] == ["snapshot"]
+    assert [alert["id"] for alert in initial[0][2]["alerts"]] == [2, 1]
+    assert subscriber.queue.empty()
+
+
+def test_deltas_update_snapshot_and_replay_after_reconnect():
+    broadcaster = _broadcaster()
+    subscriber, initial = broadcaster.subscribe()
+    seen_id = initial[0][0]
+
+    broadcaster.publish(alert_event("updated", {"id": 1, "occurrence_count": 40}))
+    broadcaster.publish(alert_event("resolved", {"id": 1, "resolved_by": "admin"}))
+
+    assert subscriber.queue.qsize() == 2
+    assert broadcaster.snapshot() == []
+
+    # Клієнт бачив лише знімок: після перепідключення отримує обидві дельти
+    _, replayed = broadcaster.subscribe(seen_id)
+    assert [event for _, event, _ in replayed] == ["updated", "resolved"]
+
+    # Ідентифікатор іншого процесу або застарілий веде до повного знімка
+    _, fallback = broadcaster.subscribe("deadbeef-1")
+    assert fallback[0][1] == "snapshot"
+
+
+def test_slow_subscriber_is_marked_lagged():
+    broadcaster = _broadcaster()
+    subscriber, _ = broadcaster.subscribe()
+    for count in range(subscriber.queue.maxsize + 1):
+        broadcaster.publish(alert_event("updated", {"id": 1, "occurrence_count": count}))
+    assert subscriber.lagged
+
+
+@pytest.mark.asyncio
+async def test_stream_alerts_formats_sse():
+    broadcaster = _broadcaster()
+    stream = stream_alerts(broadcaster)
+    first = await stream.__anext__()
+    assert first.startswith("id: ") and "event: snapshot" in first
+
+    broadcaster.publish(alert_event("resolved", {"id": 1}))
+    second = await stream.__anext__()
+    assert "event: resolved" in second and second.endswith("\n\n")
+    await stream.aclose()
+    assert len(broadcaster) == 0
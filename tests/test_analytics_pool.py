@@ -0,0 +1,88 @@
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime, timezone
+
+import pytest
+from api.services.analytics_pool import (
+    AnalyticsPool,
+    SharedTable,
+    open_frame,
+    records_to_columns,
+    release_shared,
+    share_columns,
+)
+from api.services.visualization_service import render_chart
+
+
+def _columns(rows):
+    return {
+        "day": [datetime(2024, 1, 1 + i % 28, tzinfo=timezone.utc) for i in range(rows)],
+        "logins": list(range(rows)),
+        "country": ["UA" if i % 2 else None for i in range(rows)],
+    }
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def test_records_to_columns():
+    records = [{"a": 1, "b": "x"}, {"a": 2, "b": "y"}]
+    assert records_to_columns(records) == {"a": [1, 2], "b": ["x", "y"]}
+    assert records_to_columns([]) == {}
+
+
+def test_shared_table_round_trip():
+    pytest.importorskip("pyarrow")
+    columns = _columns(100)
+    shm = share_columns(columns)
+    try:
+        with open_frame(SharedTable(shm.name, shm.size)) as df:
+            assert list(df.columns) == ["day", "logins", "country"]
+            assert df["logins"].tolist() == columns["logins"]
+            assert df["country"].isna().sum() == 50
+            del df
+    finally:
+        release_shared(shm)
+
+    # Стовпці без Arrow-типу передаються через pickle
+    assert share_columns({"details": [{"a": 1}, "text"]}) is None
+
+
+def test_small_input_runs_in_thread():
+    pool = AnalyticsPool(workers=1, inline_rows=1000)
+    main_thread = threading.get_ident()
+
+    result = asyncio.run(pool.run(threading.get_ident, size=10))
+    assert result != main_thread
+    assert pool.stats["inline"] == 1 and pool._executor is None
+
+    chart = asyncio.run(
+        pool.run_table(render_chart, _columns(20), "bar", {"x": "day", "y": "logins"})
+    )
+    assert len(chart["data"]) == 20 and json.loads(chart["plot_data"])["data"][0]["type"] == "bar"
+
+
+def test_large_input_uses_process_pool_and_timeout_restarts_it():
+    pytest.importorskip("pyarrow")
+    pool = AnalyticsPool(workers=1, timeout=60, inline_rows=100)
+
+    async def scenario():
+        config = {"x": "day", "y": "logins"}
+        chart = await pool.run_table(render_chart, _columns(500), "line", config)
+        assert len(chart["data"]) == 500
+
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.run(_sleep, 30, size=1000, timeout=0.5)
+        # Після перезапуску пул знову приймає задачі
+        assert await pool.run(_sleep, 0, size=1000) == 0
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    assert pool.stats["shared_memory"] == 1
+    assert pool.stats["timeouts"] == 1 and pool.stats["restarts"] == 1
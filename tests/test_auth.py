@@ -4,8 +4,9 @@ from api.services.auth_service import (
     validate_password,
     get_password_hash,
     verify_password,
-    calculate_next_run,
+    evaluate_metric_thresholds,
 )
+from api.services.visualization_service import calculate_next_run
 
 
 @pytest.mark.parametrize(
@@ -44,3 +45,20 @@ async def test_schedule_calculation():
     next_run = calculate_next_run(schedule)
     assert next_run.weekday() == 1
     assert next_run >= now
+
+
+def test_metric_threshold_evaluation():
+    thresholds = {"failed_login_rate": (0.1, 0.3), "suspicious_sessions_rate": (0.05, 0.15)}
+    metrics = [
+        {"metric_name": "failed_login_rate", "value": 0.35},
+        {"metric_name": "suspicious_sessions_rate", "value": 0.07},
+        {"metric_name": "unknown_metric", "value": 100.0},
+    ]
+
+    alerts = evaluate_metric_thresholds(metrics, thresholds)
+
+    assert len(alerts) == 2
+    assert alerts[0][1] == 5
+    assert alerts[0][2]["level"] == "critical"
+    assert alerts[1][1] == 3
+    assert alerts[1][2]["threshold"] == 0.05
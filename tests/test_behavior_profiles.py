@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from api.services.behavior_profiles import (
+    WEEK_HOURS,
+    hour_histogram,
+    typical_hours,
+    iter_user_deltas,
+    delta_ranges,
+)
+
+NOW = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+
+async def _rows(rows):
+    for row in rows:
+        yield row
+
+
+@pytest.mark.asyncio
+async def test_iter_user_deltas_groups_sorted_rows():
+    rows = [
+        {"username": "alice", "slot": 9, "delta": 3},
+        {"username": "alice", "slot": 24 + 9, "delta": 2},
+        {"username": "bob", "slot": 0, "delta": -1},
+    ]
+    deltas = {username: week async for username, week in iter_user_deltas(_rows(rows))}
+
+    assert set(deltas) == {"alice", "bob"}
+    assert deltas["alice"].shape == (WEEK_HOURS,)
+    assert deltas["alice"][9] == 3 and deltas["alice"][33] == 2
+    assert deltas["bob"].sum() == -1
+
+
+def test_hour_histogram_and_typical_hours():
+    week_hours = np.zeros(WEEK_HOURS, dtype=np.int64)
+    # Понеділок і вівторок о 9:00 разом перевищують поріг
+    week_hours[9] = 3
+    week_hours[24 + 9] = 3
+    week_hours[22] = 5
+
+    hours = hour_histogram(week_hours)
+    assert hours[9] == 6
+    assert typical_hours(hours) == [9]
+
+
+def test_delta_ranges_incremental_and_rebuild():
+    expired, added, full_rebuild = delta_ranges(NOW - timedelta(hours=1), NOW, 30)
+    assert not full_rebuild
+    assert added == (NOW - timedelta(hours=1), NOW)
+    assert expired == (NOW - timedelta(days=30, hours=1), NOW - timedelta(days=30))
+
+    # Перший запуск або запуск після довгої перерви перебудовує профілі
+    assert delta_ranges(None, NOW, 30)[2]
+    assert delta_ranges(NOW - timedelta(days=31), NOW, 30) == (
+        None,
+        (NOW - timedelta(days=30), NOW),
+        True,
+    )
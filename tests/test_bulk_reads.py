@@ -0,0 +1,72 @@
+import pytest
+from api.services.auth_service import (
+    get_user_roles_bulk,
+    get_2fa_status_bulk,
+    get_active_sessions_bulk,
+    get_user_overview,
+)
+
+
+class RecordingConnection:
+    """Підміна з'єднання, що рахує запити та повертає задані рядки"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    async def fetch(self, query, *args):
+        self.calls.append((query, args))
+        return self.rows
+
+
+@pytest.mark.asyncio
+async def test_roles_bulk_single_query_with_defaults():
+    conn = RecordingConnection([{"username": "alice", "roles": ["admin", "analyst"]}])
+
+    roles = await get_user_roles_bulk(conn, ["alice", "bob"])
+
+    assert roles == {"alice": ["admin", "analyst"], "bob": []}
+    assert len(conn.calls) == 1
+    assert "= ANY($1::varchar[])" in conn.calls[0][0]
+
+
+@pytest.mark.asyncio
+async def test_2fa_and_sessions_bulk_group_by_user():
+    conn = RecordingConnection(
+        [{"username": "alice", "is_enabled": True, "created_at": None, "updated_at": None}]
+    )
+    statuses = await get_2fa_status_bulk.__wrapped__(conn, ["alice", "bob"])
+    assert statuses["alice"]["is_configured"] is True
+    assert statuses["bob"] == {"is_enabled": False, "is_configured": False}
+
+    conn = RecordingConnection(
+        [
+            {"username": "alice", "session_id": "s1"},
+            {"username": "alice", "session_id": "s2"},
+        ]
+    )
+    sessions = await get_active_sessions_bulk.__wrapped__(conn, ["alice", "bob"])
+    assert [session["session_id"] for session in sessions["alice"]] == ["s1", "s2"]
+    assert sessions["bob"] == []
+
+
+@pytest.mark.asyncio
+async def test_user_overview_keyset_cursor():
+    row = {
+        "id": 1,
+        "username": "alice",
+        "email": "a@example.com",
+        "roles": ["admin"],
+        "active_sessions": "[]",
+        "risk_history": '[{"risk_score": 20}]',
+    }
+    conn = RecordingConnection([row, {**row, "id": 2, "username": "bob"}])
+
+    page = await get_user_overview.__wrapped__(conn, None, 2)
+
+    assert page["next_cursor"] == "bob"
+    assert page["users"][0]["risk_history"] == [{"risk_score": 20}]
+    assert conn.calls[0][1] == (None, 2, 10)
+
+    last_page = await get_user_overview.__wrapped__(conn, "alice", 5)
+    assert last_page["next_cursor"] is None
@@ -0,0 +1,115 @@
+import asyncio
+import gzip
+import zlib
+
+from api.services.compression import (
+    CompressionMiddleware,
+    CompressionStats,
+    choose_encoding,
+    compression,
+    parse_accept_encoding,
+)
+
+BODY = b'{"rows": [' + b",".join(b'{"id": %d, "type": "login"}' % i for i in range(500)) + b"]}"
+
+
+def test_parse_and_choose_encoding():
+    assert parse_accept_encoding("gzip;q=0.5, br, zstd;q=0") == {"gzip": 0.5, "br": 1.0, "zstd": 0.0}
+    assert choose_encoding("gzip, deflate, br, zstd") == "zstd"
+    assert choose_encoding("gzip, zstd", zstd_available=False) == "gzip"
+    assert choose_encoding("gzip;q=0.5, zstd;q=0") == "gzip"
+    assert choose_encoding("identity") is None
+    assert choose_encoding("*") == "zstd"
+    assert choose_encoding("") is None
+
+
+def _app(chunks, content_type=b"application/json", endpoint=None):
+    async def app(scope, receive, send):
+        if endpoint is not None:
+            scope["endpoint"] = endpoint
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", content_type), (b"content-length", b"1")],
+            }
+        )
+        for index, chunk in enumerate(chunks):
+            more_body = index < len(chunks) - 1
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    return app
+
+
+def _request(middleware, accept=b"gzip"):
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", accept)]}
+    asyncio.run(middleware(scope, None, send))
+    headers = dict(sent[0]["headers"])
+    body = b"".join(message.get("body", b"") for message in sent[1:])
+    return headers, body, sent
+
+
+def _middleware(app, **kwargs):
+    return CompressionMiddleware(app, CompressionStats(), minimum_size=100, gzip_level=6, **kwargs)
+
+
+def test_compresses_complete_response_above_threshold():
+    middleware = _middleware(_app([BODY]))
+    headers, body, _ = _request(middleware)
+
+    assert headers[b"content-encoding"] == b"gzip"
+    assert headers[b"vary"] == b"Accept-Encoding"
+    assert int(headers[b"content-length"]) == len(body)
+    assert gzip.decompress(body) == BODY
+    stats = middleware.stats.snapshot()["encodings"]["gzip"]
+    assert stats["responses"] == 1 and stats["bytes_in"] == len(BODY)
+    assert stats["ratio"] < 0.5
+
+
+def test_small_and_binary_responses_pass_through():
+    middleware = _middleware(_app([b"{}"]))
+    headers, body, _ = _request(middleware)
+    assert b"content-encoding" not in headers and body == b"{}"
+    assert middleware.stats.skipped_small == 1
+
+    headers, body, _ = _request(_middleware(_app([BODY], content_type=b"image/png")))
+    assert b"content-encoding" not in headers and body == BODY
+
+    headers, body, _ = _request(_middleware(_app([BODY])), accept=b"identity")
+    assert b"content-encoding" not in headers and body == BODY
+
+
+def test_streaming_response_is_compressed_per_chunk():
+    chunks = [b"data: 1\n\n", b"data: 2\n\n", b""]
+    headers, body, sent = _request(_middleware(_app(chunks, content_type=b"text/event-stream")))
+
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+    # Кожен фрагмент розпаковується одразу, без очікування кінця потоку
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    assert decoder.decompress(sent[1]["body"]) == chunks[0]
+    assert gzip.decompress(body) == b"".join(chunks)
+    assert [message["more_body"] for message in sent[1:]] == [True, True, False]
+
+
+def test_route_can_override_or_disable_compression():
+    @compression(enabled=False)
+    async def raw_endpoint():
+        pass
+
+    headers, body, _ = _request(_middleware(_app([BODY], endpoint=raw_endpoint)))
+    assert b"content-encoding" not in headers and body == BODY
+
+    @compression(gzip=1)
+    async def fast_endpoint():
+        pass
+
+    middleware = _middleware(_app([BODY], endpoint=fast_endpoint))
+    assert middleware.route_level({"endpoint": fast_endpoint}, "gzip") == 1
+    headers, body, _ = _request(middleware)
+    assert gzip.decompress(body) == BODY
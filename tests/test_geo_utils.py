@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from api.services.geo_utils import (
+    haversine_km,
+    vincenty_km,
+    find_impossible_travel,
+    geohash_encode,
+    LastLocationCache,
+    TrustedLocationCache,
+)
+
+KYIV = (50.4501, 30.5234)
+LVIV = (49.8397, 24.0297)
+
+
+def test_haversine_and_vincenty_distances():
+    assert haversine_km(*KYIV, *LVIV) == pytest.approx(467, abs=2)
+    # Еталон geopy.geodesic для тієї ж пари: 468.953 км
+    assert vincenty_km(*KYIV, *LVIV)[0] == pytest.approx(468.953, abs=0.001)
+    assert haversine_km(*KYIV, *KYIV) == 0
+
+
+def test_vectorized_matches_scalar():
+    lat1 = np.array([KYIV[0], 0.0, 10.0])
+    lon1 = np.array([KYIV[1], 0.0, 20.0])
+    lat2 = np.array([LVIV[0], 0.0, -10.0])
+    lon2 = np.array([LVIV[1], 1.0, -160.0])
+
+    vectorized = vincenty_km(lat1, lon1, lat2, lon2)
+
+    for index in range(3):
+        assert vectorized[index] == pytest.approx(
+            vincenty_km(lat1[index], lon1[index], lat2[index], lon2[index])[0]
+        )
+
+
+def test_find_impossible_travel():
+    usernames = np.array(["alice", "bob", "alice", "bob", "alice"])
+    timestamps = np.array([0.0, 0.0, 600.0, 7200.0, 900.0])
+    latitudes = np.array([KYIV[0], KYIV[0], 40.7, 40.7, 40.7])
+    longitudes = np.array([KYIV[1], KYIV[1], -74.0, -74.0, -74.0])
+
+    pairs = find_impossible_travel(usernames, timestamps, latitudes, longitudes, 500, 3600)
+
+    # Лише перехід alice Київ -> Нью-Йорк за 10 хвилин; bob летів дві години
+    assert list(pairs["previous"]) == [0]
+    assert list(pairs["current"]) == [2]
+    assert pairs["interval_seconds"][0] == 600
+
+
+def test_last_location_cache_evicts_least_recent():
+    cache = LastLocationCache(max_size=2)
+    cache.set("alice", *KYIV, 1)
+    cache.set("bob", *LVIV, 2)
+    cache.get("alice")
+    cache.set("carol", *LVIV, 3)
+
+    assert cache.get("bob") is None
+    assert cache.get("alice") == (*KYIV, 1)
+    assert len(cache) == 2
+
+
+def test_last_location_cache_expires():
+    cache = LastLocationCache(ttl_seconds=60)
+    cache.set("alice", *KYIV, 1, now=0)
+
+    assert cache.get("alice", now=59) == (*KYIV, 1)
+    # Застарілий запис не затуляє профіль локацій, оновлений іншим екземпляром
+    assert cache.get("alice", now=60) is None
+    assert len(cache) == 0
+
+
+def test_geohash_encode():
+    assert geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    # Сусідні адреси в межах міста потрапляють в одну клітинку
+    assert geohash_encode(*KYIV) == geohash_encode(50.452, 30.52)
+    assert geohash_encode(*KYIV) != geohash_encode(*LVIV)
+
+
+def test_trusted_location_cache_adds_only_to_loaded_users():
+    cache = TrustedLocationCache(max_size=2)
+    cache.add("alice", "u8vxn")
+    assert cache.get("alice") is None
+
+    cache.set("alice", ["u8vxn"])
+    cache.add("alice", "u8c5d")
+    assert cache.get("alice") == {"u8vxn", "u8c5d"}
@@ -0,0 +1,38 @@
+import pytest
+from api.services.hyperloglog import HyperLogLog
+
+
+@pytest.mark.parametrize("cardinality", [0, 10, 1000, 100_000])
+def test_estimate_within_error_bounds(cardinality):
+    sketch = HyperLogLog().update(f"user_{i}" for i in range(cardinality))
+    tolerance = max(1, 3 * sketch.standard_error * cardinality)
+    assert abs(sketch.count() - cardinality) <= tolerance
+
+
+def test_duplicates_are_ignored():
+    sketch = HyperLogLog().update(["10.0.0.1"] * 1000)
+    assert sketch.count() == 1
+
+
+def test_merge_matches_union():
+    first = HyperLogLog().update(range(0, 60_000))
+    second = HyperLogLog().update(range(30_000, 90_000))
+
+    merged = HyperLogLog.union([first, second])
+    direct = HyperLogLog().update(range(0, 90_000))
+
+    assert merged.count() == direct.count()
+
+
+def test_serialization_round_trip():
+    sketch = HyperLogLog(precision=10).update(range(5000))
+    restored = HyperLogLog.from_bytes(sketch.to_bytes())
+
+    assert restored.precision == 10
+    assert restored.count() == sketch.count()
+    assert len(sketch.to_bytes()) < sketch.m
+
+
+def test_merge_rejects_different_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(10).merge(HyperLogLog(12))
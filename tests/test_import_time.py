@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from api.services.geo_utils import great_circle_km, haversine_km
+
+HEAVY_MODULES = ("numpy", "pandas", "plotly", "geoip2", "pyotp")
+# Щедрий бюджет: перевіряється відсутність важких залежностей, а не швидкість машини CI
+IMPORT_BUDGET_SECONDS = 3.0
+
+
+def run_import(module: str, code: str = "") -> subprocess.CompletedProcess:
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(path or "." for path in sys.path)}
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import sys, {module}\n{code}"],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+
+
+def cumulative_seconds(importtime_output: str, module: str) -> float:
+    for line in importtime_output.splitlines():
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1e6
+    raise AssertionError(f"{module} відсутній у звіті importtime")
+
+
+@pytest.mark.parametrize("module", ["api.services.auth_service", "api.services.risk_engine"])
+def test_service_import_skips_heavy_dependencies(module):
+    result = run_import(
+        module,
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))",
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ""
+    assert cumulative_seconds(result.stderr, module) < IMPORT_BUDGET_SECONDS
+
+
+def test_great_circle_matches_vectorized_haversine():
+    kyiv, lviv = (50.4501, 30.5234), (49.8397, 24.0297)
+    assert great_circle_km(*kyiv, *lviv) == pytest.approx(float(haversine_km(*kyiv, *lviv)))
+    assert great_circle_km(*kyiv, *kyiv) == 0
@@ -0,0 +1,152 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from api.services import job_queue
+from api.services.job_queue import JobWorker, authorize_client_job, enqueue_job, retry_delay
+
+
+class FakeConnection:
+    def __init__(self):
+        self.executed = []
+
+    async def execute(self, query, *args):
+        self.executed.append((" ".join(query.split()), args))
+        return "UPDATE 1"
+
+
+class FakePool:
+    def __init__(self):
+        self.conn = FakeConnection()
+
+    def acquire(self):
+        pool = self
+
+        class Acquire:
+            async def __aenter__(self):
+                return pool.conn
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return Acquire()
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = FakePool()
+
+    async def get_pool():
+        return pool
+
+    monkeypatch.setattr(job_queue, "get_pool", get_pool)
+    return pool
+
+
+def _job(job_type, attempts=1, max_attempts=3):
+    return {
+        "id": 7,
+        "job_type": job_type,
+        "payload": {"value": 2},
+        "attempts": attempts,
+        "max_attempts": max_attempts,
+    }
+
+
+def test_retry_delay_grows_exponentially_with_cap(monkeypatch):
+    monkeypatch.setattr(job_queue.settings, "JOB_RETRY_BASE_SECONDS", 10)
+    monkeypatch.setattr(job_queue.settings, "JOB_RETRY_MAX_SECONDS", 60)
+    assert [retry_delay(attempt, jitter=1.0) for attempt in (1, 2, 3, 4)] == [10, 20, 40, 60]
+    assert 5 <= retry_delay(1) <= 10
+
+
+def test_enqueue_rejects_unknown_job_type():
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(enqueue_job(None, "no_such_job"))
+    assert error.value.status_code == 400
+
+
+def test_client_jobs_are_allowlisted_per_role():
+    analyst = {"username": "ann", "roles": ["analyst"]}
+    user = {"username": "bob", "roles": ["user"]}
+
+    period = {"period_start": "2024-01-01", "period_end": "2024-02-01"}
+    payload = authorize_client_job("security_report", {**period, "generated_by": "admin"}, analyst)
+    assert payload["generated_by"] == "ann"
+
+    with pytest.raises(HTTPException) as error:
+        authorize_client_job("sql_query", {"query": "SELECT 1"}, user)
+    assert error.value.status_code == 403
+    # Внутрішні завдання клієнт не ставить за жодної ролі
+    with pytest.raises(HTTPException) as error:
+        admin = {"username": "root", "roles": ["admin"]}
+        authorize_client_job("scheduled_report", {"result_id": 1}, admin)
+    assert error.value.status_code == 400
+
+
+def test_client_job_payload_is_validated_at_submit():
+    analyst = {"username": "ann", "roles": ["analyst"]}
+
+    with pytest.raises(HTTPException) as error:
+        authorize_client_job("security_report", {"period_start": "2024-01-01"}, analyst)
+    assert error.value.status_code == 400
+    assert "period_end" in error.value.detail
+
+    with pytest.raises(HTTPException) as error:
+        period = {"period_start": "вчора", "period_end": "2024-02-01"}
+        authorize_client_job("security_report", period, analyst)
+    assert error.value.status_code == 400
+
+    with pytest.raises(HTTPException) as error:
+        authorize_client_job("visualization", {}, analyst)
+    assert error.value.status_code == 400
+
+
+def test_builtin_handlers_registered():
+    assert {"sql_query", "security_report", "visualization"} <= set(job_queue.JOB_HANDLERS)
+
+
+def test_worker_stores_result(pool):
+    async def double(payload):
+        return {"value": payload["value"] * 2}
+
+    worker = JobWorker(concurrency=1, handlers={"double": double})
+    assert asyncio.run(worker.execute(_job("double"))) == "succeeded"
+
+    ((query, args),) = pool.conn.executed
+    assert query.startswith("UPDATE analytics_jobs SET status = 'succeeded'")
+    assert args[:3] == (7, worker.worker_id, {"value": 4})
+    assert worker.processed["succeeded"] == 1
+
+
+def test_worker_retries_server_errors_until_attempts_exhausted(pool):
+    async def broken(payload):
+        raise RuntimeError("backend down")
+
+    worker = JobWorker(concurrency=1, handlers={"broken": broken})
+    assert asyncio.run(worker.execute(_job("broken", attempts=1))) == "queued"
+    assert asyncio.run(worker.execute(_job("broken", attempts=3))) == "failed"
+
+    (retry_query, retry_args), (fail_query, fail_args) = pool.conn.executed
+    assert "status = 'queued'" in retry_query and retry_args[2] == "RuntimeError: backend down"
+    assert "status = 'failed'" in fail_query
+
+
+def test_worker_does_not_retry_client_errors(pool):
+    async def invalid(payload):
+        raise HTTPException(status_code=404, detail="Візуалізацію не знайдено")
+
+    worker = JobWorker(concurrency=1, handlers={"invalid": invalid})
+    assert asyncio.run(worker.execute(_job("invalid", attempts=1))) == "failed"
+    ((query, args),) = pool.conn.executed
+    assert args[2] == "HTTPException: Візуалізацію не знайдено"
+
+
+def test_worker_does_not_retry_malformed_payload(pool):
+    worker = JobWorker(concurrency=1, handlers=job_queue.JOB_HANDLERS)
+    job = {**_job("security_report", attempts=1), "payload": {"period_start": "2024-01-01"}}
+
+    assert asyncio.run(worker.execute(job)) == "failed"
+    ((query, args),) = pool.conn.executed
+    assert "status = 'failed'" in query
+    assert args[2] == "KeyError: 'period_end'"
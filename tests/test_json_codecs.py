@@ -0,0 +1,62 @@
+import asyncio
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from api.services.json_codecs import (
+    ORJSONRecordResponse,
+    _decode_jsonb,
+    _encode_jsonb,
+    dumps,
+    init_connection,
+)
+
+
+def test_dumps_handles_decimal_datetime_and_sets():
+    payload = {
+        "amount": Decimal("12.50"),
+        "count": Decimal("3"),
+        "created_at": datetime(2024, 1, 2, 3, 4, 5),
+        "tags": {"a"},
+        1: "non-str key",
+    }
+    assert json.loads(dumps(payload)) == {
+        "amount": 12.5,
+        "count": 3,
+        "created_at": "2024-01-02T03:04:05",
+        "tags": ["a"],
+        "1": "non-str key",
+    }
+
+
+def test_dumps_rejects_unknown_types():
+    with pytest.raises(TypeError):
+        dumps({"value": object()})
+
+
+def test_jsonb_binary_roundtrip():
+    details = {"username": "alice", "location": {"city": "Київ"}, "factors": [1, 2]}
+    encoded = _encode_jsonb(details)
+    assert encoded[:1] == b"\x01"
+    assert _decode_jsonb(encoded) == details
+
+
+def test_response_renders_without_jsonable_encoder():
+    response = ORJSONRecordResponse([{"id": 1, "score": Decimal("0.5")}])
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == [{"id": 1, "score": 0.5}]
+
+
+def test_init_connection_registers_binary_codecs():
+    registered = {}
+
+    class FakeConnection:
+        async def set_type_codec(self, typename, **kwargs):
+            registered[typename] = kwargs
+
+    asyncio.run(init_connection(FakeConnection()))
+
+    assert set(registered) == {"json", "jsonb"}
+    assert all(codec["format"] == "binary" for codec in registered.values())
+    assert registered["jsonb"]["decoder"](registered["jsonb"]["encoder"]({"a": 1})) == {"a": 1}
@@ -0,0 +1,73 @@
+import json
+import logging
+import queue
+import sys
+
+from api.services.logging_pipeline import (
+    DroppingQueueHandler,
+    SamplingFilter,
+    JsonFormatter,
+    parse_sampling,
+)
+
+
+def _record(name="api.services.auth_service", level=logging.INFO, msg="Вхід: %s", args=("alice",)):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_queue_handler_drops_instead_of_blocking():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    handler.handle(_record())
+    handler.handle(_record(level=logging.WARNING))
+
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == {"WARNING": 1}
+
+    queued = handler.queue.get_nowait()
+    assert queued.msg == "Вхід: alice" and queued.args is None
+
+
+def test_queued_record_snapshots_message_and_exception():
+    handler = DroppingQueueHandler(queue.Queue())
+    details = {"attempts": 1}
+    try:
+        raise ValueError("збій")
+    except ValueError:
+        record = logging.LogRecord(
+            "api", logging.ERROR, __file__, 1, "Стан: %s", (details,), sys.exc_info()
+        )
+    handler.handle(record)
+    # Зміна аргументу після виклику логера не потрапляє в запис
+    details["attempts"] = 2
+
+    queued = handler.queue.get_nowait()
+    assert queued.getMessage() == "Стан: {'attempts': 1}"
+    assert queued.exc_info is None and "ValueError: збій" in queued.exc_text
+    entry = json.loads(JsonFormatter().format(queued))
+    assert "ValueError: збій" in entry["exception"]
+    text = logging.Formatter("%(message)s").format(queued)
+    assert text.startswith("Стан: {'attempts': 1}\nTraceback")
+
+
+def test_sampling_filter_keeps_warnings():
+    sampling = SamplingFilter({"api.services": 0.0, "api.services.risk_engine": 1.0})
+
+    assert not sampling.filter(_record())
+    assert sampling.filter(_record(level=logging.WARNING))
+    assert sampling.filter(_record(name="api.services.risk_engine"))
+    assert sampling.filter(_record(name="api.services_other"))
+    assert sampling.sampled_out == {"api.services.auth_service": 1}
+
+
+def test_json_formatter_includes_extra_fields():
+    record = _record()
+    record.request_id = "abc"
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["message"] == "Вхід: alice"
+    assert entry["level"] == "INFO"
+    assert entry["request_id"] == "abc"
+
+
+def test_parse_sampling():
+    assert parse_sampling("a=0.1, b.c=0.5,,bad") == {"a": 0.1, "b.c": 0.5}
@@ -0,0 +1,286 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from api.services import auth_service
+
+
+def test_failed_login_is_recorded_after_connection_release(monkeypatch):
+    events = []
+
+    async def rejected(username, password, totp_token=None, ip_address=None):
+        events.append("login")
+        error = HTTPException(status_code=401, detail="Невірні облікові дані")
+        error.failed_login = {"user_id": 7, "bad_password": True}
+        raise error
+
+    async def record_failed_login(username, ip_address=None, **failure):
+        events.append(("failure", username, ip_address, failure))
+
+    monkeypatch.setattr(auth_service, "_authenticate_user", rejected)
+    monkeypatch.setattr(auth_service, "record_failed_login", record_failed_login)
+
+    with pytest.raises(HTTPException):
+        asyncio.run(auth_service.authenticate_user("alice", "bad", ip_address="10.0.0.1"))
+    assert events == [
+        "login",
+        ("failure", "alice", "10.0.0.1", {"user_id": 7, "bad_password": True}),
+    ]
+
+
+def test_unmarked_errors_are_not_recorded(monkeypatch):
+    async def broken(*args, **kwargs):
+        raise HTTPException(status_code=500, detail="Внутрішня помилка сервера")
+
+    async def record_failed_login(*args, **kwargs):
+        raise AssertionError("не має викликатися")
+
+    monkeypatch.setattr(auth_service, "_authenticate_user", broken)
+    monkeypatch.setattr(auth_service, "record_failed_login", record_failed_login)
+    with pytest.raises(HTTPException):
+        asyncio.run(auth_service.authenticate_user("alice", "bad"))
+
+
+class FakeConnection:
+    """Записує кожен запит у пул як (текст в один рядок, аргументи)"""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def execute(self, query, *args):
+        self.pool.statements.append((" ".join(query.split()), args))
+
+    async def fetchval(self, query, *args):
+        self.pool.statements.append((" ".join(query.split()), args))
+        return 0
+
+    async def fetchrow(self, query, *args):
+        self.pool.statements.append((" ".join(query.split()), args))
+        return self.pool.batches.pop(0)
+
+    def transaction(self):
+        class Transaction:
+            async def __aenter__(self):
+                pass
+
+            async def __aexit__(self, *exc):
+                pass
+
+        return Transaction()
+
+
+class FakePool:
+    def __init__(self, batches=()):
+        self.statements = []
+        self.batches = list(batches)
+        self.held = 0
+        self.peak = 0
+
+    def acquire(self):
+        pool = self
+
+        class Acquire:
+            async def __aenter__(self):
+                pool.held += 1
+                pool.peak = max(pool.peak, pool.held)
+                return FakeConnection(pool)
+
+            async def __aexit__(self, *exc):
+                pool.held -= 1
+
+        return Acquire()
+
+
+def _tables(statements):
+    return [query.split("INTO ")[1].split()[0] for query, _ in statements]
+
+
+def test_record_failed_login_uses_one_connection(monkeypatch):
+    pool = FakePool()
+
+    async def get_pool():
+        return pool
+
+    async def record_login(success):
+        pass
+
+    monkeypatch.setattr(auth_service, "get_pool", get_pool)
+    monkeypatch.setattr(auth_service.security_counters, "record_login", record_login)
+
+    asyncio.run(
+        auth_service.record_failed_login("alice", "10.0.0.1", user_id=7, bad_password=True)
+    )
+
+    assert pool.peak == 1
+    assert _tables(pool.statements) == ["user_login_attempts", "auth_statistics", "auth_events"]
+    attempts, statistics, event = (args for _, args in pool.statements)
+    assert attempts[0] == "alice"
+    assert statistics == ("alice",)
+    assert "failed_logins = auth_statistics.failed_logins + 1" in pool.statements[1][0]
+    assert event == (7, "alice", False, "10.0.0.1", None, None, None, None, None)
+
+
+def test_record_failed_login_without_bad_password_keeps_attempts(monkeypatch):
+    pool = FakePool()
+
+    async def get_pool():
+        return pool
+
+    async def record_login(success):
+        pass
+
+    monkeypatch.setattr(auth_service, "get_pool", get_pool)
+    monkeypatch.setattr(auth_service.security_counters, "record_login", record_login)
+
+    # Заблокований вхід (429) не збільшує лічильник спроб
+    asyncio.run(auth_service.record_failed_login("alice"))
+    assert _tables(pool.statements) == ["auth_statistics", "auth_events"]
+
+
+def test_record_auth_event_writes_location():
+    pool = FakePool()
+    location = {"country_code": "UA", "city": "Київ", "latitude": 50.45, "longitude": 30.52}
+
+    asyncio.run(
+        auth_service.record_auth_event(
+            FakeConnection(pool), "alice", True, 7, "10.0.0.1", location, 25
+        )
+    )
+
+    ((query, args),) = pool.statements
+    assert query.startswith("INSERT INTO auth_events")
+    assert args == (7, "alice", True, "10.0.0.1", "UA", "Київ", 50.45, 30.52, 25)
+
+
+def test_backfill_auth_events_resumes_and_batches(monkeypatch):
+    pool = FakePool(
+        batches=[
+            {"last_id": 120, "batch_size": 2},
+            {"last_id": 150, "batch_size": 1},
+            {"last_id": None, "batch_size": 0},
+        ]
+    )
+
+    async def get_pool():
+        return pool
+
+    monkeypatch.setattr(auth_service, "get_pool", get_pool)
+
+    assert asyncio.run(auth_service.backfill_auth_events(batch_size=2)) == 3
+    resume, *batches = pool.statements
+    assert "MAX(source_activity_id)" in resume[0]
+    # Кожен пакет продовжує з останнього перенесеного activity_id
+    assert [args for _, args in batches] == [(0, 2), (120, 2), (150, 2)]
+    assert all("ON CONFLICT (source_activity_id) DO NOTHING" in query for query, _ in batches)
+
+
+def test_with_connection_joins_callers_connection(monkeypatch):
+    import asyncpg.pool
+
+    async def get_pool():
+        raise AssertionError("вкладений виклик не має брати друге з'єднання")
+
+    @auth_service.with_connection
+    async def nested(conn, username):
+        return conn, username
+
+    monkeypatch.setattr(auth_service, "get_pool", get_pool)
+    conn = object.__new__(asyncpg.pool.PoolConnectionProxy)
+    assert asyncio.run(nested(conn, "alice")) == (conn, "alice")
+
+
+def test_attack_patterns_count_failures_in_auth_events(monkeypatch):
+    queries = []
+
+    class Connection:
+        def transaction(self):
+            class Transaction:
+                async def start(self):
+                    pass
+
+                async def commit(self):
+                    pass
+
+                async def rollback(self):
+                    pass
+
+            return Transaction()
+
+        async def fetchval(self, query, *args):
+            queries.append((" ".join(query.split()), args))
+            return 12
+
+    class Pool:
+        async def acquire(self):
+            return Connection()
+
+        async def release(self, conn):
+            pass
+
+    async def get_pool():
+        return Pool()
+
+    monkeypatch.setattr(auth_service, "get_pool", get_pool)
+    brute_force = {"conditions": {"failed_attempts": 10, "time_window": "5m"}}
+    spray = {"conditions": {"unique_users": 5, "time_window": "10m"}}
+
+    assert asyncio.run(auth_service.evaluate_pattern_match("alice", brute_force, {})) == (
+        pytest.approx(0.82)
+    )
+    assert asyncio.run(auth_service.evaluate_pattern_match("alice", spray, {})) == 0.9
+
+    (brute_query, brute_args), (spray_query, spray_args) = queries
+    assert "FROM auth_events WHERE username = $1 AND NOT success" in brute_query
+    assert brute_args == ("alice", 5)
+    assert "COUNT(DISTINCT username) FROM auth_events WHERE NOT success" in spray_query
+    assert spray_args == (10,)
+
+
+def test_location_cache_is_updated_after_commit(monkeypatch):
+    from api.services.geo_utils import LastLocationCache
+
+    class Transaction:
+        def __init__(self, fail):
+            self.fail = fail
+
+        async def start(self):
+            pass
+
+        async def commit(self):
+            if self.fail:
+                raise RuntimeError("коміт не вдався")
+
+        async def rollback(self):
+            pass
+
+    class Pool:
+        fail = True
+
+        async def acquire(self):
+            pool = self
+            return type("Connection", (), {"transaction": lambda self: Transaction(pool.fail)})()
+
+        async def release(self, conn):
+            pass
+
+    pool = Pool()
+
+    async def get_pool():
+        return pool
+
+    async def get_last_location(conn, username):
+        return None
+
+    cache = LastLocationCache()
+    monkeypatch.setattr(auth_service, "get_pool", get_pool)
+    monkeypatch.setattr(auth_service, "get_last_location", get_last_location)
+    monkeypatch.setattr(auth_service, "last_location_cache", cache)
+    location = {"latitude": 50.45, "longitude": 30.52}
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(auth_service.detect_location_anomalies("alice", location))
+    assert cache.get("alice") is None
+
+    pool.fail = False
+    assert asyncio.run(auth_service.detect_location_anomalies("alice", location)) is None
+    assert cache.get("alice")[:2] == (50.45, 30.52)
@@ -0,0 +1,156 @@
+import asyncio
+
+from api.services.periodic_tasks import (
+    PERIODIC_TASKS,
+    AdvisoryLeadership,
+    PeriodicTask,
+    PeriodicTaskRunner,
+    advisory_key,
+)
+
+
+class FakeLocks:
+    """Сесійні advisory-блокування Postgres: власник і реентрантний лічильник"""
+
+    def __init__(self):
+        self.owners = {}
+
+    def connection(self):
+        locks = self
+
+        class Connection:
+            def __init__(self):
+                self.closed = False
+
+            def is_closed(self):
+                return self.closed
+
+            async def fetchval(self, query, key):
+                owner, count = locks.owners.get(key, (self, 0))
+                if owner is not self:
+                    return False
+                locks.owners[key] = (self, count + 1)
+                return True
+
+            async def execute(self, query, key):
+                owner, count = locks.owners[key]
+                locks.owners[key] = (owner, count - 1)
+
+            async def close(self):
+                # Закриття сесії звільняє її блокування
+                self.closed = True
+                for key, (owner, _) in list(locks.owners.items()):
+                    if owner is self:
+                        del locks.owners[key]
+
+            terminate = close
+
+        return Connection()
+
+
+def _leadership(locks):
+    async def connect():
+        return locks.connection()
+
+    return AdvisoryLeadership(connect)
+
+
+def test_advisory_key_is_stable_bigint():
+    assert advisory_key("cleanup") == advisory_key("cleanup") != advisory_key("metrics")
+    assert -(2**63) <= advisory_key("cleanup") < 2**63
+
+
+def test_builtin_tasks_registered():
+    leader_tasks = {"cleanup_expired_data", "security_metrics", "behavior_profiles"}
+    buffer_tasks = {"alert_suppressor_flush", "risk_assessments_flush"}
+    assert leader_tasks | buffer_tasks <= set(PERIODIC_TASKS)
+    assert all(PERIODIC_TASKS[name].leader for name in leader_tasks)
+    # Буфери в пам'яті кожного екземпляра записує кожен екземпляр, завжди
+    assert not any(PERIODIC_TASKS[name].leader for name in buffer_tasks)
+    assert {name for name, task in PERIODIC_TASKS.items() if task.essential} == buffer_tasks
+
+
+def test_essential_only_start_runs_buffer_flushes():
+    async def work():
+        pass
+
+    async def scenario():
+        tasks = {
+            "cleanup": PeriodicTask("cleanup", work, 60),
+            "flush": PeriodicTask("flush", work, 60, leader=False, essential=True),
+        }
+        runner = PeriodicTaskRunner(tasks, _leadership(FakeLocks()))
+        await runner.start(essential_only=True)
+        started = len(runner._loops)
+        await runner.stop()
+        return started
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_next_delay_is_jittered_and_accounts_for_run_time():
+    task = PeriodicTask("t", None, interval=100, jitter=0.1)
+    delays = [task.next_delay() for _ in range(200)]
+    assert 90 <= min(delays) < max(delays) <= 110
+    assert task.next_delay(elapsed=500) == 0.0
+
+
+def test_only_leader_runs_task_and_follower_takes_over():
+    locks = FakeLocks()
+    calls = []
+
+    async def work():
+        calls.append(1)
+
+    async def scenario():
+        first = PeriodicTaskRunner({"t": PeriodicTask("t", work, 60)}, _leadership(locks))
+        second = PeriodicTaskRunner({"t": PeriodicTask("t", work, 60)}, _leadership(locks))
+
+        assert await first.run_once(first.tasks["t"]) == "succeeded"
+        assert await second.run_once(second.tasks["t"]) == "not_leader"
+        assert await first.run_once(first.tasks["t"]) == "succeeded"
+        # Повторне взяття власного блокування не накопичує лічильник сесії
+        assert list(locks.owners.values())[0][1] == 1
+
+        await first.stop()
+        assert await second.run_once(second.tasks["t"]) == "succeeded"
+        return second.snapshot()["t"]
+
+    stats = asyncio.run(scenario())
+    assert len(calls) == 3
+    assert stats["not_leader"] == 1 and stats["succeeded"] == 1
+
+
+def test_timeout_failure_and_overlap_are_recorded():
+    release = asyncio.Event()
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    async def broken():
+        raise RuntimeError("немає з'єднання")
+
+    async def blocking():
+        await release.wait()
+
+    async def scenario():
+        tasks = {
+            "slow": PeriodicTask("slow", slow, 60, timeout=0.01, leader=False),
+            "broken": PeriodicTask("broken", broken, 60, leader=False),
+            "blocking": PeriodicTask("blocking", blocking, 60, leader=False),
+        }
+        runner = PeriodicTaskRunner(tasks, _leadership(FakeLocks()))
+        assert await runner.run_once(tasks["slow"]) == "timeout"
+        assert await runner.run_once(tasks["broken"]) == "failed"
+
+        running = asyncio.create_task(runner.run_once(tasks["blocking"]))
+        await asyncio.sleep(0)
+        assert await runner.run_once(tasks["blocking"]) == "overlap"
+        release.set()
+        assert await running == "succeeded"
+        return runner.snapshot()
+
+    snapshot = asyncio.run(scenario())
+    assert snapshot["slow"]["history"][0]["status"] == "timeout"
+    assert "RuntimeError" in snapshot["broken"]["history"][0]["error"]
+    assert snapshot["blocking"]["overlap"] == 1 and snapshot["blocking"]["succeeded"] == 1
@@ -0,0 +1,130 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from api.services import profiling
+from api.services.profiling import (
+    ProfileStore,
+    ProfilingMiddleware,
+    RequestTrace,
+    StackSampler,
+    TracedConnection,
+    _current_trace,
+    collapsed_stacks,
+    query_label,
+    span,
+)
+
+
+def test_span_records_only_inside_request_trace():
+    with span("db.fetch", query="SELECT 1"):
+        pass
+
+    trace = RequestTrace()
+    token = _current_trace.set(trace)
+    try:
+        with span("db.fetch", query="SELECT 1"):
+            pass
+    finally:
+        _current_trace.reset(token)
+
+    assert [item["name"] for item in trace.spans] == ["db.fetch"]
+    assert trace.spans[0]["query"] == "SELECT 1"
+    assert trace.spans[0]["duration_ms"] >= 0
+
+
+def test_query_label_collapses_whitespace():
+    assert query_label("\n  SELECT id\n    FROM users\n  WHERE id = $1\n") == (
+        "SELECT id FROM users WHERE id = $1"
+    )
+
+
+def _busy_loop(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_stack_sampler_collects_collapsed_stacks():
+    sampler = StackSampler(threading.get_ident(), 0.001)
+    sampler.start()
+    _busy_loop(0.05)
+    stacks = sampler.stop()
+
+    assert sum(stacks.values()) > 0
+    assert any("_busy_loop" in stack.split(";")[-1] for stack in stacks)
+    assert collapsed_stacks({"a;b": 3}) == "a;b 3\n"
+
+
+def test_profile_store_evicts_oldest():
+    store = ProfileStore(max_size=2)
+    for profile_id in ("a", "b", "c"):
+        store.add({"id": profile_id, "spans": [], "stacks": {}})
+
+    assert store.get("a") is None
+    assert [profile["id"] for profile in store.summaries()] == ["c", "b"]
+    assert "spans" not in store.summaries()[0]
+
+
+async def _app(scope, receive, send):
+    with span("backend.test"):
+        await asyncio.sleep(0.01)
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def _request(middleware, headers=()):
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/query/", "headers": list(headers)}
+    asyncio.run(middleware(scope, None, send))
+    return sent
+
+
+def test_middleware_keeps_only_slow_requests():
+    fast = ProfilingMiddleware(_app, ProfileStore(), slow_ms=10_000, sample_rate=0)
+    _request(fast)
+    assert len(fast.store) == 0
+
+    slow = ProfilingMiddleware(_app, ProfileStore(), slow_ms=0, sample_rate=0)
+    _request(slow)
+    (profile,) = slow.store.summaries()
+    assert profile["reason"] == "slow" and profile["status"] == 200
+    assert [item["name"] for item in slow.store.get(profile["id"])["spans"]] == ["backend.test"]
+
+
+def test_middleware_debug_header_requires_admin():
+    async def authorize(token):
+        return token == "admin-token"
+
+    headers = [(b"x-debug-profile", b"1"), (b"authorization", b"Bearer admin-token")]
+    middleware = ProfilingMiddleware(
+        _app, ProfileStore(), authorize=authorize, slow_ms=10_000, sample_rate=0, interval_ms=1
+    )
+    sent = _request(middleware, headers)
+
+    profile_id = dict(sent[0]["headers"])[b"x-profile-id"].decode()
+    assert middleware.store.get(profile_id)["reason"] == "debug"
+
+    _request(middleware, [(b"x-debug-profile", b"1"), (b"authorization", b"Bearer user")])
+    assert len(middleware.store) == 1
+
+
+def test_failed_query_is_still_accounted(monkeypatch):
+    recorded = []
+
+    class Accounting:
+        def record(self, operation, query, args, elapsed, rows=0, queries=1):
+            recorded.append((operation, query, rows))
+
+    async def failing(query, *args):
+        raise asyncio.TimeoutError()
+
+    monkeypatch.setattr(profiling, "query_accounting", Accounting())
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(TracedConnection._traced(None, "fetch", failing, "SELECT pg_sleep(10)"))
+    assert recorded == [("fetch", "SELECT pg_sleep(10)", 0)]
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+
+import pytest
+from api.services import auth_service
+from api.services.query_accounting import QueryAccounting, query_accounting, redact_params
+
+
+class FakeTransaction:
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def start(self):
+        self.conn.record("execute", "BEGIN;")
+
+    async def commit(self):
+        self.conn.record("execute", "COMMIT;")
+
+    async def rollback(self):
+        self.conn.record("execute", "ROLLBACK;")
+
+
+class FakeConnection:
+    """Імітує TracedConnection: кожен виклик обліковується як обмін з сервером"""
+
+    def record(self, operation, query, args=(), rows=0):
+        query_accounting.record(operation, query, args, 0.001, rows=rows)
+
+    def transaction(self):
+        return FakeTransaction(self)
+
+    async def fetch(self, query, *args):
+        self.record("fetch", query, args, rows=3)
+        return [{}, {}, {}]
+
+
+class FakePool:
+    def __init__(self):
+        self.released = 0
+
+    async def acquire(self):
+        return FakeConnection()
+
+    async def release(self, conn):
+        self.released += 1
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = FakePool()
+
+    async def get_pool():
+        return pool
+
+    monkeypatch.setattr(auth_service, "get_pool", get_pool)
+    query_accounting.reset()
+    yield pool
+    query_accounting.reset()
+
+
+@auth_service.with_connection
+async def load_users(conn, count: int):
+    # Навмисний N+1: окремий запит на кожного користувача
+    for user_id in range(count):
+        await conn.fetch("SELECT * FROM users WHERE id = $1", user_id)
+
+
+@auth_service.with_connection
+async def failing(conn):
+    await conn.fetch("SELECT 1")
+    raise ValueError("boom")
+
+
+def test_with_connection_accounts_queries_per_function(pool):
+    asyncio.run(load_users(2))
+    asyncio.run(load_users(5))
+
+    stats = query_accounting.snapshot()["test_query_accounting.load_users"]
+    assert stats["calls"] == 2
+    assert stats["queries"] == 7 and stats["rows"] == 21
+    # BEGIN та COMMIT рахуються як обміни з сервером, але не як запити функції
+    assert stats["round_trips"] == 7 + 4
+    assert stats["queries_per_call"] == 3.5 and stats["max_queries_per_call"] == 5
+    assert stats["commit_ms"] > 0
+    assert pool.released == 2
+
+
+def test_with_connection_counts_errors_and_releases(pool):
+    with pytest.raises(ValueError):
+        asyncio.run(failing())
+
+    stats = query_accounting.snapshot()["test_query_accounting.failing"]
+    assert stats["errors"] == 1 and stats["queries"] == 1
+    assert pool.released == 1
+
+
+def test_unscoped_queries_and_slow_query_log(caplog):
+    accounting = QueryAccounting(slow_query_ms=100)
+    with caplog.at_level(logging.WARNING):
+        accounting.record("fetch", "SELECT *\n  FROM users WHERE email = $1", ("a@b.c",), 0.25, rows=1)
+        accounting.record("fetch", "SELECT 1", (), 0.01)
+
+    assert accounting.snapshot()["<unscoped>"]["queries"] == 2
+    assert accounting.slow_queries == 1
+    (record,) = caplog.records
+    assert "SELECT * FROM users WHERE email = $1" in record.getMessage()
+    assert "a@b.c" not in record.getMessage()
+
+
+def test_redact_params_hides_values():
+    assert redact_params(("secret", 42, None, [1, 2])) == ["<str:6>", "<int>", None, "<list:2>"]
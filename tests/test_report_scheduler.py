@@ -0,0 +1,198 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from api.services import job_queue, report_scheduler
+from api.services.report_scheduler import (
+    CronExpression,
+    due_runs,
+    next_run_after,
+    schedule_due_reports,
+    validate_schedule,
+)
+
+
+def test_cron_fields_and_next_after():
+    cron = CronExpression("*/15 8-18/2 * * 1-5")
+    assert sorted(cron.minutes) == [0, 15, 30, 45]
+    assert sorted(cron.hours) == [8, 10, 12, 14, 16, 18]
+
+    # П'ятниця 18:50 -> понеділок 08:00
+    assert cron.next_after(datetime(2024, 3, 1, 18, 50)) == datetime(2024, 3, 4, 8, 0)
+    assert cron.next_after(datetime(2024, 3, 4, 8, 0)) == datetime(2024, 3, 4, 8, 15)
+
+    # Неділя як 0 та 7; день місяця АБО день тижня, якщо обмежені обидва
+    assert CronExpression("0 0 * * 7").weekdays == {0}
+    either = CronExpression("0 0 13 * 5")
+    assert either.next_after(datetime(2024, 9, 1)) == datetime(2024, 9, 6)
+    assert either.next_after(datetime(2024, 9, 12, 1)) == datetime(2024, 9, 13)
+
+    # 29 лютого — лише у високосний рік
+    assert CronExpression("30 6 29 2 *").next_after(datetime(2025, 1, 1)) == datetime(
+        2028, 2, 29, 6, 30
+    )
+
+
+@pytest.mark.parametrize(
+    "expression", ["* * *", "60 * * * *", "5-1 * * * *", "*/0 * * * *", "a * * * *"]
+)
+def test_cron_rejects_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        CronExpression(expression)
+
+
+def test_next_run_after_calendar_frequencies():
+    after = datetime(2024, 1, 31, 12, 0, tzinfo=timezone.utc)
+    assert next_run_after({"frequency": "daily", "hour": 9}, after) == after.replace(
+        day=1, month=2, hour=9
+    )
+    # Середа, день тижня 2 о 15:00 — ще сьогодні
+    assert next_run_after({"frequency": "weekly", "day": 2, "hour": 15}, after) == after.replace(
+        hour=15
+    )
+    # 31-го числа у лютому — останній день місяця
+    assert next_run_after({"frequency": "monthly", "day": 31}, after) == after.replace(
+        month=2, day=29, hour=0
+    )
+    every_six_hours = {"frequency": "cron", "expression": "0 */6 * * *"}
+    assert next_run_after(every_six_hours, after) == after.replace(hour=18)
+    with pytest.raises(ValueError):
+        next_run_after({"frequency": "hourly"}, after)
+
+
+def test_validate_schedule_is_client_error():
+    assert validate_schedule({"frequency": "daily"}) > datetime.utcnow()
+    for schedule in ({"frequency": "cron", "expression": "0 0 31 2 *"}, {"frequency": "weekly"}):
+        with pytest.raises(HTTPException) as error:
+            validate_schedule(schedule)
+        assert error.value.status_code == 400
+
+
+def test_due_runs_catches_up_latest_missed_runs():
+    schedule = {"frequency": "daily", "hour": 6}
+    next_run = datetime(2024, 5, 1, 6)
+    now = datetime(2024, 5, 10, 12)
+
+    runs, skipped, following = due_runs(schedule, next_run, now, max_catchup=3)
+    assert runs == [datetime(2024, 5, day, 6) for day in (8, 9, 10)]
+    assert skipped == 7
+    assert following == datetime(2024, 5, 11, 6)
+
+    runs, skipped, following = due_runs(schedule, following, now, max_catchup=3)
+    assert (runs, skipped) == ([], 0)
+
+
+class FakeTransaction:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeConnection:
+    """Розклади та запити транзакції планувальника без бази"""
+
+    def __init__(self, now, schedules, taken_slots=()):
+        self.now = now
+        self.schedules = schedules
+        self.taken_slots = set(taken_slots)
+        self.executed = []
+        self.jobs = []
+
+    def transaction(self):
+        return FakeTransaction()
+
+    async def fetch(self, query, limit):
+        return self.schedules[:limit]
+
+    async def fetchval(self, query, *args):
+        if query == "SELECT NOW()":
+            return self.now
+        if "scheduled_report_results" in query:
+            if args in self.taken_slots:
+                return None
+            self.taken_slots.add(args)
+            return len(self.taken_slots)
+        self.jobs.append(args)
+        return 100 + len(self.jobs)
+
+    async def execute(self, query, *args):
+        self.executed.append((" ".join(query.split()), args))
+        return "UPDATE 1"
+
+
+def _schedule(schedule_id, config, next_run):
+    return {
+        "id": schedule_id,
+        "report_type": "security",
+        "schedule_config": config,
+        "parameters": None,
+        "created_by": "admin",
+        "next_run": next_run,
+    }
+
+
+def test_schedule_due_reports_enqueues_slots_and_advances_next_run():
+    now = datetime(2024, 5, 3, 12, tzinfo=timezone.utc)
+    daily = _schedule(1, {"frequency": "daily", "hour": 6}, now - timedelta(days=2, hours=6))
+    broken = _schedule(2, {"frequency": "cron", "expression": "bad"}, now)
+    # Слот 2024-05-02 06:00 уже поставлено раніше — повторно не ставиться
+    conn = FakeConnection(now, [daily, broken], taken_slots={(1, now - timedelta(hours=30))})
+
+    claimed, enqueued = asyncio.run(schedule_due_reports(conn, batch_size=10, max_catchup=5))
+    assert (claimed, enqueued) == (2, 2)
+
+    payloads = [args[1] for args in conn.jobs]
+    assert [payload["period_end"] for payload in payloads] == [
+        "2024-05-01T06:00:00+00:00",
+        "2024-05-03T06:00:00+00:00",
+    ]
+    assert payloads[0]["period_start"] == "2024-04-30T06:00:00+00:00"
+    assert all(args[0] == "scheduled_report" for args in conn.jobs)
+
+    updates = [args for query, args in conn.executed if query.startswith("UPDATE report_schedules")]
+    assert updates[0] == (1, datetime(2024, 5, 4, 6, tzinfo=timezone.utc))
+    assert updates[1][0] == 2 and "bad" in updates[1][1]
+
+
+def test_scheduled_report_handler_records_result(monkeypatch):
+    from api.services import auth_service
+
+    conn = FakeConnection(None, [])
+
+    class FakePool:
+        def acquire(self):
+            return FakeAcquire()
+
+    class FakeAcquire:
+        async def __aenter__(self):
+            return conn
+
+        async def __aexit__(self, *exc):
+            return False
+
+    async def get_pool():
+        return FakePool()
+
+    async def generate_security_report(report_type, start, end, generated_by):
+        assert end - start == timedelta(days=1)
+        return {"id": 42}
+
+    monkeypatch.setattr(report_scheduler, "get_pool", get_pool)
+    monkeypatch.setattr(auth_service, "generate_security_report", generate_security_report)
+
+    payload = {
+        "result_id": 5,
+        "schedule_id": 1,
+        "report_type": "security",
+        "period_start": "2024-05-01T06:00:00+00:00",
+        "period_end": "2024-05-02T06:00:00+00:00",
+        "generated_by": "admin",
+    }
+    result = asyncio.run(job_queue.JOB_HANDLERS["scheduled_report"](payload))
+    assert result == {"schedule_id": 1, "report_id": 42}
+    assert "status = 'running'" in conn.executed[0][0]
+    assert [args[1] for query, args in conn.executed[1:]] == ["success", "success"]
+    assert conn.executed[-2][1] == (5, "success", 42, None)
@@ -0,0 +1,144 @@
+import time
+
+import pytest
+from api.services.risk_engine import FeatureCache, RiskEngine, FEATURES, build_context, _MISSING
+
+
+class FakeConnection:
+    """Підміна з'єднання: повертає рядки патернів та профілів локацій"""
+
+    def __init__(self):
+        self.queries = 0
+
+    async def fetch(self, query, *args):
+        self.queries += 1
+        if "user_behavior_patterns" in query:
+            return [{"username": "alice", "pattern_data": {"typical_hours": [9, 10, 11]}}]
+        if "user_location_profiles" in query:
+            return [{"username": "alice", "location_keys": ["u8vxn"]}]
+        return []
+
+
+def test_feature_cache_ttl():
+    cache = FeatureCache(ttl_seconds=10)
+    cache.set("alice", {9}, now=0)
+    assert cache.get("alice", now=5) == {9}
+    assert cache.get("alice", now=10) is _MISSING
+    # Відсутність даних теж кешується
+    cache.set("bob", None, now=0)
+    assert cache.get("bob", now=1) is None
+
+
+@pytest.mark.asyncio
+async def test_prefetch_caches_features():
+    engine = RiskEngine(FEATURES)
+    engine.invalidate()
+    conn = FakeConnection()
+
+    await engine.prefetch(conn, ["alice", "bob"])
+    loaded = conn.queries
+    await engine.prefetch(conn, ["alice", "bob"])
+    assert conn.queries == loaded
+
+    context = build_context({"location_data": {"location_key": "u8c5d"}})
+    context["hour"] = 3
+    score, factors = engine.score("alice", context)
+    assert factors == ["unusual_time", "unfamiliar_location"]
+    assert score == 30
+
+    # Користувач без історії не отримує ризику за час чи локацію
+    assert engine.score("bob", context) == (0, [])
+
+
+def test_score_batch_matches_single_scores():
+    engine = RiskEngine(FEATURES)
+    engine.invalidate()
+    engine.set_weights({"suspicious_location": 50})
+    contexts = [
+        {"hour": 12, "location_key": None, "location_anomaly": True},
+        {"hour": 12, "location_key": None, "location_anomaly": None},
+    ]
+
+    scores, matrix = engine.score_batch(["alice", "bob"], contexts)
+
+    assert scores.tolist() == [engine.score("alice", contexts[0])[0], 0]
+    assert scores[0] == 50
+    assert matrix.shape == (2, len(FEATURES))
+
+
+def test_single_score_latency():
+    engine = RiskEngine(FEATURES)
+    context = {"hour": 12, "location_key": "u8vxn", "location_anomaly": None}
+    iterations = 2000
+    started = time.perf_counter()
+    for _ in range(iterations):
+        engine.score("alice", context)
+    assert (time.perf_counter() - started) / iterations < 1e-3
+
+
+@pytest.mark.asyncio
+async def test_assess_only_buffers(monkeypatch):
+    from api.services import risk_engine as module
+
+    async def get_pool():
+        raise AssertionError("оцінка не має брати друге з'єднання пулу")
+
+    monkeypatch.setattr(module, "get_pool", get_pool)
+    engine = RiskEngine(FEATURES)
+    engine.invalidate()
+    conn = FakeConnection()
+
+    for _ in range(3):
+        await engine.assess(conn, "alice", {"hour": 3, "location_key": None})
+    assert len(engine._pending) == 3
+
+
+@pytest.mark.asyncio
+async def test_full_buffer_flushes_in_background_and_failed_batches_are_kept(monkeypatch):
+    from api.services import risk_engine as module
+
+    written = []
+    failures = [RuntimeError("немає з'єднання")]
+
+    class Pool:
+        def acquire(self):
+            class Acquire:
+                async def __aenter__(self):
+                    if failures:
+                        raise failures.pop()
+                    return None
+
+                async def __aexit__(self, *exc):
+                    pass
+
+            return Acquire()
+
+    async def get_pool():
+        return Pool()
+
+    async def write_assessments(conn, assessments):
+        written.extend(assessments)
+
+    monkeypatch.setattr(module, "get_pool", get_pool)
+    monkeypatch.setattr(module, "write_assessments", write_assessments)
+    monkeypatch.setattr(module, "ASSESSMENT_FLUSH_SIZE", 3)
+    monkeypatch.setattr(module, "ASSESSMENT_BUFFER_LIMIT", 4)
+    engine = RiskEngine(FEATURES)
+    engine.invalidate()
+    conn = FakeConnection()
+
+    for _ in range(3):
+        await engine.assess(conn, "alice", {"hour": 3, "location_key": None})
+    await engine._flush_task
+    # Невдалий запис повертає пакет у буфер
+    assert len(engine._pending) == 3 and written == []
+
+    failures.append(RuntimeError("знову"))
+    for _ in range(2):
+        await engine.assess(conn, "bob", {"hour": 3, "location_key": None})
+    await engine._flush_task
+    # Понад ліміт відкидаються найстаріші оцінки
+    assert [item[0] for item in engine._pending] == ["alice", "alice", "bob", "bob"]
+
+    await engine.flush()
+    assert len(written) == 4 and engine._pending == []
@@ -0,0 +1,38 @@
+import pytest
+from api.services.security_counters import (
+    RollingCounter,
+    SecurityCounters,
+    MemoryCounterBackend,
+)
+
+
+def test_rolling_counter_expires_old_buckets():
+    counter = RollingCounter(window_seconds=600, bucket_seconds=60)
+    counter.add(5, now=0)
+    counter.add(3, now=300)
+    assert counter.total(now=300) == 8
+
+    # Перший кошик виходить з вікна через 10 хвилин
+    assert counter.total(now=620) == 3
+    assert counter.total(now=10_000) == 0
+
+
+def test_rolling_counter_drift_correction():
+    counter = RollingCounter(window_seconds=600, bucket_seconds=60)
+    counter.add(10, now=0)
+    assert counter.correct(7, now=30) == -3
+    assert counter.total(now=30) == 7
+
+
+@pytest.mark.asyncio
+async def test_security_counter_rates():
+    counters = SecurityCounters(MemoryCounterBackend())
+    for success in (True, True, True, False):
+        await counters.record_login(success)
+    for _ in range(10):
+        await counters.record_session()
+    await counters.record_suspicious_session()
+
+    rates = await counters.rates()
+    assert rates["failed_login_rate"] == pytest.approx(0.25)
+    assert rates["suspicious_sessions_rate"] == pytest.approx(0.1)
@@ -0,0 +1,103 @@
+import pytest
+from datetime import date, datetime
+from api.services.auth_service import dense_daily_counts, summarize_success_rate_trend
+from api.services.security_report_service import merge_snapshots, report_period
+
+
+def test_merge_snapshots():
+    snapshots = [
+        {"successful_logins": 8, "failed_logins": 2, "total_anomalies": 1, "high_severity_anomalies": 0},
+        {"successful_logins": 2, "failed_logins": 8, "total_anomalies": 3, "high_severity_anomalies": 2},
+    ]
+
+    merged = merge_snapshots(snapshots)
+
+    assert merged["successful_logins"] == 10
+    assert merged["failed_logins"] == 10
+    assert merged["failed_login_rate"] == pytest.approx(0.5)
+    assert merged["high_severity_anomalies"] == 2
+
+
+def test_merge_empty_period():
+    assert merge_snapshots([])["failed_login_rate"] == 0
+
+
+@pytest.mark.parametrize(
+    "report_type,anchor,expected",
+    [
+        ("daily", date(2024, 3, 13), (date(2024, 3, 13), date(2024, 3, 13))),
+        ("weekly", date(2024, 3, 13), (date(2024, 3, 11), date(2024, 3, 17))),
+        ("monthly", date(2024, 2, 10), (date(2024, 2, 1), date(2024, 2, 29))),
+        ("monthly", date(2024, 12, 31), (date(2024, 12, 1), date(2024, 12, 31))),
+    ],
+)
+def test_report_period(report_type, anchor, expected):
+    assert report_period(report_type, anchor) == expected
+
+
+def test_days_without_logins_are_zero_filled():
+    daily = [
+        {"day": datetime(2024, 3, 11), "successes": 9, "failures": 1},
+        {"day": datetime(2024, 3, 14), "successes": 5, "failures": 5},
+    ]
+
+    dense = dense_daily_counts(daily, date(2024, 3, 10), date(2024, 3, 15))
+
+    assert [record["day"] for record in dense] == [date(2024, 3, d) for d in range(10, 16)]
+    assert [record["successes"] for record in dense] == [0, 9, 0, 0, 5, 0]
+    trend = summarize_success_rate_trend(dense)
+    assert trend["days_analyzed"] == 6
+    # Дні без спроб не обнуляють частку успіху
+    assert trend["mean"] == pytest.approx((0.9 * 4 + 0.5 * 2) / 6)
+
+
+def test_report_metrics_are_built_before_connection_is_held(monkeypatch):
+    import asyncio
+
+    from api.services import auth_service, security_report_service
+
+    held = []
+
+    class Connection:
+        def transaction(self):
+            class Transaction:
+                async def start(self):
+                    pass
+
+                async def commit(self):
+                    pass
+
+                async def rollback(self):
+                    pass
+
+            return Transaction()
+
+        async def fetchval(self, query, *args):
+            return 1
+
+    class Pool:
+        async def acquire(self):
+            held.append(1)
+            return Connection()
+
+        async def release(self, conn):
+            held.pop()
+
+    async def get_pool():
+        return Pool()
+
+    async def build_report_metrics(period_start, period_end, exact_distinct=None):
+        # Знімки беруть власні з'єднання: звіт ще не тримає жодного
+        assert held == []
+        return {"failed_login_rate": 0.5, "successful_logins": 1, "failed_logins": 1}
+
+    monkeypatch.setattr(auth_service, "get_pool", get_pool)
+    monkeypatch.setattr(security_report_service, "build_report_metrics", build_report_metrics)
+
+    report = asyncio.run(
+        auth_service.generate_security_report(
+            "daily", datetime(2024, 3, 1), datetime(2024, 3, 2), "admin"
+        )
+    )
+    assert report["id"] == 1
+    assert report["insights"][0]["type"] == "high_failure_rate"
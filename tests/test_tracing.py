@@ -0,0 +1,145 @@
+import asyncio
+import json
+import threading
+
+import pytest
+from api.services import profiling
+from api.services.tracing import (
+    FileExporter,
+    InMemoryExporter,
+    SpanContext,
+    SpanExporter,
+    Tracer,
+    TracingMiddleware,
+    inject_headers,
+    parse_traceparent,
+)
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+def test_parse_traceparent():
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01") == SpanContext(
+        TRACE_ID, PARENT_ID, True
+    )
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-00").sampled is False
+    assert parse_traceparent(f"ff-{TRACE_ID}-{PARENT_ID}-01") is None
+    assert parse_traceparent(f"00-{'0' * 32}-{PARENT_ID}-01") is None
+    assert parse_traceparent("garbage") is None
+    assert parse_traceparent(None) is None
+
+
+def test_child_spans_share_trace_and_propagate():
+    exporter = InMemoryExporter()
+    tracer = Tracer(exporter, sample_rate=1.0, batch_size=100)
+
+    with tracer.start_span("GET /query/", "server") as root:
+        with tracer.child_span("backend.opensearch") as backend:
+            headers = inject_headers({"Accept": "application/json"})
+    tracer.flush()
+
+    assert headers["traceparent"] == backend.context.traceparent
+    assert headers["Accept"] == "application/json"
+    assert [span.name for span in exporter.spans] == ["backend.opensearch", "GET /query/"]
+    assert backend.context.trace_id == root.context.trace_id
+    assert backend.parent_id == root.context.span_id
+    assert backend.kind == "client"
+    assert inject_headers() == {}
+
+
+def test_unsampled_trace_propagates_without_spans():
+    exporter = InMemoryExporter()
+    tracer = Tracer(exporter, sample_rate=0.0)
+
+    with tracer.start_span("GET /", "server") as root:
+        with tracer.child_span("db.fetch") as child:
+            headers = inject_headers()
+    tracer.flush()
+
+    assert child is None
+    assert headers["traceparent"] == root.context.traceparent
+    assert headers["traceparent"].endswith("-00")
+    assert exporter.spans == []
+
+
+def test_profiling_span_records_trace_span(monkeypatch):
+    exporter = InMemoryExporter()
+    tracer = Tracer(exporter, sample_rate=1.0)
+    monkeypatch.setattr(profiling, "tracer", tracer)
+
+    with tracer.start_span("GET /", "server"):
+        with profiling.span("auth.verify_password"):
+            pass
+    tracer.flush()
+
+    assert [span.name for span in exporter.spans] == ["auth.verify_password", "GET /"]
+
+
+async def _app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def test_middleware_continues_incoming_trace():
+    exporter = InMemoryExporter()
+    tracer = Tracer(exporter, sample_rate=0.0)
+    middleware = TracingMiddleware(_app, tracer)
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/query/",
+        "headers": [(b"traceparent", f"00-{TRACE_ID}-{PARENT_ID}-01".encode())],
+    }
+    asyncio.run(middleware(scope, None, send))
+    tracer.flush()
+
+    (span,) = exporter.spans
+    assert span.context.trace_id == TRACE_ID and span.parent_id == PARENT_ID
+    assert span.kind == "server" and span.attributes["http.status_code"] == 200
+    response_parent = parse_traceparent(dict(sent[0]["headers"])[b"traceparent"].decode())
+    assert response_parent == span.context
+
+
+def test_file_exporter_writes_otlp_json(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(FileExporter(str(path)), sample_rate=1.0, service_name="test-api")
+
+    with tracer.start_span("GET /", "server", attributes={"http.status_code": 200}):
+        pass
+    tracer.flush()
+
+    (line,) = path.read_text(encoding="utf-8").splitlines()
+    resource_spans = json.loads(line)["resourceSpans"][0]
+    assert resource_spans["resource"]["attributes"][0]["value"] == {"stringValue": "test-api"}
+    (span,) = resource_spans["scopeSpans"][0]["spans"]
+    assert span["kind"] == 2 and "parentSpanId" not in span
+    assert span["attributes"] == [{"key": "http.status_code", "value": {"intValue": "200"}}]
+    assert int(span["endTimeUnixNano"]) >= int(span["startTimeUnixNano"])
+
+
+def test_full_batches_are_exported_off_the_calling_thread():
+    with pytest.raises(TypeError):
+        SpanExporter()
+
+    class ThreadRecordingExporter(SpanExporter):
+        def __init__(self):
+            self.threads = []
+
+        def export(self, spans, service_name):
+            self.threads.append(threading.get_ident())
+
+    exporter = ThreadRecordingExporter()
+    tracer = Tracer(exporter, sample_rate=1.0, batch_size=2)
+    for _ in range(4):
+        with tracer.start_span("GET /", "server"):
+            pass
+    tracer.flush()
+
+    assert len(exporter.threads) == 2
+    assert threading.get_ident() not in exporter.threads
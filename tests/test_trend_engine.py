@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from api.services.trend_engine import analyze_series, rolling_mean, summarize
+
+
+def test_rolling_mean_matches_naive():
+    values = np.arange(10, dtype=float)[None, :]
+    result = rolling_mean(values, window=3)
+    assert result[0, 0] == 0
+    assert result[0, 1] == pytest.approx(0.5)
+    assert result[0, 5] == pytest.approx((3 + 4 + 5) / 3)
+
+
+def test_slope_significance():
+    rng = np.random.default_rng(42)
+    days = np.arange(90)
+    rising = 0.5 * days + rng.normal(0, 1, 90)
+    flat = rng.normal(10, 1, 90)
+
+    result = analyze_series(np.vstack([rising, flat]))
+
+    assert result["slope"][0] == pytest.approx(0.5, abs=0.02)
+    assert result["significant"][0]
+    assert not result["significant"][1]
+
+
+def test_change_point_detected():
+    rng = np.random.default_rng(7)
+    series = np.concatenate([rng.normal(100, 1, 60), rng.normal(130, 1, 30)])
+
+    result = analyze_series(series)
+
+    assert result["change_points"][0, 60]
+    assert result["change_points"][0, :60].sum() <= 1
+
+
+def test_weekly_seasonality_removed():
+    days = np.arange(84)
+    weekly = np.where(days % 7 >= 5, -20.0, 5.0)
+    result = analyze_series(50 + weekly)
+
+    # Тижневий патерн з амплітудою 25 майже повністю пояснюється сезонним індексом
+    assert np.abs(result["residuals"]).max() < 2
+    assert result["seasonal_index"][0, 5] < 0
+
+
+def test_summarize_is_json_compatible():
+    result = analyze_series(np.vstack([np.ones(14), np.arange(14)]))
+    summary = summarize(["flat", "rising"], result)
+    assert summary["rising"]["direction"] == "increasing"
+    assert isinstance(summary["flat"]["significant"], bool)
+
+
+def test_short_series_uses_student_t():
+    # t ≈ 2.31 при 3 ступенях свободи: за нормальним наближенням p ≈ 0.021,
+    # за розподілом Стьюдента p ≈ 0.104
+    values = np.array([[0.0, 2.0, 1.0, 4.0, 3.0]])
+    result = analyze_series(values)
+    assert result["t_stat"][0] == pytest.approx(2.309, abs=1e-3)
+    assert result["p_value"][0] == pytest.approx(0.104, abs=1e-3)
+    assert not result["significant"][0]
+
+    # Дві точки не дають залишкових ступенів свободи
+    assert not analyze_series(np.array([[1.0, 5.0]]))["significant"][0]
@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from passlib.context import CryptContext
+from api.services import user_provisioning
+from api.services.user_provisioning import validate_batch, hash_passwords
+
+
+def test_validate_batch_reports_rejections():
+    accepted, rejected = validate_batch(
+        [
+            {"username": "alice", "password": "Secret123"},
+            {"username": "alice", "password": "Secret123"},
+            {"username": "bob", "password": "weak"},
+            {"username": " ", "password": "Secret123"},
+            {"username": "carol", "password": "Secret123", "email": "c@example.com"},
+            {"username": "dave", "password": "Secret123", "email": "c@example.com"},
+        ]
+    )
+
+    assert [user["username"] for user in accepted] == ["alice", "carol"]
+    assert [row["reason"] for row in rejected] == [
+        "duplicate_in_batch",
+        "weak_password",
+        "missing_username",
+        "duplicate_email_in_batch",
+    ]
+    assert rejected[-1] == {
+        "username": "dave",
+        "reason": "duplicate_email_in_batch",
+        "detail": "c@example.com",
+    }
+
+
+def test_hash_executor_uses_spawn():
+    executor = user_provisioning.hash_executor()
+    try:
+        assert executor._mp_context.get_start_method() == "spawn"
+    finally:
+        executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_hash_passwords_preserves_order(monkeypatch):
+    # Швидка схема замість bcrypt, щоб перевірити лише розподіл по пакетах
+    context = CryptContext(schemes=["pbkdf2_sha256"])
+    monkeypatch.setattr(user_provisioning, "pwd_context", context)
+    monkeypatch.setattr(user_provisioning, "HASH_CHUNK_SIZE", 2)
+    passwords = [f"Secret{index}A" for index in range(5)]
+    # Пул потоків замість процесів, щоб тест не залежав від fork
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        hashes = await hash_passwords(passwords, executor)
+
+    assert len(hashes) == 5
+    assert all(context.verify(password, hashed) for password, hashed in zip(passwords, hashes))